@@ -11,19 +11,32 @@ import pickle
 import numpy as np
 
 # Available tests
-tests = ["bm_baseline.py", "bm_simplefunc.py"]
+tests = ["bm_baseline.py", "bm_simplefunc.py", "bm_threads.py", "bm_user_regions.py"]
 
 # Available instrumenters
 instrumenters = ["profile", "trace", "dummy", "None"]
 if sys.version_info.major >= 3:
     instrumenters.extend(["cProfile", "cTrace"])
+if sys.version_info >= (3, 9):
+    instrumenters.append("cSampling")
+if sys.version_info >= (3, 12):
+    instrumenters.append("cMonitoring")
 
 # Default values for: How many times the instrumented code is run during 1 test run
 reps_x = {
     "bm_baseline.py": ["1000000", "2000000", "3000000", "4000000", "5000000"],
     "bm_simplefunc.py": ["100000", "200000", "300000", "400000", "500000"],
+    "bm_threads.py": ["100000", "200000", "300000", "400000", "500000"],
+    "bm_user_regions.py": ["100000", "200000", "300000", "400000", "500000"],
 }
 
+# Default values for: How many threads run the instrumented code in the threaded tests
+threaded_tests = ["bm_threads.py"]
+threads_x = [1, 2, 4, 8]
+
+# Default values for: Sampling frequencies in Hz of cSampling, whose overhead should scale with them
+sampling_frequencies_x = [10, 100, 1000, 10000]
+
 
 def str_to_int(s):
     return int(float(s))
@@ -38,6 +51,13 @@ parser.add_argument('--repetitions', '-r', default=51, type=str_to_int,
 parser.add_argument('--loop-count', '-l', type=str_to_int, nargs='+',
                     help=('How many times the instrumented code is run during 1 test run. '
                           'Can be repeated and will create 1 test instance per argument'))
+parser.add_argument('--threads', type=str_to_int, nargs='+', default=threads_x,
+                    help=('How many threads run the instrumented code in the threaded tests ({}). '
+                          'Can be repeated and will create 1 test instance per argument').format(
+                              ", ".join(threaded_tests)))
+parser.add_argument('--sampling-frequency', type=str_to_int, nargs='+', default=sampling_frequencies_x,
+                    help=('Sampling frequencies in Hz of cSampling. '
+                          'Can be repeated and will create 1 instrumenter instance per argument'))
 parser.add_argument('--instrumenter', '-i', metavar='INST', nargs='+', default=instrumenters,
                     choices=instrumenters, help='The instrumenter(s) to use')
 parser.add_argument('--output', '-o', default='results.pkl', help='Output file for the results')
@@ -51,29 +71,46 @@ if args.dry_run:
 bench = benchmark_helper.BenchmarkEnv(repetitions=args.repetitions)
 results = {}
 
+# Threaded tests create one experiment per thread count, e.g. "bm_threads.py:4"
+experiments = []
 for test in args.test:
-    results[test] = {}
+    if test in threaded_tests:
+        experiments.extend(("{}:{}".format(test, threads), test, [str(threads)]) for threads in args.threads)
+    else:
+        experiments.append((test, test, []))
+
+# cSampling creates one instrumenter instance per sampling frequency, e.g. "cSampling:100"
+instrumenter_instances = []
+for instrumenter in args.instrumenter:
+    if instrumenter == "None":
+        instrumenter_instances.append((instrumenter, []))
+    elif instrumenter == "cSampling":
+        instrumenter_instances.extend(
+            ("{}:{}".format(instrumenter, frequency),
+             ["-m", "scorep", "--instrumenter-type={}".format(instrumenter),
+              "--sampling-frequency={}".format(frequency)])
+            for frequency in args.sampling_frequency)
+    else:
+        instrumenter_instances.append((instrumenter, ["-m", "scorep", "--instrumenter-type={}".format(instrumenter)]))
 
-    for instrumenter in args.instrumenter:
-        results[test][instrumenter] = {}
+for experiment, test, test_args in experiments:
+    results[experiment] = {}
 
-        if instrumenter == "None":
-            scorep_settings = []
-        else:
-            scorep_settings = ["-m", "scorep", "--instrumenter-type={}".format(instrumenter)]
+    for instrumenter, scorep_settings in instrumenter_instances:
+        results[experiment][instrumenter] = {}
 
         print("#########")
-        print("{}: {}".format(test, scorep_settings))
+        print("{}: {}".format(experiment, scorep_settings))
         print("#########")
         max_reps_width = len(str(max(reps_x[test])))
         loop_counts = args.loop_count if args.loop_count else reps_x[test]
         for reps in loop_counts:
-            times = bench.call(test, [str(reps)],
+            times = bench.call(test, [str(reps)] + test_args,
                                scorep_settings=scorep_settings)
             times = np.array(times)
             print("{:>{width}}: Range={:{prec}}-{:{prec}} Mean={:{prec}} Median={:{prec}}".format(
                 reps, times.min(), times.max(), times.mean(), np.median(times), width=max_reps_width, prec='5.4f'))
-            results[test][instrumenter][reps] = times
+            results[experiment][instrumenter][reps] = times
 
 with open(args.output, "wb") as f:
     pickle.dump(results, f)
@@ -21,11 +21,12 @@ class BenchmarkEnv():
             self.exp_dir,
             ignore_errors=True)
 
-    def call(self, script, ops=[], scorep_settings=[]):
+    def call(self, script, ops=[], scorep_settings=[], launcher=[]):
         self.env["SCOREP_EXPERIMENT_DIRECTORY"] = self.exp_dir + \
             "/{}-{}-{}".format(script, ops, scorep_settings)
 
-        arguments = [sys.executable]
+        arguments = list(launcher)
+        arguments.append(sys.executable)
         arguments.extend(scorep_settings)
         arguments.append(script)
         arguments.extend(ops)
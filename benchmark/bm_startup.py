@@ -0,0 +1,3 @@
+from mpi4py import MPI
+
+MPI.COMM_WORLD.Barrier()
@@ -0,0 +1,28 @@
+import sys
+import threading
+
+
+def add(val):
+    return val + 1
+
+
+def worker(iterations, results, index):
+    result = 0
+    for i in range(iterations):
+        result = add(result)
+    results[index] = result
+
+
+iterations = int(sys.argv[1])
+num_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+# Every thread does the same amount of work, so on a free-threaded Python with a scalable
+# instrumenter the runtime stays constant when adding threads
+results = [0] * num_threads
+threads = [threading.Thread(target=worker, args=(iterations, results, i)) for i in range(num_threads)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+
+assert results == [iterations] * num_threads
@@ -0,0 +1,18 @@
+import sys
+import scorep.user
+
+
+def add(val):
+    return val + 1
+
+
+result = 0
+iterations = int(sys.argv[1])
+
+# Each iteration calls the bindings for the region and the parameter, besides the instrumenter
+for i in range(iterations):
+    with scorep.user.region("add"):
+        result = add(result)
+    scorep.user.parameter_int("result", result)
+
+assert result == iterations
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+'''
+Benchmark the startup of `python -m scorep --mpp=mpi` at increasing numbers of MPI ranks.
+
+Modes:
+ * nocache: Each rank builds the Score-P subsystem in a temporary folder, like without a writeable cache
+ * cold: The ranks share an empty cache, one rank builds the subsystem while the others wait for it
+ * prepared: The subsystem was built by `python -m scorep --prepare` before, the ranks only read it
+'''
+import argparse
+import os
+import pickle
+import subprocess
+import sys
+import benchmark_helper
+import numpy as np
+
+modes = ["nocache", "cold", "prepared"]
+test = "bm_startup.py"
+
+
+def str_to_int(s):
+    return int(float(s))
+
+
+parser = argparse.ArgumentParser(description='Benchmark the startup with many MPI ranks.',
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument('--ranks', '-n', type=str_to_int, nargs='+', default=[1, 2, 4, 8, 16],
+                    help='Number of MPI ranks. Can be repeated and will create 1 test instance per argument')
+parser.add_argument('--repetitions', '-r', default=5, type=str_to_int,
+                    help='How many times a test invocation is repeated (number of timings per test instance)')
+parser.add_argument('--mode', '-m', metavar='MODE', nargs='+', default=modes,
+                    choices=modes, help='The way the subsystem is built')
+parser.add_argument('--mpirun', default='mpirun', help='MPI launcher, called as `<mpirun> -n <ranks> ...`')
+parser.add_argument('--output', '-o', default='results-startup.pkl', help='Output file for the results')
+args = parser.parse_args()
+
+bench = benchmark_helper.BenchmarkEnv(repetitions=1)
+scorep_settings = ["-m", "scorep", "--mpp=mpi", "--noinstrumenter"]
+results = {test: {}}
+
+for mode in args.mode:
+    results[test][mode] = {}
+    print("#########")
+    print("{}: {}".format(mode, scorep_settings))
+    print("#########")
+    if mode == "prepared":
+        bench.env["SCOREP_PYTHON_CACHE_DIR"] = os.path.join(bench.exp_dir, "prepared-cache")
+        subprocess.run([sys.executable, "-m", "scorep", "--prepare", "--mpp=mpi"], env=bench.env, check=True)
+
+    for ranks in args.ranks:
+        times = []
+        for repetition in range(args.repetitions):
+            if mode == "nocache":
+                # The cache can't be created below a file
+                no_cache_file = os.path.join(bench.exp_dir, "no-cache")
+                open(no_cache_file, "w").close()
+                bench.env["SCOREP_PYTHON_CACHE_DIR"] = os.path.join(no_cache_file, "cache")
+            elif mode == "cold":
+                bench.env["SCOREP_PYTHON_CACHE_DIR"] = os.path.join(
+                    bench.exp_dir, "cold-cache-{}-{}".format(ranks, repetition))
+            times.extend(bench.call(test, scorep_settings=scorep_settings,
+                                    launcher=[args.mpirun, "-n", str(ranks)]))
+        times = np.array(times)
+        print("{:>5}: Range={:{prec}}-{:{prec}} Mean={:{prec}} Median={:{prec}}".format(
+            ranks, times.min(), times.max(), times.mean(), np.median(times), prec='5.4f'))
+        results[test][mode][ranks] = times
+
+with open(args.output, "wb") as f:
+    pickle.dump(results, f)
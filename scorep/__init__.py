@@ -1,2 +1,2 @@
-__all__ = ["user", "instrumenter", "__version__"]
+__all__ = ["user", "instrumenter", "filter", "asyncio", "__version__"]
 from scorep._version import __version__
@@ -1,12 +1,26 @@
+import atexit
 import os
+import shlex
 import sys
+import types
 
+import scorep.filter
 import scorep.instrumenter
 import scorep.subsystem
 import scorep.helper
 from scorep.helper import get_scorep_version, print_err
 
 
+FILTER_OPTIONS = {
+    "--include-module": "include_module",
+    "--exclude-module": "exclude_module",
+    "--include-name": "include_name",
+    "--exclude-name": "exclude_name",
+    "--include-path": "include_path",
+    "--exclude-path": "exclude_path",
+}
+
+
 def _err_exit(msg):
     print_err("scorep: " + msg)
     sys.exit(1)
@@ -20,15 +34,68 @@ Score-P Python instrumentation wrapper. The following options control how the pr
 
   --help                   Show this help message and exit.
   --keep-files             Keep temporary files after execution.
+  --prepare                Only build the Score-P subsystem for the given 'scorep-config' options into the cache
+                           and exit. Later runs with the same options, e.g. all ranks of an MPI job, reuse it.
+                           The cache is $SCOREP_PYTHON_CACHE_DIR, by default $XDG_CACHE_HOME/scorep-python.
+  --print-env              Only print the shell commands exporting the environment for the given options and exit.
+                           Runs in this environment start without restarting the interpreter. Only apply it to
+                           the run, as it preloads Score-P into every process, e.g.:
+                           python -m scorep --print-env --mpp=mpi > scorep.env
+                           (. ./scorep.env && exec python -m scorep --mpp=mpi script.py)
   --verbose, -v            Enable verbose output for debugging and tracing.
   --nopython               Disable instrumentation of Python code.
                            Instrumentation can still be enabled later from within the application's source code.
   --noinstrumenter         Same as --nopython.
   --instrumenter-type=<type>
                            Specify custom instrumenter type (e.g., cProfile).
+                           Defaults to cMonitoring on Python 3.12+ and to cProfile before.
+                           cSampling records samples of the Python stacks instead of every call.
+  --region-names=<scheme>  Naming scheme of the regions of Python functions. "self" (default) names methods
+                           "module.Class:function" after the type of self. "qualname" uses "module:qualname",
+                           which is stable across subclasses and never looks at the locals of a frame.
+                           Same as setting SCOREP_PYTHON_REGION_NAMES.
+  --c-calls=<glob>[,<glob>...]
+                           Also record the calls of functions implemented in C, like builtins or methods of
+                           extension modules, whose region name matches one of the glob patterns,
+                           e.g. "numpy*,_hashlib:*". Only supported by cProfile and cMonitoring.
+                           Same as setting SCOREP_PYTHON_C_CALLS.
+  --generator-regions=<mode>
+                           Region of a generator or coroutine. "resume" (default) records each resume until the
+                           next yield or await as a call. "lifetime" records one region from its start to its end,
+                           which ends early if the function starting it returns first. "lifetime" is only
+                           supported by cMonitoring. Same as setting SCOREP_PYTHON_GENERATOR_REGIONS.
+  --asyncio[=<parts>]      Instrument asyncio event loops. <parts> is a comma separated list of "tasks" (default)
+                           to record each step of a task as region of its coroutine function, and "loop" to record
+                           the callbacks, the selector and the delay of callbacks of the loop.
+  --multiprocessing        Also instrument the Python processes started by multiprocessing, e.g. the workers of a
+                           ProcessPoolExecutor. Processes started by spawn or forkserver record their own
+                           measurement, in <SCOREP_EXPERIMENT_DIRECTORY>-<pid> if the directory is set. Forked
+                           processes record no Python events. The script runs as module __main__, so the child
+                           processes can import it.
+  --max-depth=<n>          Only record the outermost n levels of nested Python calls, skipping deeper calls
+                           without any lookup. Only supported by the C++ instrumenters.
+                           Same as setting SCOREP_PYTHON_MAX_DEPTH.
+  --burst-filter=<calls>,<us>
+                           Stop recording functions once they were called at least <calls> times and took less
+                           than <us> microseconds per call on average. The excluded functions are written to the
+                           filter file python_burst.filter in the experiment directory.
+                           Only supported by cProfile, cTrace and cMonitoring.
+                           Same as setting SCOREP_PYTHON_BURST_FILTER.
+  --sampling-frequency=<Hz>
+                           Number of samples per second taken by cSampling, defaults to 1000.
+                           Same as setting SCOREP_PYTHON_SAMPLING_FREQUENCY.
   --instrumenter-file=<file>
                            Path to a Python script that is executed before the application.
                            Allows instrumentation of specific modules and functions without modifying their source code.
+  --filter-file=<file>     Only record the Python functions selected by a Score-P filter file.
+                           Defaults to the file given in SCOREP_FILTERING_FILE.
+  --include-module=<glob>, --exclude-module=<glob>
+                           Record or skip the functions of modules matching the glob pattern, e.g. "numpy.*".
+  --include-name=<regex>, --exclude-name=<regex>
+                           Record or skip the functions whose region name "module:function" matches the regex.
+  --include-path=<path>, --exclude-path=<path>
+                           Record or skip the functions defined in files below the given path.
+                           For all filter options the last matching rule wins.
   --                       Stop parsing Score-P options; interpret all following arguments verbatim as the program with its arguments.
 
 Other options starting with '-' are passed directly to 'scorep-config'.
@@ -45,6 +112,20 @@ Note:
 """)  # noqa: E501
 
 
+def _print_environment(scorep_config, keep_files, verbose):
+    """Print the shell commands exporting the environment set up by init_environment"""
+    old_env = os.environ.copy()
+    scorep.subsystem.init_environment(scorep_config, keep_files, verbose)
+    if not keep_files and os.environ.get("SCOREP_PYTHON_BINDINGS_TEMP_DIR"):
+        # Every run would delete the temporary folder at its end
+        scorep.subsystem.clean_up(keep_files)
+        _err_exit("--print-env needs a writeable cache at " + scorep.helper.get_cache_dir())
+    os.environ["SCOREP_PYTHON_BINDINGS_INITIALISED"] = "true"
+    for var, value in sorted(os.environ.items()):
+        if old_env.get(var) != value and var != "SCOREP_PYTHON_BINDINGS_TEMP_DIR":
+            print("export {}={}".format(var, shlex.quote(value)))
+
+
 def scorep_main(argv=None):
     if argv is None:
         argv = sys.argv
@@ -55,14 +136,17 @@ def scorep_main(argv=None):
 
     show_help = False
     keep_files = False
+    prepare = False
+    print_env = False
     verbose = False
     no_instrumenter = False
+    asyncio_parts = []
+    instrument_children = False
 
-    if scorep.instrumenter.has_c_instrumenter():
-        instrumenter_type = "cProfile"
-    else:
-        instrumenter_type = "profile"
+    instrumenter_type = scorep.instrumenter.default_instrumenter_type()
     instrumenter_file = None
+    filter_file = os.environ.get("SCOREP_FILTERING_FILE")
+    filter_rules = []
 
     for elem in argv[1:]:
         if parse_scorep_commands:
@@ -77,12 +161,22 @@ def scorep_main(argv=None):
                 scorep_config.append("--mpp=mpi")
             elif elem == "--keep-files":
                 keep_files = True
+            elif elem == "--prepare":
+                prepare = True
+            elif elem == "--print-env":
+                print_env = True
             elif elem == "--verbose" or elem == '-v':
                 verbose = True
             elif elem == "--nopython":
                 no_instrumenter = True
             elif elem == "--noinstrumenter":
                 no_instrumenter = True
+            elif elem == "--asyncio":
+                asyncio_parts = ["tasks"]
+            elif elem.startswith("--asyncio="):
+                asyncio_parts = elem.split("=", 1)[1].split(",")
+            elif elem == "--multiprocessing":
+                instrument_children = True
             elif elem in ["--io=runtime:posix", "--io=posix"] and get_scorep_version() >= 9.0:
                 print_err(f"scorep: Warning: The option '{elem}' is deprecated.")
                 if "SCOREP_IO_POSIX" in os.environ:
@@ -97,6 +191,23 @@ def scorep_main(argv=None):
             elif "--instrumenter-file" in elem:
                 param = elem.split("=")
                 instrumenter_file = param[1]
+            elif elem.startswith("--region-names="):
+                os.environ["SCOREP_PYTHON_REGION_NAMES"] = elem.split("=", 1)[1]
+            elif elem.startswith("--c-calls="):
+                os.environ["SCOREP_PYTHON_C_CALLS"] = elem.split("=", 1)[1]
+            elif elem.startswith("--generator-regions="):
+                os.environ["SCOREP_PYTHON_GENERATOR_REGIONS"] = elem.split("=", 1)[1]
+            elif elem.startswith("--max-depth="):
+                os.environ["SCOREP_PYTHON_MAX_DEPTH"] = elem.split("=", 1)[1]
+            elif elem.startswith("--burst-filter="):
+                os.environ["SCOREP_PYTHON_BURST_FILTER"] = elem.split("=", 1)[1]
+            elif elem.startswith("--sampling-frequency="):
+                os.environ["SCOREP_PYTHON_SAMPLING_FREQUENCY"] = elem.split("=", 1)[1]
+            elif elem.startswith("--filter-file="):
+                filter_file = elem.split("=", 1)[1]
+            elif elem.split("=", 1)[0] in FILTER_OPTIONS:
+                option, value = elem.split("=", 1)
+                filter_rules.append((FILTER_OPTIONS[option], value))
             elif elem[0] == "-":
                 scorep_config.append(elem)
             else:
@@ -109,9 +220,24 @@ def scorep_main(argv=None):
     if show_help:
         print_help()
         sys.exit(0)
+    if prepare:
+        try:
+            lib_dir = scorep.subsystem.prepare(scorep_config, verbose)
+        except RuntimeError as err:
+            _err_exit(str(err))
+        print(lib_dir)
+        sys.exit(0)
+    if print_env:
+        _print_environment(scorep_config, keep_files, verbose)
+        sys.exit(0)
     if len(prog_argv) == 0:
         _err_exit("Did not find a script to run")
 
+    if os.environ.get("SCOREP_PYTHON_BINDINGS_INITIALISED") != "true" and scorep.instrumenter.is_scorep_loaded():
+        # e.g. linked into the interpreter or preloaded by the user, a restart can't change that
+        if verbose:
+            print_err("scorep: Score-P is already loaded, the interpreter is not restarted")
+        os.environ["SCOREP_PYTHON_BINDINGS_INITIALISED"] = "true"
     if os.environ.get("SCOREP_PYTHON_BINDINGS_INITIALISED") != "true":
         scorep.subsystem.init_environment(scorep_config, keep_files, verbose)
         os.environ["SCOREP_PYTHON_BINDINGS_INITIALISED"] = "true"
@@ -137,8 +263,31 @@ def scorep_main(argv=None):
     progname = prog_argv[0]
     sys.path[0] = os.path.split(progname)[0]
 
+    # rules from the command line take precedence over the ones from the filter file
+    region_filter = scorep.filter.RegionFilter()
+    if filter_file:
+        region_filter.add_filter_file(filter_file)
+    for method, value in filter_rules:
+        getattr(region_filter, method)(value)
+
     tracer = scorep.instrumenter.get_instrumenter(not no_instrumenter,
                                                   instrumenter_type)
+    if region_filter:
+        tracer.set_region_filter(region_filter)
+    if hasattr(tracer, "demoted_regions"):
+        from scorep._instrumenters.utils import write_burst_filter_report
+        atexit.register(write_burst_filter_report, tracer)
+
+    if asyncio_parts:
+        unknown_parts = set(asyncio_parts) - {"tasks", "loop"}
+        if unknown_parts:
+            _err_exit("Unknown parts of --asyncio: " + ", ".join(sorted(unknown_parts)))
+        from scorep.asyncio import install as install_asyncio
+        install_asyncio(tasks="tasks" in asyncio_parts, loop_health="loop" in asyncio_parts)
+
+    if instrument_children:
+        from scorep.multiprocessing import install as install_multiprocessing
+        install_multiprocessing(instrumenter_type, not no_instrumenter, region_filter or None)
 
     if instrumenter_file:
         with open(instrumenter_file) as f:
@@ -154,6 +303,12 @@ def scorep_main(argv=None):
             '__package__': None,
             '__cached__': None,
         }
+        if instrument_children:
+            # Child processes import the functions of the script from module __main__
+            main_module = types.ModuleType("__main__")
+            main_module.__dict__.update(globs)
+            sys.modules["__main__"] = main_module
+            globs = main_module.__dict__
 
         tracer.run(code, globs, globs)
     except OSError as err:
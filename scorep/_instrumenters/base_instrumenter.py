@@ -25,10 +25,26 @@ class BaseInstrumenter(_BaseInstrumenter):
     def get_registered(self):
         return None
 
+    @abc.abstractmethod
+    def suppress(self):
+        pass
+
+    @abc.abstractmethod
+    def resume(self):
+        pass
+
+    @abc.abstractmethod
+    def is_suppressed(self):
+        return False
+
     @abc.abstractmethod
     def run(self, cmd, globals=None, locals=None):
         pass
 
+    @abc.abstractmethod
+    def set_region_filter(self, region_filter):
+        pass
+
     @abc.abstractmethod
     def region_begin(self, module_name, function_name, file_name, line_number, code_object):
         pass
@@ -37,6 +53,10 @@ class BaseInstrumenter(_BaseInstrumenter):
     def region_end(self, module_name, function_name, code_object):
         pass
 
+    @abc.abstractmethod
+    def user_region(self, name, file_name, line_number):
+        pass
+
     @abc.abstractmethod
     def rewind_begin(self, name, file_name=None, line_number=None):
         pass
@@ -45,6 +65,10 @@ class BaseInstrumenter(_BaseInstrumenter):
     def rewind_end(self, name, value):
         pass
 
+    @abc.abstractmethod
+    def rewind_region(self, name, file_name, line_number):
+        pass
+
     @abc.abstractmethod
     def user_enable_recording(self):
         pass
@@ -65,6 +89,10 @@ class BaseInstrumenter(_BaseInstrumenter):
     def user_parameter_string(self, name, string):
         pass
 
+    @abc.abstractmethod
+    def user_metric(self, name, unit, value_type):
+        pass
+
     @abc.abstractmethod
     def force_finalize(self):
         pass
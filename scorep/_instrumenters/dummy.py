@@ -1,8 +1,53 @@
-__all__ = ['ScorepDummy']
+__all__ = ['ScorepDummy', 'no_op_region']
 
 import scorep._instrumenters.base_instrumenter as base_instrumenter
 
 
+class _DummyRegion():
+    """
+    User region that does nothing. Usable as context manager and as decorator, which returns the
+    function itself
+    """
+
+    def enter(self):
+        pass
+
+    def exit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def __call__(self, func):
+        return func
+
+
+class _DummyRewindRegion():
+    """Rewind region that does nothing"""
+
+    def enter(self):
+        pass
+
+    def exit(self, value):
+        pass
+
+
+class _DummyMetric():
+    """Metric that does nothing"""
+
+    def trigger(self, value):
+        pass
+
+
+# Shared objects returned by the dummy instrumenter and by scorep.user without a measurement
+no_op_region = _DummyRegion()
+_no_op_rewind_region = _DummyRewindRegion()
+_no_op_metric = _DummyMetric()
+
+
 class ScorepDummy(base_instrumenter.BaseInstrumenter):
     def __init__(self, enable_instrumenter=True):
         pass
@@ -16,6 +61,15 @@ class ScorepDummy(base_instrumenter.BaseInstrumenter):
     def get_registered(self):
         return None
 
+    def suppress(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def is_suppressed(self):
+        return False
+
     def run(self, cmd, globals=None, locals=None):
         if globals is None:
             globals = {}
@@ -23,6 +77,9 @@ class ScorepDummy(base_instrumenter.BaseInstrumenter):
             locals = {}
         exec(cmd, globals, locals)
 
+    def set_region_filter(self, region_filter):
+        pass
+
     def try_region_begin(self, code_object):
         pass
 
@@ -35,12 +92,18 @@ class ScorepDummy(base_instrumenter.BaseInstrumenter):
     def region_end(self, module_name, function_name, code_object=None):
         pass
 
+    def user_region(self, name, file_name, line_number):
+        return no_op_region
+
     def rewind_begin(self, name, file_name=None, line_number=None):
         pass
 
     def rewind_end(self, name, value):
         pass
 
+    def rewind_region(self, name, file_name, line_number):
+        return _no_op_rewind_region
+
     def user_enable_recording(self):
         pass
 
@@ -56,6 +119,9 @@ class ScorepDummy(base_instrumenter.BaseInstrumenter):
     def user_parameter_string(self, name, string):
         pass
 
+    def user_metric(self, name, unit, value_type):
+        return _no_op_metric
+
     def force_finalize(self):
         pass
 
@@ -0,0 +1,9 @@
+from scorep._instrumenters.scorep_instrumenter import ScorepInstrumenter
+from scorep._instrumenters.utils import get_c_instrumenter_options
+import scorep._bindings
+
+
+class ScorepCMonitoring(scorep._bindings.CInstrumenter, ScorepInstrumenter):
+    def __init__(self, enable_instrumenter):
+        scorep._bindings.CInstrumenter.__init__(self, interface='Monitoring', **get_c_instrumenter_options())
+        ScorepInstrumenter.__init__(self, enable_instrumenter)
@@ -0,0 +1,40 @@
+import os
+import threading
+from scorep._instrumenters.scorep_instrumenter import ScorepInstrumenter
+from scorep._instrumenters.utils import get_c_instrumenter_options
+import scorep._bindings
+
+
+class ScorepCSampling(scorep._bindings.CInstrumenter, ScorepInstrumenter):
+    """
+    Takes samples of the Python stacks of all threads instead of recording every call.
+    A timer thread lets each thread take a sample with its next Python event. Functions are
+    recorded as regions from the first sample they are on the stack until the first sample they
+    are no longer on the stack. The frequency in Hz is taken from SCOREP_PYTHON_SAMPLING_FREQUENCY.
+    """
+
+    def __init__(self, enable_instrumenter):
+        scorep._bindings.CInstrumenter.__init__(self, interface='Sampling', **get_c_instrumenter_options())
+        ScorepInstrumenter.__init__(self, enable_instrumenter)
+        frequency = float(os.environ.get("SCOREP_PYTHON_SAMPLING_FREQUENCY", 1000))
+        if frequency <= 0:
+            raise ValueError("The sampling frequency must be positive, got {}".format(frequency))
+        self._sampling_interval = 1 / frequency
+        self._sampling_thread = None
+        self._stop_sampling = threading.Event()
+
+    def _enable_instrumenter(self):
+        scorep._bindings.CInstrumenter._enable_instrumenter(self)
+        self._stop_sampling.clear()
+        self._sampling_thread = threading.Thread(target=self._sample, name="scorep-sampling", daemon=True)
+        self._sampling_thread.start()
+
+    def _disable_instrumenter(self):
+        self._stop_sampling.set()
+        self._sampling_thread.join()
+        self._sampling_thread = None
+        scorep._bindings.CInstrumenter._disable_instrumenter(self)
+
+    def _sample(self):
+        while not self._stop_sampling.wait(self._sampling_interval):
+            self._sample_threads()
@@ -1,10 +1,29 @@
 import abc
+import functools
 import inspect
 import os
+import threading
 from scorep._instrumenters import base_instrumenter
+from scorep._instrumenters.utils import set_region_names
 import scorep._bindings
 
 
+class UserRegion(scorep._bindings.UserRegion):
+    """
+    User region `user:<name>` with a handle that is resolved once when the object is created.
+    Entering and leaving the region are native calls, either with the methods enter() and exit()
+    or using the object as context manager or as decorator.
+    """
+    __slots__ = ()
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def inner(*args, **kwds):
+            with self:
+                return func(*args, **kwds)
+        return inner
+
+
 class ScorepInstrumenter(base_instrumenter.BaseInstrumenter):
     """Base class for all instrumenters using Score-P"""
 
@@ -15,6 +34,9 @@ class ScorepInstrumenter(base_instrumenter.BaseInstrumenter):
         """
         self._tracer_registered = False
         self._enabled = enable_instrumenter
+        # Nesting of suppress per thread, only used by the Python instrumenters
+        self._suppression = threading.local()
+        set_region_names(os.environ.get("SCOREP_PYTHON_REGION_NAMES", "self"))
 
     @abc.abstractmethod
     def _enable_instrumenter(self):
@@ -24,6 +46,10 @@ class ScorepInstrumenter(base_instrumenter.BaseInstrumenter):
     def _disable_instrumenter(self):
         """Stop this instrumenter from collecting events"""
 
+    @abc.abstractmethod
+    def _set_thread_hook(self, enabled):
+        """Install or remove the hook of this instrumenter in the calling thread only"""
+
     def register(self):
         """Register this instrumenter (collect events)"""
         if not self._tracer_registered:
@@ -37,8 +63,32 @@ class ScorepInstrumenter(base_instrumenter.BaseInstrumenter):
             self._tracer_registered = False
 
     def get_registered(self):
-        """Return whether this instrumenter is currently collecting events"""
-        return self._tracer_registered
+        """Return whether this instrumenter is currently collecting events of the calling thread"""
+        return self._tracer_registered and not self.is_suppressed()
+
+    def suppress(self):
+        """
+        Stop collecting the events of the calling thread until resume() is called as often.
+        Unlike unregister(), other threads are not affected.
+        The C instrumenters keep their hooks installed and only count the nesting.
+        """
+        depth = getattr(self._suppression, "depth", 0)
+        self._suppression.depth = depth + 1
+        if depth == 0 and self._tracer_registered:
+            self._set_thread_hook(False)
+
+    def resume(self):
+        """Undo one call of suppress() in the calling thread"""
+        depth = getattr(self._suppression, "depth", 0)
+        if depth == 0:
+            raise RuntimeError("The instrumenter is not suppressed in this thread")
+        self._suppression.depth = depth - 1
+        if depth == 1 and self._tracer_registered:
+            self._set_thread_hook(True)
+
+    def is_suppressed(self):
+        """Return whether the events of the calling thread are suppressed"""
+        return getattr(self._suppression, "depth", 0) != 0
 
     def run(self, cmd, globals=None, locals=None):
         """Run the compiled command under this instrumenter.
@@ -56,6 +106,14 @@ class ScorepInstrumenter(base_instrumenter.BaseInstrumenter):
         finally:
             self.unregister()
 
+    def set_region_filter(self, region_filter):
+        """
+        Set the callable deciding which functions are recorded, e.g. a scorep.filter.RegionFilter.
+        It is called once per code object with the region name and the file name.
+        None records all functions.
+        """
+        scorep._bindings.set_region_filter(region_filter)
+
     def try_region_begin(self, code_object):
         """Tries to record a region begin event. Retruns True on success"""
         return scorep._bindings.try_region_begin(code_object)
@@ -73,6 +131,16 @@ class ScorepInstrumenter(base_instrumenter.BaseInstrumenter):
         """Record a region end event"""
         scorep._bindings.region_end(module_name, function_name, code_object)
 
+    def user_region(self, name, file_name, line_number):
+        """
+        Return a handle of the user region `user:<name>` with the methods enter() and exit(),
+        which is also usable as context manager and as decorator
+        @param name name of the user region
+        @param file_name file name of the user region, or None
+        @param line_number line number of the user region
+        """
+        return UserRegion(name, file_name, line_number)
+
     def rewind_begin(self, name, file_name=None, line_number=None):
         """
         Begin of an Rewind region. If file_name or line_number is None, both will
@@ -100,6 +168,15 @@ class ScorepInstrumenter(base_instrumenter.BaseInstrumenter):
         """
         scorep._bindings.rewind_end(name, value)
 
+    def rewind_region(self, name, file_name, line_number):
+        """
+        Return a handle of the rewind region `<name>` with the methods enter() and exit(value)
+        @param name name of the rewind region
+        @param file_name file name of the rewind region, or None
+        @param line_number line number of the rewind region
+        """
+        return scorep._bindings.RewindRegion(name, file_name, line_number)
+
     def user_enable_recording(self):
         """Enable writing of trace events in ScoreP"""
         scorep._bindings.enable_recording()
@@ -114,12 +191,21 @@ class ScorepInstrumenter(base_instrumenter.BaseInstrumenter):
 
     def user_parameter_uint(self, name, val):
         """Record a parameter of type unsigned integer"""
-        scorep._bindings.parameter_string(name, val)
+        scorep._bindings.parameter_uint(name, val)
 
     def user_parameter_string(self, name, string):
         """Record a parameter of type string"""
         scorep._bindings.parameter_string(name, string)
 
+    def user_metric(self, name, unit, value_type):
+        """
+        Return a handle of the user metric `<name>` with the method trigger(value)
+        @param name name of the metric
+        @param unit unit of the values
+        @param value_type type of the values, `double`, `int64` or `uint64`
+        """
+        return scorep._bindings.Metric(name, unit, value_type)
+
     def force_finalize(self):
         scorep._bindings.force_finalize()
 
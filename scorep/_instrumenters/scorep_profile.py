@@ -1,34 +1,74 @@
 __all__ = ['ScorepProfile']
 
 import sys
-from scorep._instrumenters.utils import get_module_name
+from scorep._instrumenters.utils import get_function_name, get_module_name
 from scorep._instrumenters.scorep_instrumenter import ScorepInstrumenter
 import scorep._bindings
 
 try:
     import threading
 except ImportError:
-    _setprofile = sys.setprofile
+    class _OpenCalls(object):
+        count = 0
+
+    def _setprofile(func, thread_func):
+        sys.setprofile(func)
 
     def _unsetprofile():
         sys.setprofile(None)
 
 else:
-    def _setprofile(func):
-        threading.setprofile(func)
-        sys.setprofile(func)
+    class _OpenCalls(threading.local):
+        count = 0
 
-    def _unsetprofile():
-        sys.setprofile(None)
-        threading.setprofile(None)
+    if hasattr(sys, "_setprofileallthreads"):
+        # Python 3.12+ also installs the function in the threads that are running already.
+        # Like threading.setprofile_all_threads, but without a Python frame around the installation
+        def _setprofile(func, thread_func):
+            threading.setprofile(thread_func)
+            sys._setprofileallthreads(func)
+
+        def _unsetprofile():
+            sys._setprofileallthreads(None)
+            threading.setprofile(None)
+
+    else:
+        def _setprofile(func, thread_func):
+            threading.setprofile(thread_func)
+            sys.setprofile(func)
+
+        def _unsetprofile():
+            sys.setprofile(None)
+            threading.setprofile(None)
 
 
 class ScorepProfile(ScorepInstrumenter):
+    # Number of the calls per thread that were entered and did not return yet, like `open_calls` of
+    # the C instrumenter. Calls that were running when the instrumenter was enabled in their thread
+    # were not entered, and they can only return when no entered call is open. So returns without
+    # an open call are not recorded. None while the instrumenter is disabled
+    _open_calls = None
+
     def _enable_instrumenter(self):
-        _setprofile(self._globaltrace)
+        # Fresh counts, as calls entered before a previous disable never return to the instrumenter
+        self._open_calls = _OpenCalls()
+        _setprofile(self._globaltrace, self._thread_start)
 
     def _disable_instrumenter(self):
         _unsetprofile()
+        self._open_calls = None
+
+    def _thread_start(self, frame, why, arg):
+        """Profile function of new threads, which installs _globaltrace with the first event"""
+        if self._open_calls is None:
+            # The thread was started before the instrumenter was disabled
+            sys.setprofile(None)
+            return None
+        sys.setprofile(self._globaltrace)
+        return self._globaltrace(frame, why, arg)
+
+    def _set_thread_hook(self, enabled):
+        sys.setprofile(self._globaltrace if enabled else None)
 
     def _globaltrace(self, frame, why, arg):
         """Handler for call events.
@@ -36,19 +76,23 @@ class ScorepProfile(ScorepInstrumenter):
         If the code block being entered is to be ignored, returns `None',
         else returns self.localtrace.
         """
+        open_calls = self._open_calls
+        if open_calls is None:
+            # Another thread disabled the instrumenter
+            return
         if why == 'call':
+            open_calls.count += 1
             code = frame.f_code
             if not scorep._bindings.try_region_begin(code):
-                if not code.co_name == "_unsetprofile":
-                    modulename = get_module_name(frame)
-                    if not modulename[:6] == "scorep":
-                        file_name = code.co_filename
-                        line_number = code.co_firstlineno
-                        scorep._bindings.region_begin(modulename, code.co_name, file_name, line_number, code)
+                modulename = get_module_name(frame)
+                file_name = code.co_filename
+                line_number = code.co_firstlineno
+                scorep._bindings.region_begin(modulename, get_function_name(code), file_name, line_number, code)
         elif why == 'return':
+            if open_calls.count == 0:
+                return
+            open_calls.count -= 1
             code = frame.f_code
             if not scorep._bindings.try_region_end(code):
-                if not code.co_name == "_unsetprofile":
-                    modulename = get_module_name(frame)
-                    if not modulename[:6] == "scorep":
-                        scorep._bindings.region_end(modulename, code.co_name, code)
+                modulename = get_module_name(frame)
+                scorep._bindings.region_end(modulename, get_function_name(code), code)
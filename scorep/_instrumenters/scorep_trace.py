@@ -1,7 +1,7 @@
 __all__ = ['ScorepTrace']
 
 import sys
-from scorep._instrumenters.utils import get_module_name
+from scorep._instrumenters.utils import get_function_name, get_module_name
 from scorep._instrumenters.scorep_instrumenter import ScorepInstrumenter
 import scorep._bindings
 
@@ -14,13 +14,23 @@ except ImportError:
         sys.settrace(None)
 
 else:
-    def _settrace(func):
-        threading.settrace(func)
-        sys.settrace(func)
+    if hasattr(threading, "settrace_all_threads"):
+        # Python 3.12+ also installs the function in the threads that are running already.
+        # Their running calls have no local trace function, so their returns are not seen
+        def _settrace(func):
+            threading.settrace_all_threads(func)
 
-    def _unsettrace():
-        sys.settrace(None)
-        threading.settrace(None)
+        def _unsettrace():
+            threading.settrace_all_threads(None)
+
+    else:
+        def _settrace(func):
+            threading.settrace(func)
+            sys.settrace(func)
+
+        def _unsettrace():
+            sys.settrace(None)
+            threading.settrace(None)
 
 
 class ScorepTrace(ScorepInstrumenter):
@@ -30,6 +40,9 @@ class ScorepTrace(ScorepInstrumenter):
     def _disable_instrumenter(self):
         _unsettrace()
 
+    def _set_thread_hook(self, enabled):
+        sys.settrace(self._globaltrace if enabled else None)
+
     def _globaltrace(self, frame, why, arg):
         """Handler for call events.
         @return self.localtrace or None
@@ -37,12 +50,10 @@ class ScorepTrace(ScorepInstrumenter):
         if why == 'call':
             code = frame.f_code
             if not scorep._bindings.try_region_begin(code):
-                if not code.co_name == "_unsetprofile":
-                    modulename = get_module_name(frame)
-                    if not modulename[:6] == "scorep":
-                        full_file_name = code.co_filename
-                        line_number = code.co_firstlineno
-                        scorep._bindings.region_begin(modulename, code.co_name, full_file_name, line_number, code)
+                modulename = get_module_name(frame)
+                full_file_name = code.co_filename
+                line_number = code.co_firstlineno
+                scorep._bindings.region_begin(modulename, get_function_name(code), full_file_name, line_number, code)
             return self._localtrace
         return None
 
@@ -50,8 +61,6 @@ class ScorepTrace(ScorepInstrumenter):
         if why == 'return':
             code = frame.f_code
             if not scorep._bindings.try_region_end(code):
-                if not code.co_name == "_unsetprofile":
-                    modulename = get_module_name(frame)
-                    if not modulename[:6] == "scorep":
-                        scorep._bindings.region_end(modulename, code.co_name, code)
+                modulename = get_module_name(frame)
+                scorep._bindings.region_end(modulename, get_function_name(code), code)
         return self._localtrace
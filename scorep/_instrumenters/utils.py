@@ -1,7 +1,41 @@
-from scorep._bindings import abspath
+import os
+import re
+import sys
+import scorep._bindings
+from scorep._bindings import abspath, get_experiment_dir_name
 from scorep.instrumenter import has_c_instrumenter
 
 
+# True if regions are named `module:qualname` instead of `module.Class:function`
+_qualname_region_names = False
+
+
+def set_region_names(region_names):
+    """
+    Set the naming scheme of the regions of functions.
+    @param region_names `self` to name methods `module.Class:function` after the type of `self`,
+           or `qualname` to use `module:qualname`, which never looks at the locals of a frame
+    """
+    global _qualname_region_names
+    scorep._bindings.set_region_names(region_names)
+    _qualname_region_names = region_names == "qualname"
+
+
+def get_function_name(code):
+    """Get the name of the function of the given code object according to the naming scheme"""
+    if _qualname_region_names:
+        # co_qualname is available since Python 3.11
+        return getattr(code, "co_qualname", code.co_name)
+    return code.co_name
+
+
+def get_callable_name(func):
+    """Get the name of the given function according to the naming scheme"""
+    if _qualname_region_names:
+        return func.__qualname__
+    return func.__name__
+
+
 def get_module_name(frame):
     """Get the name of the module the given frame resides in"""
     modulename = frame.f_globals.get("__name__", None)
@@ -12,6 +46,8 @@ def get_module_name(frame):
             modulename = "numpy.__array_function__"
         else:
             modulename = "unkown"
+    if _qualname_region_names:
+        return modulename
     typeobject = frame.f_locals.get("self", None)
     if typeobject is not None:
         if has_c_instrumenter():
@@ -29,3 +65,76 @@ def get_file_name(frame):
     else:
         full_file_name = "None"
     return full_file_name
+
+
+def get_max_depth():
+    """
+    Get the maximum depth of recorded calls from SCOREP_PYTHON_MAX_DEPTH.
+    Returns 0 if the depth is not limited
+    """
+    max_depth = int(os.environ.get("SCOREP_PYTHON_MAX_DEPTH", 0))
+    if max_depth < 0:
+        raise ValueError("The maximum call depth must not be negative, got {}".format(max_depth))
+    return max_depth
+
+
+def get_burst_filter():
+    """
+    Get the burst filter from SCOREP_PYTHON_BURST_FILTER as a tuple of the minimum number of calls
+    and the maximum mean time of a call in microseconds. Returns None if it is not set
+    """
+    burst_filter = os.environ.get("SCOREP_PYTHON_BURST_FILTER")
+    if not burst_filter:
+        return None
+    try:
+        calls, time = burst_filter.split(",")
+        calls, time = int(calls), float(time)
+    except ValueError:
+        raise ValueError("Expected '<calls>,<microseconds>' for the burst filter, got '{}'".format(burst_filter))
+    if calls <= 0 or time < 0:
+        raise ValueError("The burst filter needs a positive number of calls and time, got '{}'".format(burst_filter))
+    return calls, time
+
+
+def get_c_instrumenter_options():
+    """Get the keyword arguments of scorep._bindings.CInstrumenter set in the environment"""
+    options = {"max_depth": get_max_depth()}
+    burst_filter = get_burst_filter()
+    if burst_filter is not None:
+        options["burst_calls"], options["burst_time"] = burst_filter
+    c_calls = os.environ.get("SCOREP_PYTHON_C_CALLS")
+    if c_calls:
+        options["c_calls"] = [pattern.strip() for pattern in c_calls.split(",") if pattern.strip()]
+    generator_regions = os.environ.get("SCOREP_PYTHON_GENERATOR_REGIONS")
+    if generator_regions:
+        options["generator_regions"] = generator_regions
+    return options
+
+
+def _escape_filter_pattern(name):
+    """
+    Escape a region name for a Score-P filter file, so it only matches itself. The wildcards are
+    wrapped in brackets, which Score-P and `RegionFilter` both read as the literal character
+    """
+    return re.sub(r"([*?[])", r"[\1]", name).replace("#", "\\#")
+
+
+def write_burst_filter_report(instrumenter):
+    """
+    Write the regions excluded by the burst filter of the instrumenter as Score-P filter file
+    `python_burst.filter` into the experiment directory. It can be passed to `--filter-file` in
+    later runs. If there is no experiment directory, the filter is printed to stderr
+    """
+    demoted_regions = instrumenter.demoted_regions
+    if not demoted_regions:
+        return
+    lines = ["# Regions excluded by the burst filter of the Score-P Python bindings",
+             "SCOREP_REGION_NAMES_BEGIN"]
+    lines.extend("  EXCLUDE " + _escape_filter_pattern(name) for name in demoted_regions)
+    lines.append("SCOREP_REGION_NAMES_END")
+    experiment_dir = get_experiment_dir_name()
+    if os.path.isdir(experiment_dir):
+        with open(os.path.join(experiment_dir, "python_burst.filter"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+    else:
+        print("\n".join(lines), file=sys.stderr)
@@ -0,0 +1,221 @@
+__all__ = ['task_factory', 'record_loop', 'EventLoopPolicy', 'install']
+
+import asyncio
+import collections.abc
+import time
+import weakref
+import scorep.user
+
+# User regions of the steps of tasks, by code object of the coroutine
+_task_regions = {}
+# Loops instrumented by record_loop
+_recorded_loops = weakref.WeakSet()
+
+
+def _task_region(code, coro):
+    region = _task_regions.get(code)
+    if region is None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        module_name = frame.f_globals.get("__name__", "unkown") if frame is not None else "unkown"
+        qualname = getattr(coro, "__qualname__", code.co_name)
+        region = scorep.user.Region("asyncio.Task({}.{})".format(module_name, qualname),
+                                    code.co_filename, code.co_firstlineno)
+        _task_regions[code] = region
+    return region
+
+
+class _TaskCoroutine(collections.abc.Coroutine):
+    """
+    Coroutine of an asyncio.Task that records each step of the task as region of its own.
+    Other attributes, like `cr_frame`, are taken from the wrapped coroutine
+    """
+
+    def __init__(self, coro, region):
+        self._coro = coro
+        self._region = region
+
+    def send(self, value):
+        self._region.enter()
+        try:
+            return self._coro.send(value)
+        finally:
+            self._region.exit()
+
+    def throw(self, *args):
+        self._region.enter()
+        try:
+            return self._coro.throw(*args)
+        finally:
+            self._region.exit()
+
+    def close(self):
+        self._coro.close()
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    def __getattr__(self, name):
+        return getattr(self._coro, name)
+
+    def __repr__(self):
+        return repr(self._coro)
+
+
+def task_factory(loop, coro, **kwargs):
+    """
+    Task factory for `loop.set_task_factory()` recording each step of a task as the user region
+    `user:asyncio.Task(<module>.<qualname>)` of its coroutine function.
+    The instrumenter records the coroutines of the task within this region, as each step resumes
+    them and suspends them again. Thus, the steps of the tasks are properly nested, even though
+    the tasks of the loop run interleaved on the same thread
+    """
+    code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None)
+    if code is not None and not isinstance(coro, _TaskCoroutine):
+        coro = _TaskCoroutine(coro, _task_region(code, coro))
+    return asyncio.Task(coro, loop=loop, **kwargs)
+
+
+class _LoopRecorder:
+    """Records the callbacks, the selector and the iterations of an event loop, see record_loop"""
+
+    def __init__(self):
+        self.callback_region = scorep.user.Region("asyncio.callback", __file__, 0)
+        self.select_region = scorep.user.Region("asyncio.select", __file__, 0)
+        self.delay_metric = scorep.user.Metric("asyncio.callback_delay", "s")
+        self.handles_metric = scorep.user.Metric("asyncio.handles_per_iteration", "handles", "uint64")
+        self.handles_run = 0
+
+
+class _Callback:
+    """
+    Callback of a handle of the loop that records its run as region `user:asyncio.callback`.
+    If it was scheduled to run at a certain time, its delay is recorded as metric
+    """
+    __slots__ = ("_callback", "_scheduled", "_recorder")
+
+    def __init__(self, callback, scheduled, recorder):
+        self._callback = callback
+        self._scheduled = scheduled
+        self._recorder = recorder
+
+    def __call__(self, *args):
+        recorder = self._recorder
+        recorder.handles_run += 1
+        if self._scheduled is not None:
+            recorder.delay_metric.trigger(time.monotonic() - self._scheduled)
+        recorder.callback_region.enter()
+        try:
+            return self._callback(*args)
+        finally:
+            recorder.callback_region.exit()
+
+    def __repr__(self):
+        return repr(self._callback)
+
+
+def record_loop(loop):
+    """
+    Record the health of the event loop:
+     * Each callback run by the loop as region `user:asyncio.callback`, so callbacks that block the
+       loop stand out. This includes the steps of tasks and the I/O callbacks of transports.
+     * The delay between the time a callback was scheduled for and its run as metric
+       `asyncio.callback_delay` in seconds.
+     * The time waiting for I/O in the selector as region `user:asyncio.select`.
+     * The number of callbacks run per iteration of the loop as metric
+       `asyncio.handles_per_iteration`.
+    The callbacks are wrapped when they are scheduled, so only the ones scheduled from now on are
+    recorded. Loops that are no `asyncio.BaseEventLoop`, e.g. from uvloop, only record callbacks.
+    @param loop event loop to instrument
+    """
+    if loop in _recorded_loops:
+        return
+    _recorded_loops.add(loop)
+    recorder = _LoopRecorder()
+    monotonic = time.monotonic
+    # The time of the loop is time.monotonic() unless the loop overrides time()
+    timed = isinstance(loop, asyncio.BaseEventLoop)
+
+    # The loop calls its own methods, so the instance attributes replace them for all callers
+    call_soon = loop.call_soon
+    call_soon_threadsafe = loop.call_soon_threadsafe
+    call_at = loop.call_at
+
+    def recorded_call_soon(callback, *args, **kwargs):
+        return call_soon(_Callback(callback, monotonic(), recorder), *args, **kwargs)
+
+    def recorded_call_soon_threadsafe(callback, *args, **kwargs):
+        return call_soon_threadsafe(_Callback(callback, monotonic(), recorder), *args, **kwargs)
+
+    def recorded_call_at(when, callback, *args, **kwargs):
+        return call_at(when, _Callback(callback, when if timed else None, recorder), *args, **kwargs)
+
+    loop.call_soon = recorded_call_soon
+    loop.call_soon_threadsafe = recorded_call_soon_threadsafe
+    loop.call_at = recorded_call_at
+
+    # I/O callbacks run whenever their file descriptor is ready, so they have no delay
+    for name in ("_add_reader", "_add_writer"):
+        add_callback = getattr(loop, name, None)
+        if add_callback is not None:
+            def recorded_add_callback(fd, callback, *args, add_callback=add_callback):
+                return add_callback(fd, _Callback(callback, None, recorder), *args)
+            setattr(loop, name, recorded_add_callback)
+
+    selector = getattr(loop, "_selector", None) or getattr(loop, "_proactor", None)
+    if selector is not None:
+        select = selector.select
+
+        def recorded_select(*args, **kwargs):
+            recorder.select_region.enter()
+            try:
+                return select(*args, **kwargs)
+            finally:
+                recorder.select_region.exit()
+        selector.select = recorded_select
+
+    run_once = getattr(loop, "_run_once", None)
+    if run_once is not None:
+        def recorded_run_once():
+            recorder.handles_run = 0
+            run_once()
+            recorder.handles_metric.trigger(recorder.handles_run)
+        loop._run_once = recorded_run_once
+
+
+class EventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    """
+    Event loop policy instrumenting all new event loops
+    @param tasks install the task_factory
+    @param loop_health record the health of the loops, see record_loop
+    """
+
+    def __init__(self, tasks=True, loop_health=False):
+        super().__init__()
+        self._tasks = tasks
+        self._loop_health = loop_health
+
+    def new_event_loop(self):
+        loop = super().new_event_loop()
+        _instrument_loop(loop, self._tasks, self._loop_health)
+        return loop
+
+
+def _instrument_loop(loop, tasks, loop_health):
+    if tasks:
+        loop.set_task_factory(task_factory)
+    if loop_health:
+        record_loop(loop)
+
+
+def install(loop=None, tasks=True, loop_health=False):
+    """
+    Instrument an event loop, which only applies to the tasks and callbacks created from now on.
+    @param loop event loop to instrument. If None, all event loops created from now on are
+           instrumented by setting the EventLoopPolicy
+    @param tasks record the steps of the tasks, see task_factory
+    @param loop_health record the health of the loop, see record_loop
+    """
+    if loop is None:
+        asyncio.set_event_loop_policy(EventLoopPolicy(tasks, loop_health))
+    else:
+        _instrument_loop(loop, tasks, loop_health)
@@ -0,0 +1,146 @@
+__all__ = ['RegionFilter']
+
+import fnmatch
+import re
+
+
+class RegionFilter:
+    """
+    Decides which Python functions are recorded by the Score-P instrumenters.
+
+    The filter is evaluated only once per code object, the verdict is cached by the bindings.
+    Like in Score-P, rules are evaluated in the order they were added and the last matching rule
+    wins. Region rules (module, name) and file rules (path, file) are evaluated independently.
+    A region is recorded unless one of them excludes it.
+    ```
+    region_filter = RegionFilter()
+    region_filter.exclude_module("numpy*")
+    region_filter.include_name(r"numpy\\.linalg:.*")
+    region_filter.exclude_path("/usr/lib/python3")
+    ```
+    """
+
+    def __init__(self):
+        self._region_rules = []
+        self._file_rules = []
+        # Calls of the methods adding the rules, see __reduce__
+        self._sources = []
+
+    def __bool__(self):
+        return bool(self._region_rules or self._file_rules)
+
+    def __reduce__(self):
+        # The rules hold compiled patterns and closures, so the filter is rebuilt from the calls adding them
+        return (_rebuild_filter, (self._sources,))
+
+    def include_module(self, pattern):
+        """Record modules matching the glob pattern. Methods match as `module.Class`"""
+        self._region_rules.append((True, self._module_matcher(pattern)))
+        self._sources.append(("include_module", pattern))
+
+    def exclude_module(self, pattern):
+        """Do not record modules matching the glob pattern. Methods match as `module.Class`"""
+        self._region_rules.append((False, self._module_matcher(pattern)))
+        self._sources.append(("exclude_module", pattern))
+
+    def include_name(self, regex):
+        """Record regions whose full name `module:function` matches the regular expression"""
+        self._region_rules.append((True, re.compile(regex).fullmatch))
+        self._sources.append(("include_name", regex))
+
+    def exclude_name(self, regex):
+        """Do not record regions whose full name `module:function` matches the regular expression"""
+        self._region_rules.append((False, re.compile(regex).fullmatch))
+        self._sources.append(("exclude_name", regex))
+
+    def include_path(self, prefix):
+        """Record functions defined in files below the given path"""
+        self._file_rules.append((True, self._path_matcher(prefix)))
+        self._sources.append(("include_path", prefix))
+
+    def exclude_path(self, prefix):
+        """Do not record functions defined in files below the given path"""
+        self._file_rules.append((False, self._path_matcher(prefix)))
+        self._sources.append(("exclude_path", prefix))
+
+    def add_filter_file(self, file_name):
+        """
+        Add the rules of a Score-P filter file, see `SCOREP_FILTERING_FILE`.
+        Region name rules match the full region name `module:function`,
+        file name rules match the absolute path of the file.
+        """
+        with open(file_name) as f:
+            self.add_filter_rules(f.read())
+
+    def add_filter_rules(self, text):
+        """Add the rules given in the syntax of a Score-P filter file"""
+        section = None
+        action = None
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            for word in _split_words(line):
+                if word in ("SCOREP_REGION_NAMES_BEGIN", "SCOREP_FILE_NAMES_BEGIN"):
+                    if section is not None:
+                        raise ValueError("Line {}: {} inside of another block".format(line_number, word))
+                    section = self._region_rules if word == "SCOREP_REGION_NAMES_BEGIN" else self._file_rules
+                    action = None
+                elif word in ("SCOREP_REGION_NAMES_END", "SCOREP_FILE_NAMES_END"):
+                    if section is None:
+                        raise ValueError("Line {}: {} without a block".format(line_number, word))
+                    section = None
+                elif section is None:
+                    raise ValueError("Line {}: Unexpected '{}' outside of a block".format(line_number, word))
+                elif word in ("INCLUDE", "EXCLUDE"):
+                    action = word == "INCLUDE"
+                elif word == "MANGLED" and action is not None:
+                    # There are no mangled names in Python
+                    pass
+                elif action is None:
+                    raise ValueError("Line {}: Missing INCLUDE or EXCLUDE before '{}'".format(line_number, word))
+                else:
+                    section.append((action, re.compile(fnmatch.translate(word)).match))
+        if section is not None:
+            raise ValueError("Missing end of the last block")
+        self._sources.append(("add_filter_rules", text))
+
+    def __call__(self, region_name, file_name):
+        """Return True if the region shall be recorded"""
+        return _evaluate(self._region_rules, region_name) and _evaluate(self._file_rules, file_name)
+
+    @staticmethod
+    def _module_matcher(pattern):
+        match_module = re.compile(fnmatch.translate(pattern)).match
+
+        def matcher(region_name):
+            return match_module(region_name.rpartition(":")[0])
+        return matcher
+
+    @staticmethod
+    def _path_matcher(prefix):
+        prefix = prefix.rstrip("/") + "/"
+
+        def matcher(file_name):
+            return file_name.startswith(prefix)
+        return matcher
+
+
+def _rebuild_filter(sources):
+    region_filter = RegionFilter()
+    for method, argument in sources:
+        getattr(region_filter, method)(argument)
+    return region_filter
+
+
+def _evaluate(rules, name):
+    recorded = True
+    for include, matcher in rules:
+        if matcher(name):
+            recorded = include
+    return recorded
+
+
+def _split_words(line):
+    """Split a line of a filter file into words, removing comments. `\\#` is a literal `#`"""
+    comment = re.search(r"(?<!\\)#", line)
+    if comment:
+        line = line[:comment.start()]
+    return line.replace("\\#", "#").split()
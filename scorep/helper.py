@@ -1,7 +1,13 @@
+import json
+import shutil
 import subprocess
 import sys
 import os
 import re
+import tempfile
+
+# Successful results of query by their key, see _query_key
+_query_results = None
 
 
 def print_err(*args):
@@ -33,6 +39,95 @@ def call(arguments):
     return result
 
 
+def get_cache_dir():
+    """
+    Return the directory caching the compiled subsystems and the results of queries:
+    `$SCOREP_PYTHON_CACHE_DIR` if set, otherwise `$XDG_CACHE_HOME/scorep-python`,
+    by default `~/.cache/scorep-python`
+    """
+    if os.environ.get("SCOREP_PYTHON_CACHE_DIR"):
+        return os.environ["SCOREP_PYTHON_CACHE_DIR"]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "scorep-python")
+
+
+def _query_cache_file():
+    return os.path.join(get_cache_dir(), "queries.json")
+
+
+def _query_key(arguments):
+    """
+    Return the key of the call of arguments in the query cache, or None if the binary is not found.
+    The key contains the path and the modification time of the binary, so a reinstalled binary
+    does not reuse old results
+    """
+    binary = shutil.which(arguments[0])
+    if binary is None:
+        return None
+    binary = os.path.realpath(binary)
+    return json.dumps([binary, os.stat(binary).st_mtime_ns] + list(arguments[1:]))
+
+
+def _load_query_results():
+    try:
+        with open(_query_cache_file()) as f:
+            results = json.load(f)
+        if isinstance(results, dict):
+            return results
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _store_query_results(new_results):
+    """Merge the results into the cache file, replacing it atomically. Errors are ignored"""
+    cache_file = _query_cache_file()
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        results = _load_query_results()
+        results.update(new_results)
+        fd, temp_file = tempfile.mkstemp(prefix=".queries.", dir=os.path.dirname(cache_file))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(results, f)
+            os.replace(temp_file, cache_file)
+        except BaseException:
+            os.remove(temp_file)
+            raise
+    except OSError:
+        pass
+
+
+def query(arguments_list):
+    """
+    Return a list with a triple (returncode, stdout, stderr) like `call` for each of the arguments.
+    The calls not cached yet are run concurrently. Successful results are cached in memory and in
+    get_cache_dir(), so later runs, including the restarted interpreter, reuse them.
+
+    @param arguments_list list of the arguments of the calls, e.g. [["scorep-config", "--libs"]]
+    """
+    global _query_results
+    if _query_results is None:
+        _query_results = _load_query_results()
+
+    keys = [_query_key(arguments) for arguments in arguments_list]
+    results = [_query_results.get(key) if key is not None else None for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if len(missing) == 1:
+        results[missing[0]] = call(arguments_list[missing[0]])
+    elif missing:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+            for i, result in zip(missing, executor.map(call, [arguments_list[i] for i in missing])):
+                results[i] = result
+
+    new_results = {keys[i]: results[i] for i in missing if keys[i] is not None and results[i][0] == 0}
+    if new_results:
+        _query_results.update(new_results)
+        _store_query_results(new_results)
+    return [tuple(result) for result in results]
+
+
 def get_python_version():
     version = "{}.{}".format(
         sys.version_info.major,
@@ -41,7 +136,7 @@ def get_python_version():
 
 
 def get_scorep_version():
-    (return_code, std_out, std_err) = call(["scorep", "--version"])
+    (return_code, std_out, std_err) = query([["scorep", "--version"]])[0]
     if (return_code != 0):
         raise RuntimeError("Cannot call Score-P, reason {}".format(std_err))
     me = re.search("([0-9.]+)", std_out)
@@ -55,7 +150,7 @@ def get_scorep_version():
 
 
 def get_scorep_config(config_line=None):
-    (return_code, std_out, std_err) = call(["scorep-info", "config-summary"])
+    (return_code, std_out, std_err) = query([["scorep-info", "config-summary"]])[0]
     if (return_code != 0):
         raise RuntimeError("Cannot call Score-P, reason {}".format(std_err))
     if config_line is None:
@@ -85,16 +180,17 @@ def generate_compile_deps(config):
 
     scorep_config = ["scorep-config"] + config
 
-    (return_code, stdout, stderr) = call(scorep_config)
+    ((return_code, stdout, stderr), (_, ldflags, _), (_, libs, _), (_, mgmt_libs, _), (_, cflags, _)) = query([
+        scorep_config,
+        scorep_config + ["--ldflags"],
+        scorep_config + ["--libs"],
+        scorep_config + ["--mgmt-libs"],
+        scorep_config + ["--cflags"],
+    ])
     if return_code != 0:
         raise ValueError(
             "given config {} is not supported\nstdout: {}\nstrerr: {}".format(config, stdout, stderr))
 
-    (_, ldflags, _) = call(scorep_config + ["--ldflags"])
-    (_, libs, _) = call(scorep_config + ["--libs"])
-    (_, mgmt_libs, _) = call(scorep_config + ["--mgmt-libs"])
-    (_, cflags, _) = call(scorep_config + ["--cflags"])
-
     libs = " " + libs + " " + mgmt_libs
     ldflags = " " + ldflags
     cflags = " " + cflags
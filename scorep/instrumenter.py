@@ -2,8 +2,11 @@ import inspect
 import os
 import platform
 import functools
+import sys
 
 global_instrumenter = None
+# Whether Score-P is loaded into this process, see is_scorep_loaded
+_scorep_loaded = None
 
 
 def has_c_instrumenter():
@@ -13,6 +16,55 @@ def has_c_instrumenter():
     return platform.python_implementation() != 'PyPy'
 
 
+def has_monitoring_instrumenter():
+    """Return true if the C instrumenter using sys.monitoring (PEP 669) is available"""
+    return has_c_instrumenter() and sys.version_info >= (3, 12)
+
+
+def has_sampling_instrumenter():
+    """Return true if the sampling C instrumenter is available"""
+    return has_c_instrumenter() and sys.version_info >= (3, 9)
+
+
+def is_scorep_loaded():
+    """
+    Return True if Score-P is loaded into this process already, e.g. linked into the interpreter
+    or preloaded by the user
+    """
+    global _scorep_loaded
+    if _scorep_loaded is not None:
+        return _scorep_loaded
+    try:
+        with open("/proc/self/maps") as f:
+            maps = f.read()
+    except OSError:
+        maps = os.environ.get("LD_PRELOAD", "")
+    _scorep_loaded = "libscorep_measurement" in maps or "libscorep_init_subsystem" in maps
+    return _scorep_loaded
+
+
+def is_measurement_active():
+    """
+    Return True if Score-P measures this process: An instrumenter other than `dummy` was created,
+    e.g. by `python -m scorep`, or Score-P is loaded, see attach().
+    Otherwise, the user instrumentation of scorep.user and enable/disable are no-ops
+    """
+    if global_instrumenter is not None:
+        from scorep._instrumenters.dummy import ScorepDummy
+        return not isinstance(global_instrumenter, ScorepDummy)
+    return is_scorep_loaded()
+
+
+def default_instrumenter_type():
+    """Return the default instrumenter type: `cMonitoring` if available, otherwise `cProfile` or `profile`"""
+    if has_monitoring_instrumenter():
+        return "cMonitoring"
+    elif has_c_instrumenter():
+        return "cProfile"
+    else:
+        return "profile"
+
+
 def get_instrumenter(enable_instrumenter=False,
                      instrumenter_type="dummy"):
     """
@@ -20,7 +72,8 @@ def get_instrumenter(enable_instrumenter=False,
 
     @param enable_instrumenter True if the Instrumenter should be enabled when run is called
     @param instrumenter_type which python tracing interface to use.
-           Currently available: `profile` (default), `trace` and `dummy`
+           Currently available: `profile` (default), `trace`, `cProfile`, `cTrace`, `cMonitoring`, `cSampling`
+           and `dummy`
     """
     global global_instrumenter
     if global_instrumenter is None:
@@ -39,12 +92,53 @@ def get_instrumenter(enable_instrumenter=False,
         elif instrumenter_type == "cProfile":
             from scorep._instrumenters.scorep_cProfile import ScorepCProfile
             global_instrumenter = ScorepCProfile(enable_instrumenter)
+        elif instrumenter_type == "cMonitoring":
+            from scorep._instrumenters.scorep_cMonitoring import ScorepCMonitoring
+            global_instrumenter = ScorepCMonitoring(enable_instrumenter)
+        elif instrumenter_type == "cSampling":
+            from scorep._instrumenters.scorep_cSampling import ScorepCSampling
+            global_instrumenter = ScorepCSampling(enable_instrumenter)
         else:
             raise RuntimeError('instrumenter_type "{}" unkown'.format(instrumenter_type))
 
     return global_instrumenter
 
 
+def attach(instrumenter_type=None, region_filter=None):
+    """
+    Attach the instrumentation of Python to the measurement of a host that runs Score-P already,
+    e.g. a C/C++ application embedding the interpreter that was instrumented with `scorep --user`.
+    Unlike `python -m scorep`, no subsystem is built and the interpreter is not restarted.
+    The Python functions of all threads are recorded from now on, until detach() is called.
+    Returns the instrumenter.
+
+    @param instrumenter_type which python tracing interface to use, see get_instrumenter.
+           Defaults to default_instrumenter_type()
+    @param region_filter callable deciding which functions are recorded,
+           e.g. a scorep.filter.RegionFilter, see set_region_filter of the instrumenter
+    """
+    global global_instrumenter
+    if not is_scorep_loaded():
+        raise RuntimeError("Score-P is not loaded into this process. Please use `python -m scorep` instead")
+    if instrumenter_type is None:
+        instrumenter_type = default_instrumenter_type()
+    if not is_measurement_active():
+        # Replace the dummy instrumenter created by user instrumentation before
+        global_instrumenter = None
+    instrumenter = get_instrumenter(True, instrumenter_type)
+    if region_filter is not None:
+        instrumenter.set_region_filter(region_filter)
+    instrumenter.register()
+    return instrumenter
+
+
+def detach():
+    """
+    Stop the instrumentation started by attach(), e.g. before the host finalizes its measurement.
+    """
+    get_instrumenter().unregister()
+
+
 def register():
     """
     Reenables the python-tracing.
@@ -72,8 +166,15 @@ class enable():
     ```
     This overides --noinstrumenter (--nopython legacy)
     If a region name is given, the region the contextmanager is active will be marked in the trace or profile
+    Without a measurement, see is_measurement_active, a shared no-op object is returned
     """
 
+    def __new__(cls, region_name=""):
+        if not is_measurement_active():
+            from scorep._instrumenters.dummy import no_op_region
+            return no_op_region
+        return super().__new__(cls)
+
     def __init__(self, region_name=""):
         self.region_name = region_name
         if region_name == "":
@@ -95,6 +196,8 @@ class enable():
 
     def __enter__(self):
         self.tracer_registered = get_instrumenter().get_registered()
+        # Number of suppressions of the calling thread lifted, see disable
+        self.resumed = 0
         if not self.tracer_registered:
             if self.user_region_name:
                 self.module_name = "user_instrumenter"
@@ -110,11 +213,22 @@ class enable():
                     self.module_name, self.region_name, full_file_name,
                     line_number)
 
-            get_instrumenter().register()
+            instrumenter = get_instrumenter()
+            if instrumenter.is_suppressed():
+                while instrumenter.is_suppressed():
+                    instrumenter.resume()
+                    self.resumed += 1
+            else:
+                instrumenter.register()
 
     def __exit__(self, exc_type=None, exc_value=None, traceback=None):
         if not self.tracer_registered:
-            get_instrumenter().unregister()
+            instrumenter = get_instrumenter()
+            if self.resumed:
+                for _ in range(self.resumed):
+                    instrumenter.suppress()
+            else:
+                instrumenter.unregister()
 
             if self.user_region_name:
                 get_instrumenter().region_end(
@@ -130,8 +244,17 @@ class disable():
     ```
     This overides --noinstrumenter (--nopython legacy)
     If a region name is given, the region the contextmanager is active will be marked in the trace or profile
+    Only the calling thread is affected. The instrumenter stays registered and just suppresses its events,
+    so entering and leaving are cheap and can be nested
+    Without a measurement, see is_measurement_active, a shared no-op object is returned
     """
 
+    def __new__(cls, region_name=""):
+        if not is_measurement_active():
+            from scorep._instrumenters.dummy import no_op_region
+            return no_op_region
+        return super().__new__(cls)
+
     def __init__(self, region_name=""):
         self.region_name = region_name
         if region_name == "":
@@ -158,7 +281,7 @@ class disable():
     def __enter__(self):
         self.tracer_registered = get_instrumenter().get_registered()
         if self.tracer_registered:
-            get_instrumenter().unregister()
+            get_instrumenter().suppress()
 
             if self.user_region_name:
                 self.module_name = "user_instrumenter"
@@ -180,4 +303,4 @@ class disable():
                 get_instrumenter().region_end(
                     self.module_name, self.region_name)
 
-            get_instrumenter().register()
+            get_instrumenter().resume()
@@ -0,0 +1,108 @@
+__all__ = ['install']
+
+import atexit
+import multiprocessing.spawn
+import multiprocessing.util
+import os
+import threading
+import scorep.instrumenter
+import scorep.subsystem
+
+# Arguments of _instrument_child for the child processes, set by install
+_child_arguments = None
+# Serializes the changes of the environment while a child process is started
+_environment_lock = threading.Lock()
+
+
+class _ChildInstrumentation:
+    """
+    Entry of the preparation data that multiprocessing sends to a child process started by spawn or
+    forkserver. Unpickling it instruments the child, before the process object is unpickled and run
+    """
+
+    def __init__(self, arguments):
+        self._arguments = arguments
+
+    def __reduce__(self):
+        return (_instrument_child, self._arguments)
+
+
+def _get_preparation_data(name, get_preparation_data=multiprocessing.spawn.get_preparation_data):
+    data = get_preparation_data(name)
+    if _child_arguments is not None:
+        data["scorep_instrumentation"] = _ChildInstrumentation(_child_arguments)
+    return data
+
+
+def _spawnv_passfds(path, args, passfds, spawnv_passfds=multiprocessing.util.spawnv_passfds):
+    # Only the processes running the code of the application load Score-P. Not the resource tracker of
+    # multiprocessing, nor other subprocesses
+    ld_preload = scorep.subsystem.get_scorep_ld_preload()
+    command = " ".join(os.fsdecode(arg) for arg in args)
+    if (_child_arguments is None or ld_preload is None
+            or ("spawn_main" not in command and "multiprocessing.forkserver" not in command)):
+        return spawnv_passfds(path, args, passfds)
+    with _environment_lock:
+        old_ld_preload = os.environ.get("LD_PRELOAD")
+        os.environ["LD_PRELOAD"] = ld_preload
+        try:
+            return spawnv_passfds(path, args, passfds)
+        finally:
+            if old_ld_preload is None:
+                del os.environ["LD_PRELOAD"]
+            else:
+                os.environ["LD_PRELOAD"] = old_ld_preload
+
+
+def _instrument_child(instrumenter_type, enable_instrumenter, region_filter):
+    """Instrument a child process like its parent and the processes it starts in turn"""
+    if not scorep.instrumenter.is_scorep_loaded():
+        # e.g. the parent was not started by `python -m scorep`
+        return None
+    # Score-P reads the environment when the measurement of the child starts with its first event
+    experiment_directory = os.environ.get("SCOREP_EXPERIMENT_DIRECTORY")
+    if experiment_directory:
+        os.environ["SCOREP_EXPERIMENT_DIRECTORY"] = "{}-{}".format(experiment_directory.rstrip("/"), os.getpid())
+    scorep.subsystem.reset_preload()
+    if enable_instrumenter:
+        scorep.instrumenter.attach(instrumenter_type, region_filter)
+        atexit.register(scorep.instrumenter.detach)
+    else:
+        instrumenter = scorep.instrumenter.get_instrumenter(False, instrumenter_type)
+        if region_filter is not None:
+            instrumenter.set_region_filter(region_filter)
+    install(instrumenter_type, enable_instrumenter, region_filter)
+    return None
+
+
+def _after_fork_in_child():
+    """
+    A forked child shares the measurement of its parent up to the fork and must not continue it.
+    So it records no Python events at all
+    """
+    from scorep._instrumenters.dummy import ScorepDummy
+    instrumenter = scorep.instrumenter.global_instrumenter
+    if instrumenter is not None and not isinstance(instrumenter, ScorepDummy):
+        instrumenter.unregister()
+        scorep.instrumenter.global_instrumenter = ScorepDummy(False)
+
+
+def install(instrumenter_type, enable_instrumenter=True, region_filter=None):
+    """
+    Instrument the Python processes that multiprocessing starts from now on, including the workers of
+    `concurrent.futures.ProcessPoolExecutor`.
+    Processes started by spawn or forkserver load Score-P and record their own measurement. If
+    `SCOREP_EXPERIMENT_DIRECTORY` is set, each one writes to `<directory>-<pid>`, otherwise Score-P
+    picks a unique directory per process. Forked processes record no Python events, as they cannot
+    continue the measurement of their parent.
+    @param instrumenter_type instrumenter of the child processes, see scorep.instrumenter.get_instrumenter
+    @param enable_instrumenter record the Python functions of the child processes right away
+    @param region_filter filter of the functions recorded by the child processes, e.g. a
+           scorep.filter.RegionFilter, which must be picklable
+    """
+    global _child_arguments
+    if _child_arguments is None:
+        multiprocessing.spawn.get_preparation_data = _get_preparation_data
+        multiprocessing.util.spawnv_passfds = _spawnv_passfds
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+    _child_arguments = (instrumenter_type, enable_instrumenter, region_filter)
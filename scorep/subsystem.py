@@ -1,7 +1,10 @@
+import hashlib
+import json
 import os
 import tempfile
 import shutil
 
+import scorep._version
 import scorep.helper
 from scorep.helper import print_err
 
@@ -28,7 +31,7 @@ def generate_ld_preload(scorep_config):
     @return ld_preload string which needs to be passed to LD_PRELOAD
     """
 
-    (_, preload, _) = scorep.helper.call(["scorep-config"] + scorep_config + ["--preload-libs"])
+    (_, preload, _) = scorep.helper.query([["scorep-config"] + scorep_config + ["--preload-libs"]])[0]
     return preload.strip()
 
 
@@ -39,24 +42,121 @@ def generate_subsystem_code(config):
 
     scorep_config = ["scorep-config"] + config
 
-    (return_code, _, _) = scorep.helper.call(scorep_config)
+    ((return_code, _, _), (_, scorep_adapter_init, _)) = scorep.helper.query([
+        scorep_config,
+        scorep_config + ["--adapter-init"],
+    ])
     if return_code != 0:
         raise ValueError(
             "given config {} is not supported".format(scorep_config))
-    (_, scorep_adapter_init, _) = scorep.helper.call(
-        scorep_config + ["--adapter-init"])
 
     return scorep_adapter_init
 
 
+def subsystem_cache_key(scorep_config):
+    """
+    Return the hash identifying the subsystem built for the scorep_config.
+    It covers the Score-P installation and version, the Python version and the version of the
+    bindings, which generate the sources of the subsystem.
+
+    @param scorep_config scorep configuration to build subsystem
+    """
+    scorep_config_path = shutil.which("scorep-config")
+    if scorep_config_path is None:
+        raise RuntimeError("Cannot find scorep-config in $PATH")
+    scorep_config_path = os.path.realpath(scorep_config_path)
+    (_, scorep_version, _) = scorep.helper.query([[scorep_config_path, "--version"]])[0]
+    key = {
+        "scorep_config": scorep_config,
+        "scorep_config_path": scorep_config_path,
+        "scorep_config_mtime": os.stat(scorep_config_path).st_mtime_ns,
+        "scorep_version": scorep_version.strip(),
+        "python_version": scorep.helper.get_python_version(),
+        "bindings_version": scorep._version.__version__,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
 def generate(scorep_config, keep_files=False):
     """
     Uses the scorep_config to compile the scorep subsystem.
-    Returns the name of the compiled subsystem, and the path of the temp folder, where the lib is located
+    Returns the name of the compiled subsystem, and the path of the folder, where the lib is located.
+
+    The subsystem is cached in scorep.helper.get_cache_dir(), so later runs with the same
+    configuration skip the compilation. It is built in a temporary folder next to the cache entry
+    and published by renaming that folder, so concurrent runs never see a partial entry. Only one
+    run builds it at a time, the others wait for it, e.g. all MPI ranks sharing the cache. If the
+    cache is not writeable, or the files shall be kept, the subsystem is built in a temporary folder
+    that is deleted by clean_up.
 
     @param scorep_config scorep configuration to build subsystem
     @param keep_files whether to keep the generated files, or not.
     """
+    subsystem_lib_name = generate_subsystem_lib_name()
+    if not keep_files:
+        cache_dir = os.path.join(scorep.helper.get_cache_dir(), subsystem_cache_key(scorep_config))
+        # Only a temporary folder is deleted by clean_up, the variable might be inherited
+        os.environ.pop("SCOREP_PYTHON_BINDINGS_TEMP_DIR", None)
+        if os.path.exists(os.path.join(cache_dir, subsystem_lib_name)):
+            return subsystem_lib_name, cache_dir
+        try:
+            os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+            lock_file = open(cache_dir + ".lock", "a")
+        except OSError:
+            # Fall back to a temporary folder
+            pass
+        else:
+            with lock_file:
+                _lock(lock_file)
+                # Another run might have built it while waiting for the lock
+                if not os.path.exists(os.path.join(cache_dir, subsystem_lib_name)):
+                    _build_cached(scorep_config, cache_dir)
+            return subsystem_lib_name, cache_dir
+
+    temp_dir = tempfile.mkdtemp(prefix="scorep.")
+    if keep_files:
+        _print_info("Score-P files are kept at: " + temp_dir)
+    build(scorep_config, temp_dir)
+    os.environ["SCOREP_PYTHON_BINDINGS_TEMP_DIR"] = temp_dir
+    return subsystem_lib_name, temp_dir
+
+
+def _lock(lock_file):
+    """
+    Lock the file exclusively until it is closed. File systems without support for locks
+    are ignored, the atomic rename in _build_cached still keeps the cache consistent
+    """
+    try:
+        import fcntl
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+    except (ImportError, OSError):
+        pass
+
+
+def _build_cached(scorep_config, cache_dir):
+    """Build the subsystem in a temporary folder and publish it as cache_dir"""
+    subsystem_lib_name = generate_subsystem_lib_name()
+    build_dir = tempfile.mkdtemp(prefix=".build.", dir=os.path.dirname(cache_dir))
+    try:
+        build(scorep_config, build_dir)
+        os.rename(build_dir, cache_dir)
+    except OSError:
+        # Another run published the same subsystem first
+        if not os.path.exists(os.path.join(cache_dir, subsystem_lib_name)):
+            raise
+    finally:
+        if os.path.exists(build_dir):
+            shutil.rmtree(build_dir)
+
+
+def build(scorep_config, build_dir):
+    """
+    Compiles the scorep subsystem into the folder build_dir.
+    Returns the name of the compiled subsystem.
+
+    @param scorep_config scorep configuration to build subsystem
+    @param build_dir existing folder to put the sources and the lib in
+    """
 
     (include, lib, lib_dir, macro,
      linker_flags_tmp) = scorep.helper.generate_compile_deps(scorep_config)
@@ -82,11 +182,7 @@ def generate(scorep_config, keep_files=False):
     linker_flags.extend(lib)
     linker_flags.extend(linker_flags_tmp)
 
-    temp_dir = tempfile.mkdtemp(prefix="scorep.")
-    if keep_files:
-        _print_info("Score-P files are kept at: " + temp_dir)
-
-    with open(temp_dir + "/scorep_init.c", "w") as f:
+    with open(build_dir + "/scorep_init.c", "w") as f:
         f.write(scorep_adapter_init)
 
     subsystem_lib_name = generate_subsystem_lib_name()
@@ -99,17 +195,16 @@ def generate(scorep_config, keep_files=False):
     cc = new_compiler()
 
     compiled_subsystem = cc.compile(
-        [temp_dir + "/scorep_init.c"], output_dir=temp_dir)
+        [build_dir + "/scorep_init.c"], output_dir=build_dir)
     cc.link(
         "scorep_init_mpi",
         objects=compiled_subsystem,
         output_filename=subsystem_lib_name,
-        output_dir=temp_dir,
+        output_dir=build_dir,
         library_dirs=lib_dir,
         extra_postargs=linker_flags)
 
-    os.environ["SCOREP_PYTHON_BINDINGS_TEMP_DIR"] = temp_dir
-    return subsystem_lib_name, temp_dir
+    return subsystem_lib_name
 
 
 def init_environment(scorep_config, keep_files=False, verbose=False):
@@ -133,17 +228,18 @@ def init_environment(scorep_config, keep_files=False, verbose=False):
 
     old_env = os.environ.copy()
 
-    subsystem_lib_name, temp_dir = generate(scorep_config, keep_files)
+    _resolve_queries(scorep_config)
+    subsystem_lib_name, lib_dir = generate(scorep_config, keep_files)
     scorep_ld_preload = generate_ld_preload(scorep_config)
 
-    if not os.access(temp_dir + "/" + subsystem_lib_name, os.X_OK):
+    if not os.access(lib_dir + "/" + subsystem_lib_name, os.X_OK):
         clean_up(keep_files=keep_files)
         raise RuntimeError(
-            "The Score-P Subsystem Library at {} cannot be executed. Changing $TMP might help. "
-            "Directory erased, use --keep-files to inspect the situation.".format(
-                temp_dir + "/" + subsystem_lib_name))
+            "The Score-P Subsystem Library at {} cannot be executed. Changing $XDG_CACHE_HOME or $TMP "
+            "might help. Use --keep-files to inspect the situation.".format(
+                lib_dir + "/" + subsystem_lib_name))
 
-    scorep.helper.add_to_ld_library_path(temp_dir)
+    scorep.helper.add_to_ld_library_path(lib_dir)
 
     preload_str = scorep_ld_preload + " " + subsystem_lib_name
     if os.environ.get("LD_PRELOAD"):
@@ -164,17 +260,64 @@ def init_environment(scorep_config, keep_files=False, verbose=False):
             _print_info('%s="%s"' % (var, new_val))
 
 
+def _resolve_queries(scorep_config):
+    """Resolve all queries needed by init_environment at once, they are independent of each other"""
+    scorep_config_call = ["scorep-config"] + scorep_config
+    scorep.helper.query([["scorep-config", "--version"]] + [scorep_config_call + flags for flags in (
+        [], ["--preload-libs"], ["--adapter-init"], ["--ldflags"], ["--libs"], ["--mgmt-libs"], ["--cflags"])])
+
+
+def prepare(scorep_config, verbose=False):
+    """
+    Build the subsystem into the cache ahead of time and resolve the queries of init_environment.
+    Later runs with the same configuration, e.g. all ranks of an MPI job, then only read the cache,
+    which may be read-only by then.
+    Returns the folder of the subsystem.
+
+    @param scorep_config configuration flags for score-p
+    @param verbose Set to True to output information about config used.
+    """
+    if "--user" not in scorep_config:
+        scorep_config.append("--user")
+    if verbose:
+        _print_info("Score-P config: %s" % scorep_config)
+
+    _resolve_queries(scorep_config)
+    _, lib_dir = generate(scorep_config)
+    if os.environ.get("SCOREP_PYTHON_BINDINGS_TEMP_DIR"):
+        clean_up(keep_files=False)
+        del os.environ["SCOREP_PYTHON_BINDINGS_TEMP_DIR"]
+        raise RuntimeError("Cannot write the Score-P Subsystem Library to the cache at {}".format(
+            scorep.helper.get_cache_dir()))
+    return lib_dir
+
+
+# `LD_PRELOAD` set by init_environment and removed by reset_preload
+_scorep_ld_preload = None
+
+
 def reset_preload():
     """
     resets the environment variable `LD_PRELOAD` to the value before init_environment was called.
+    The value set by init_environment is kept, see get_scorep_ld_preload.
     """
-    if "SCOREP_LD_PRELOAD_BACKUP" in os.environ:
+    global _scorep_ld_preload
+    if "SCOREP_LD_PRELOAD_BACKUP" in os.environ and "LD_PRELOAD" in os.environ:
+        _scorep_ld_preload = os.environ["LD_PRELOAD"]
         if os.environ["SCOREP_LD_PRELOAD_BACKUP"] == "":
             del os.environ["LD_PRELOAD"]
         else:
             os.environ["LD_PRELOAD"] = os.environ["SCOREP_LD_PRELOAD_BACKUP"]
 
 
+def get_scorep_ld_preload():
+    """
+    Return the value of `LD_PRELOAD` set by init_environment, which loads Score-P into a process,
+    or None if reset_preload did not remove it.
+    """
+    return _scorep_ld_preload
+
+
 def clean_up(keep_files=True):
     """
     deletes the files that are associated to subsystem
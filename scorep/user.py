@@ -1,8 +1,13 @@
 import inspect
-import os.path
+import os
+import sys
 import scorep.instrumenter
+from scorep.instrumenter import is_measurement_active
 import functools
 
+# User regions created by `region`, by region name and file name
+_user_regions = {}
+
 
 def region_begin(name, file_name=None, line_number=None):
     """
@@ -12,6 +17,8 @@ def region_begin(name, file_name=None, line_number=None):
     @param file_name file name of the user region
     @param line_number line number of the user region
     """
+    if not is_measurement_active():
+        return
     with scorep.instrumenter.disable():
         if file_name is None or line_number is None:
             frame = inspect.currentframe().f_back
@@ -27,9 +34,37 @@ def region_begin(name, file_name=None, line_number=None):
 
 
 def region_end(name):
+    if not is_measurement_active():
+        return
     scorep.instrumenter.get_instrumenter().region_end("user", name)
 
 
+def Region(name, file_name=None, line_number=None):
+    """
+    Return a handle of the user region `user:<name>`. The region is initialised once, so entering
+    and leaving it only costs one native call each:
+    ```
+    step = Region("solver.step")
+    for i in range(iterations):
+        step.enter()
+        do stuff
+        step.exit()
+    ```
+    The handle can also be used as context manager or as decorator.
+    If file_name or line_number is None, both will be determined automatically
+    @param name name of the user region
+    @param file_name file name of the user region
+    @param line_number line number of the user region
+    """
+    if not is_measurement_active():
+        return scorep.instrumenter.get_instrumenter().user_region(name, None, 0)
+    if file_name is None or line_number is None:
+        frame = sys._getframe(1)
+        file_name = frame.f_globals.get('__file__', None)
+        line_number = frame.f_lineno
+    return scorep.instrumenter.get_instrumenter().user_region(name, file_name, line_number)
+
+
 class region(object):
     """
     Context manager or decorator for regions:
@@ -42,17 +77,35 @@ class region(object):
         do stuff
     ```
 
+    If a region name is given, a native region object is returned, which is created once per name
+    and file. Entering and leaving it costs one native call each. The line number is taken from
+    the first place in the file the region is created.
+
+    Without a measurement, see scorep.instrumenter.is_measurement_active, a shared no-op object is
+    returned, which returns decorated functions unchanged.
+
     details for decorator stuff:
     https://github.com/python/cpython/blob/3.8/Lib/contextlib.py#L71
 
     """
 
+    def __new__(cls, region_name=""):
+        if not is_measurement_active():
+            return scorep.instrumenter.get_instrumenter().user_region(region_name, None, 0)
+        if region_name == "":
+            return super(region, cls).__new__(cls)
+        frame = sys._getframe(1)
+        key = (region_name, frame.f_globals.get('__file__', None))
+        user_region = _user_regions.get(key)
+        if user_region is None:
+            user_region = scorep.instrumenter.get_instrumenter().user_region(
+                region_name, key[1], frame.f_lineno)
+            _user_regions[key] = user_region
+        return user_region
+
     def __init__(self, region_name=""):
+        # Only called without a region name, see __new__
         self.region_name = region_name
-        if region_name == "":
-            self.user_region_name = False
-        else:
-            self.user_region_name = True
         self.module_name = ""
         self.func = None
 
@@ -60,68 +113,49 @@ class region(object):
         return self
 
     def __call__(self, func):
-        with scorep.instrumenter.disable():
-            self.func = func
+        self.func = func
 
-            @functools.wraps(func)
-            def inner(*args, **kwds):
-                with self._recreate_cm():
-                    return func(*args, **kwds)
+        @functools.wraps(func)
+        def inner(*args, **kwds):
+            with self._recreate_cm():
+                return func(*args, **kwds)
 
-            return inner
+        return inner
 
     def __enter__(self):
         initally_registered = scorep.instrumenter.get_instrumenter().get_registered()
-        with scorep.instrumenter.disable():
-            if self.user_region_name:
-                # The user did specify a region name, so its a user_region
-                self.module_name = "user"
-                frame = inspect.currentframe().f_back
-                file_name = frame.f_globals.get('__file__', None)
-                line_number = frame.f_lineno
-                if file_name is not None:
-                    full_file_name = os.path.abspath(file_name)
-                else:
-                    full_file_name = "None"
-
+        if callable(self.func) and not initally_registered:
+            # It's a callable, so it's a semi instrumented region
+            self.code_obj = self.func.__code__
+            if not scorep.instrumenter.get_instrumenter().try_region_begin(self.code_obj):
+                # Only imported with a measurement, which requires the bindings
+                from scorep._instrumenters.utils import get_callable_name
+                self.region_name = get_callable_name(self.func)
+                self.module_name = self.func.__module__
+                file_name = self.func.__code__.co_filename
+                line_number = self.func.__code__.co_firstlineno
                 scorep.instrumenter.get_instrumenter().region_begin(
-                    self.module_name, self.region_name, full_file_name, line_number)
-            elif callable(self.func) and not initally_registered:
-                # The user did not specify a region name, and it's a callable, so it's a semi instrumented region
-                self.code_obj = self.func.__code__
-                if not scorep.instrumenter.get_instrumenter().try_region_begin(self.code_obj):
-                    self.region_name = self.func.__name__
-                    self.module_name = self.func.__module__
-                    file_name = self.func.__code__.co_filename
-                    line_number = self.func.__code__.co_firstlineno
-                    scorep.instrumenter.get_instrumenter().region_begin(
-                        self.module_name, self.region_name, file_name, line_number, self.code_obj)
-            elif callable(self.func) and initally_registered:
-                # The user did not specify a region name, and it's a callable, so it's a
-                # semi instrumented region. However, the instrumenter is active, so there
-                # is nothing to do.
-                pass
-            else:
-                # The user did not specify a region name, and it's not a callable. So it
-                # is a context region without a region name. Throw an error.
-                raise RuntimeError("A region name needs to be specified.")
+                    self.module_name, self.region_name, file_name, line_number, self.code_obj)
+        elif callable(self.func) and initally_registered:
+            # It's a callable, so it's a semi instrumented region. However, the instrumenter is
+            # active, so there is nothing to do.
+            pass
+        else:
+            # The user did not specify a region name, and it's not a callable. So it
+            # is a context region without a region name. Throw an error.
+            raise RuntimeError("A region name needs to be specified.")
 
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         initally_registered = scorep.instrumenter.get_instrumenter().get_registered()
-        if self.user_region_name:
-            # The user did specify a region name, so its a user_region
-            scorep.instrumenter.get_instrumenter().region_end(
-                self.module_name, self.region_name)
-        elif callable(self.func) and not initally_registered:
-            # The user did not specify a region name, and it's a callable, so it's a semi instrumented region
+        if callable(self.func) and not initally_registered:
+            # It's a callable, so it's a semi instrumented region
             if not scorep.instrumenter.get_instrumenter().try_region_end(self.code_obj):
                 scorep.instrumenter.get_instrumenter().region_end(self.module_name, self.region_name, self.code_obj)
         elif callable(self.func) and initally_registered:
-            # The user did not specify a region name, and it's a callable, so it's a
-            # semi instrumented region. However, the instrumenter is active, so there
-            # is nothing to do.
+            # It's a callable, so it's a semi instrumented region. However, the instrumenter is
+            # active, so there is nothing to do.
             pass
         else:
             # The user did not specify a region name, and it's not a callable. So it
@@ -149,6 +183,8 @@ def rewind_begin(name, file_name=None, line_number=None):
     @param file_name file name of the user region
     @param line_number line number of the user region
     """
+    if not is_measurement_active():
+        return
     with scorep.instrumenter.disable():
         if file_name is None or line_number is None:
             frame = inspect.currentframe().f_back
@@ -172,6 +208,30 @@ def rewind_end(name, value):
     scorep.instrumenter.get_instrumenter().rewind_end(name, value)
 
 
+def RewindRegion(name, file_name=None, line_number=None):
+    """
+    Return a handle of the rewind region `<name>`. The region is initialised once, so entering
+    and leaving it only costs one native call each:
+    ```
+    rewind = RewindRegion("solver.step")
+    rewind.enter()
+    do stuff
+    rewind.exit(discard_events)
+    ```
+    If file_name or line_number is None, both will be determined automatically
+    @param name name of the rewind region
+    @param file_name file name of the rewind region
+    @param line_number line number of the rewind region
+    """
+    if not is_measurement_active():
+        return scorep.instrumenter.get_instrumenter().rewind_region(name, None, 0)
+    if file_name is None or line_number is None:
+        frame = sys._getframe(1)
+        file_name = frame.f_globals.get('__file__', None)
+        line_number = frame.f_lineno
+    return scorep.instrumenter.get_instrumenter().rewind_region(name, file_name, line_number)
+
+
 def enable_recording():
     scorep.instrumenter.get_instrumenter().user_enable_recording()
 
@@ -192,6 +252,22 @@ def parameter_string(name, string):
     scorep.instrumenter.get_instrumenter().user_parameter_string(name, string)
 
 
+def Metric(name, unit="", value_type="double"):
+    """
+    Return a handle of the user metric `<name>`. The metric is defined once, so recording a value
+    only costs one native call:
+    ```
+    queue_length = Metric("queue.length", "items", "uint64")
+    queue_length.trigger(len(queue))
+    ```
+    Metrics with the same name share the definition of the first one.
+    @param name name of the metric
+    @param unit unit of the values
+    @param value_type type of the values, `double`, `int64` or `uint64`
+    """
+    return scorep.instrumenter.get_instrumenter().user_metric(name, unit, value_type)
+
+
 def force_finalize():
     """
     Forces a finalisation, which might trigger traces or profiles to be written.
@@ -24,8 +24,11 @@ sources = [
     "src/scorep_bindings.cpp",
     "src/scorepy/events.cpp",
     "src/scorepy/pathUtils.cpp",
+    "src/userMetrics.cpp",
+    "src/userRegions.cpp",
 ]
 define_macros = [("PY_SSIZE_T_CLEAN", "1")]
+libraries = []
 # We are using the UTF-8 string features from Python 3
 # The C Instrumenter functions are not available on PyPy
 if has_c_instrumenter():
@@ -37,6 +40,8 @@ if has_c_instrumenter():
         ]
     )
     define_macros.append(("SCOREPY_ENABLE_CINSTRUMENTER", "1"))
+    # dladdr tells static method definitions of C functions from ones allocated at runtime
+    libraries.append("dl")
 else:
     define_macros.append(("SCOREPY_ENABLE_CINSTRUMENTER", "0"))
 
@@ -45,6 +50,7 @@ cmodules.append(
         "scorep._bindings",
         include_dirs=include,
         define_macros=define_macros,
+        libraries=libraries,
         extra_compile_args=["-std=c++17"],
         sources=sources,
     )
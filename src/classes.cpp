@@ -2,6 +2,9 @@
 #include "scorepy/cInstrumenter.hpp"
 #include "scorepy/pythonHelpers.hpp"
 #include <Python.h>
+#include <cstddef>
+#include <cstdint>
+#include <structmember.h>
 #include <type_traits>
 
 static_assert(std::is_trivial<scorepy::CInstrumenter>::value,
@@ -12,6 +15,57 @@ static_assert(std::is_standard_layout<scorepy::CInstrumenter>::value,
 extern "C"
 {
 
+    /// Vectorcall implementation of CInstrumenter_call, taking the arguments without a tuple
+    static PyObject* CInstrumenter_vectorcall(PyObject* self, PyObject* const* args, size_t nargsf,
+                                              PyObject* kwnames)
+    {
+        static const char* kwlist[] = { "frame", "event", "arg" };
+
+        const Py_ssize_t nargs = PyVectorcall_NARGS(nargsf);
+        const Py_ssize_t nkwargs = kwnames ? PyTuple_GET_SIZE(kwnames) : 0;
+        if (nargs + nkwargs != 3 || nargs > 3)
+        {
+            PyErr_Format(PyExc_TypeError, "CInstrumenter() takes exactly 3 arguments (%zd given)",
+                         nargs + nkwargs);
+            return nullptr;
+        }
+        PyObject* parameters[3] = { nullptr, nullptr, nullptr };
+        for (Py_ssize_t i = 0; i < nargs; ++i)
+        {
+            parameters[i] = args[i];
+        }
+        for (Py_ssize_t i = 0; i < nkwargs; ++i)
+        {
+            PyObject* name = PyTuple_GET_ITEM(kwnames, i);
+            Py_ssize_t index = 0;
+            while (index < 3 && PyUnicode_CompareWithASCIIString(name, kwlist[index]) != 0)
+            {
+                ++index;
+            }
+            if (index == 3 || parameters[index])
+            {
+                PyErr_Format(PyExc_TypeError,
+                             "CInstrumenter() got an unexpected or repeated argument '%U'", name);
+                return nullptr;
+            }
+            parameters[index] = args[nargs + i];
+        }
+
+        if (!PyUnicode_Check(parameters[1]))
+        {
+            PyErr_Format(PyExc_TypeError, "event must be str, not %s",
+                         Py_TYPE(parameters[1])->tp_name);
+            return nullptr;
+        }
+        const char* event = PyUnicode_AsUTF8(parameters[1]);
+        if (!event)
+        {
+            return nullptr;
+        }
+        auto* frame = reinterpret_cast<PyFrameObject*>(parameters[0]);
+        return (*scorepy::CInstrumenter::from_PyObject(self))(*frame, event, parameters[2]);
+    }
+
     /// tp_new implementation that calls object.__new__ with not args to allow ABC classes to work
     static PyObject* call_object_new(PyTypeObject* type, PyObject*, PyObject*)
     {
@@ -25,22 +79,38 @@ extern "C"
         {
             return nullptr;
         }
-        return PyBaseObject_Type.tp_new(type, empty_tuple, empty_dict);
+        PyObject* self = PyBaseObject_Type.tp_new(type, empty_tuple, empty_dict);
+        if (self)
+        {
+            scorepy::CInstrumenter::from_PyObject(self)->vectorcall = CInstrumenter_vectorcall;
+        }
+        return self;
     }
 
     static void CInstrumenter_dealloc(scorepy::CInstrumenter* self)
     {
+        // Instances of heap types own a reference to their type
+        PyTypeObject* type = Py_TYPE(self);
         self->deinit();
-        Py_TYPE(self)->tp_free(self->to_PyObject());
+        type->tp_free(self->to_PyObject());
+        Py_DECREF(type);
     }
 
     static int CInstrumenter_init(scorepy::CInstrumenter* self, PyObject* args, PyObject* kwds)
     {
-        static const char* kwlist[] = { "interface", nullptr };
+        static const char* kwlist[] = { "interface",  "max_depth", "burst_calls",
+                                        "burst_time", "c_calls",   "generator_regions",
+                                        nullptr };
         const char* interface_cstring;
+        unsigned long max_depth = 0;
+        unsigned long long burst_calls = 0;
+        double burst_time = 0;
+        PyObject* c_calls = nullptr;
+        const char* generator_regions_cstring = "resume";
 
-        if (!PyArg_ParseTupleAndKeywords(args, kwds, "s", const_cast<char**>(kwlist),
-                                         &interface_cstring))
+        if (!PyArg_ParseTupleAndKeywords(args, kwds, "s|kKdOs", const_cast<char**>(kwlist),
+                                         &interface_cstring, &max_depth, &burst_calls, &burst_time,
+                                         &c_calls, &generator_regions_cstring))
         {
             return -1;
         }
@@ -55,33 +125,130 @@ extern "C"
         {
             interface = scorepy::InstrumenterInterface::Profile;
         }
+        else if (interface_string == "Monitoring")
+        {
+            interface = scorepy::InstrumenterInterface::Monitoring;
+        }
+        else if (interface_string == "Sampling")
+        {
+            interface = scorepy::InstrumenterInterface::Sampling;
+        }
         else
         {
-            PyErr_Format(PyExc_TypeError, "Expected 'Trace' or 'Profile', got '%s'",
+            PyErr_Format(PyExc_TypeError,
+                         "Expected 'Trace', 'Profile', 'Monitoring' or 'Sampling', got '%s'",
                          interface_cstring);
             return -1;
         }
 
-        self->init(interface);
+        const std::string generator_regions_string = generator_regions_cstring;
+        scorepy::GeneratorRegions generator_regions;
+        if (generator_regions_string == "resume")
+        {
+            generator_regions = scorepy::GeneratorRegions::Resume;
+        }
+        else if (generator_regions_string == "lifetime")
+        {
+            generator_regions = scorepy::GeneratorRegions::Lifetime;
+        }
+        else
+        {
+            PyErr_Format(PyExc_ValueError, "Expected 'resume' or 'lifetime', got '%s'",
+                         generator_regions_cstring);
+            return -1;
+        }
+
+        if (!self->init(interface, max_depth, c_calls, generator_regions))
+        {
+            return -1;
+        }
+        // The time is given in microseconds
+        self->set_burst_filter(burst_calls, static_cast<std::uint64_t>(burst_time * 1000));
         return 0;
     }
 
     static PyObject* CInstrumenter_get_interface(scorepy::CInstrumenter* self, void*)
     {
-        const char* result =
-            self->interface == scorepy::InstrumenterInterface::Trace ? "Trace" : "Profile";
-        return PyUnicode_FromString(result);
+        switch (self->interface)
+        {
+        case scorepy::InstrumenterInterface::Trace:
+            return PyUnicode_FromString("Trace");
+        case scorepy::InstrumenterInterface::Monitoring:
+            return PyUnicode_FromString("Monitoring");
+        case scorepy::InstrumenterInterface::Sampling:
+            return PyUnicode_FromString("Sampling");
+        default:
+            return PyUnicode_FromString("Profile");
+        }
+    }
+
+    static PyObject* CInstrumenter_get_demoted_regions(scorepy::CInstrumenter*, void*)
+    {
+        return scorepy::CInstrumenter::get_demoted_regions();
     }
 
     static PyObject* CInstrumenter_enable_instrumenter(scorepy::CInstrumenter* self, PyObject*)
     {
-        self->enable_instrumenter();
+        if (!self->enable_instrumenter())
+        {
+            return nullptr;
+        }
         Py_RETURN_NONE;
     }
 
     static PyObject* CInstrumenter_disable_instrumenter(scorepy::CInstrumenter* self, PyObject*)
     {
-        self->disable_instrumenter();
+        if (!self->disable_instrumenter())
+        {
+            return nullptr;
+        }
+        Py_RETURN_NONE;
+    }
+
+    static PyObject* CInstrumenter_set_thread_hook(scorepy::CInstrumenter*, PyObject* enabled)
+    {
+        const int is_enabled = PyObject_IsTrue(enabled);
+        if (is_enabled < 0)
+        {
+            return nullptr;
+        }
+        // The callbacks stay installed in all threads, the calling thread is only suppressed
+        if (is_enabled)
+        {
+            scorepy::CInstrumenter::resume();
+        }
+        else
+        {
+            scorepy::CInstrumenter::suppress();
+        }
+        Py_RETURN_NONE;
+    }
+
+    static PyObject* CInstrumenter_suppress(scorepy::CInstrumenter*, PyObject*)
+    {
+        scorepy::CInstrumenter::suppress();
+        Py_RETURN_NONE;
+    }
+
+    static PyObject* CInstrumenter_resume(scorepy::CInstrumenter*, PyObject*)
+    {
+        if (!scorepy::CInstrumenter::resume())
+        {
+            PyErr_SetString(PyExc_RuntimeError,
+                            "The instrumenter is not suppressed in this thread");
+            return nullptr;
+        }
+        Py_RETURN_NONE;
+    }
+
+    static PyObject* CInstrumenter_is_suppressed(scorepy::CInstrumenter*, PyObject*)
+    {
+        return PyBool_FromLong(scorepy::CInstrumenter::is_suppressed());
+    }
+
+    static PyObject* CInstrumenter_sample_threads(scorepy::CInstrumenter* self, PyObject*)
+    {
+        self->sample_threads();
         Py_RETURN_NONE;
     }
 
@@ -106,35 +273,54 @@ extern "C"
 namespace scorepy
 {
 
-PyTypeObject& getCInstrumenterType()
+PyType_Spec& getCInstrumenterTypeSpec()
 {
     static PyMethodDef methods[] = {
         { "_enable_instrumenter", scorepy::cast_to_PyFunc(CInstrumenter_enable_instrumenter),
           METH_NOARGS, "Enable the instrumenter" },
         { "_disable_instrumenter", scorepy::cast_to_PyFunc(CInstrumenter_disable_instrumenter),
           METH_NOARGS, "Disable the instrumenter" },
+        { "_set_thread_hook", scorepy::cast_to_PyFunc(CInstrumenter_set_thread_hook), METH_O,
+          "Stop or resume collecting the events of the calling thread" },
+        { "_sample_threads", scorepy::cast_to_PyFunc(CInstrumenter_sample_threads), METH_NOARGS,
+          "Let all other threads take a sample with their next event" },
+        { "suppress", scorepy::cast_to_PyFunc(CInstrumenter_suppress), METH_NOARGS,
+          "Stop collecting the events of the calling thread until resume() is called as often" },
+        { "resume", scorepy::cast_to_PyFunc(CInstrumenter_resume), METH_NOARGS,
+          "Undo one call of suppress() in the calling thread" },
+        { "is_suppressed", scorepy::cast_to_PyFunc(CInstrumenter_is_suppressed), METH_NOARGS,
+          "Return whether the events of the calling thread are suppressed" },
         { nullptr } /* Sentinel */
     };
     static PyGetSetDef getseters[] = {
         { "interface", scorepy::cast_to_PyFunc(CInstrumenter_get_interface), nullptr,
           "Return the used interface for instrumentation", nullptr },
+        { "demoted_regions", scorepy::cast_to_PyFunc(CInstrumenter_get_demoted_regions), nullptr,
+          "Return the names of the regions that the burst filter stopped recording", nullptr },
+        { nullptr } /* Sentinel */
+    };
+    // Heap types declare the offset of the vectorcall entry point as member
+    static PyMemberDef members[] = {
+        { "__vectorcalloffset__", T_PYSSIZET, offsetof(CInstrumenter, vectorcall), READONLY,
+          nullptr },
         { nullptr } /* Sentinel */
     };
-    // Sets the first few fields explicitely and remaining ones to zero
-    static PyTypeObject type = {
-        PyVarObject_HEAD_INIT(nullptr, 0) /* header */
-        "scorep._bindings.CInstrumenter", /* tp_name */
-        sizeof(CInstrumenter),            /* tp_basicsize */
+    static PyType_Slot slots[] = {
+        { Py_tp_new, reinterpret_cast<void*>(call_object_new) },
+        { Py_tp_init, reinterpret_cast<void*>(scorepy::cast_to_PyFunc(CInstrumenter_init)) },
+        { Py_tp_dealloc, reinterpret_cast<void*>(scorepy::cast_to_PyFunc(CInstrumenter_dealloc)) },
+        { Py_tp_methods, methods },
+        { Py_tp_call, reinterpret_cast<void*>(scorepy::cast_to_PyFunc(CInstrumenter_call)) },
+        { Py_tp_getset, getseters },
+        { Py_tp_members, members },
+        { Py_tp_doc, const_cast<char*>("Class for the C instrumenter interface of Score-P") },
+        { 0, nullptr } /* Sentinel */
     };
-    type.tp_new = call_object_new;
-    type.tp_init = scorepy::cast_to_PyFunc(CInstrumenter_init);
-    type.tp_dealloc = scorepy::cast_to_PyFunc(CInstrumenter_dealloc);
-    type.tp_methods = methods;
-    type.tp_call = scorepy::cast_to_PyFunc(CInstrumenter_call);
-    type.tp_getset = getseters;
-    type.tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE;
-    type.tp_doc = "Class for the C instrumenter interface of Score-P";
-    return type;
+    static PyType_Spec spec = { "scorep._bindings.CInstrumenter", sizeof(CInstrumenter), 0,
+                                Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE |
+                                    Py_TPFLAGS_HAVE_VECTORCALL,
+                                slots };
+    return spec;
 }
 
 } // namespace scorepy
@@ -4,6 +4,6 @@
 
 namespace scorepy
 {
-/// Return the type info to define for the python module
-PyTypeObject& getCInstrumenterType();
+/// Return the spec of the heap type to define for the python module
+PyType_Spec& getCInstrumenterTypeSpec();
 } // namespace scorepy
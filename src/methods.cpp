@@ -1,12 +1,55 @@
 #include "methods.hpp"
 #include "scorepy/events.hpp"
 #include "scorepy/pathUtils.hpp"
+#include "scorepy/pythonHelpers.hpp"
 #include <Python.h>
 #include <cstdint>
 #include <scorep/SCOREP_User_Functions.h>
+#include <string_view>
 
 #include <iostream>
 
+namespace
+{
+/// Raise a TypeError like PyArg_ParseTuple unless a METH_FASTCALL function got the expected
+/// number of arguments
+bool check_nargs(const char* function, Py_ssize_t nargs, Py_ssize_t expected)
+{
+    if (nargs == expected)
+    {
+        return true;
+    }
+    PyErr_Format(PyExc_TypeError, "%s() takes exactly %zd arguments (%zd given)", function,
+                 expected, nargs);
+    return false;
+}
+
+/// Get the UTF-8 contents of a str argument. Return false and set a TypeError otherwise
+bool get_string(PyObject* arg, std::string_view& value)
+{
+    if (!PyUnicode_Check(arg))
+    {
+        PyErr_Format(PyExc_TypeError, "expected str, got %s", Py_TYPE(arg)->tp_name);
+        return false;
+    }
+    Py_ssize_t size;
+    const char* data = PyUnicode_AsUTF8AndSize(arg, &size);
+    if (!data)
+    {
+        return false;
+    }
+    value = std::string_view(data, size);
+    return true;
+}
+
+/// Cast a METH_FASTCALL function to the type of PyMethodDef::ml_meth
+template <typename TFunc>
+PyCFunction to_PyCFunction(TFunc* func)
+{
+    return reinterpret_cast<PyCFunction>(reinterpret_cast<void (*)()>(func));
+}
+} // namespace
+
 extern "C"
 {
 
@@ -15,27 +58,27 @@ extern "C"
     extern void SCOREP_RegisterExitHandler(void);
     extern void SCOREP_FinalizeMeasurement(void);
 
-    static PyObject* enable_recording(PyObject* self, PyObject* args)
+    static PyObject* enable_recording(PyObject* self, PyObject*)
     {
         SCOREP_User_EnableRecording();
         Py_RETURN_NONE;
     }
 
-    static PyObject* disable_recording(PyObject* self, PyObject* args)
+    static PyObject* disable_recording(PyObject* self, PyObject*)
     {
 
         SCOREP_User_DisableRecording();
         Py_RETURN_NONE;
     }
 
-    static PyObject* try_region_begin(PyObject* self, PyObject* args)
+    static PyObject* try_region_begin(PyObject* self, PyObject* identifier)
     {
-        PyObject* identifier = nullptr;
-        if (!PyArg_ParseTuple(args, "O", &identifier))
+        if (!PyCode_Check(identifier))
         {
+            PyErr_Format(PyExc_TypeError, "identifier must be a code object, not %s",
+                         Py_TYPE(identifier)->tp_name);
             return NULL;
         }
-
         bool success = scorepy::try_region_begin(reinterpret_cast<PyCodeObject*>(identifier));
         if (success)
         {
@@ -47,55 +90,47 @@ extern "C"
         }
     }
 
-    /** This code is not thread save. However, this does not matter as the python GIL is not
-     * released.
-     */
-    static PyObject* region_begin(PyObject* self, PyObject* args)
+    static PyObject* region_begin(PyObject* self, PyObject* const* args, Py_ssize_t nargs)
     {
-        const char* module_cstr;
-        const char* function_name_cstr;
-        const char* file_name_cstr;
-        Py_ssize_t module_len;
-        Py_ssize_t function_name_len;
-        Py_ssize_t file_name_len;
-
-        PyObject* identifier = nullptr;
-        std::uint64_t line_number = 0;
-
-        if (!PyArg_ParseTuple(args, "s#s#s#KO", &module_cstr, &module_len, &function_name_cstr,
-                              &function_name_len, &file_name_cstr, &file_name_len, &line_number,
-                              &identifier))
+        std::string_view module;
+        std::string_view function_name;
+        std::string_view file_name;
+        if (!check_nargs("region_begin", nargs, 5) || !get_string(args[0], module) ||
+            !get_string(args[1], function_name) || !get_string(args[2], file_name))
+        {
+            return NULL;
+        }
+        const std::uint64_t line_number = PyLong_AsUnsignedLongLongMask(args[3]);
+        if (line_number == static_cast<std::uint64_t>(-1) && PyErr_Occurred())
         {
             return NULL;
         }
+        PyObject* identifier = args[4];
 
-        std::string module(module_cstr, module_len);
-        std::string_view function_name(function_name_cstr, function_name_len);
-        auto const file_name_abs =
-            scorepy::abspath(std::string_view(file_name_cstr, file_name_len));
+        auto const file_name_abs = scorepy::abspath(file_name);
 
-        if (identifier == nullptr || identifier == Py_None)
+        if (identifier == Py_None)
         {
-            scorepy::region_begin(function_name, std::move(module), std::move(file_name_abs),
+            scorepy::region_begin(function_name, std::string(module), std::move(file_name_abs),
                                   line_number);
         }
         else
         {
-            scorepy::region_begin(function_name, std::move(module), std::move(file_name_abs),
+            scorepy::region_begin(function_name, std::string(module), std::move(file_name_abs),
                                   line_number, reinterpret_cast<PyCodeObject*>(identifier));
         }
 
         Py_RETURN_NONE;
     }
 
-    static PyObject* try_region_end(PyObject* self, PyObject* args)
+    static PyObject* try_region_end(PyObject* self, PyObject* identifier)
     {
-        PyObject* identifier = nullptr;
-        if (!PyArg_ParseTuple(args, "O", &identifier))
+        if (!PyCode_Check(identifier))
         {
+            PyErr_Format(PyExc_TypeError, "identifier must be a code object, not %s",
+                         Py_TYPE(identifier)->tp_name);
             return NULL;
         }
-
         bool success = scorepy::try_region_end(reinterpret_cast<PyCodeObject*>(identifier));
         if (success)
         {
@@ -107,153 +142,215 @@ extern "C"
         }
     }
 
-    /** This code is not thread save. However, this does not matter as the python GIL is not
-     * released.
-     */
-    static PyObject* region_end(PyObject* self, PyObject* args)
+    static PyObject* region_end(PyObject* self, PyObject* const* args, Py_ssize_t nargs)
     {
-        const char* module_cstr;
-        const char* function_name_cstr;
-        Py_ssize_t module_len;
-        Py_ssize_t function_name_len;
-        PyObject* identifier = nullptr;
-
-        if (!PyArg_ParseTuple(args, "s#s#O", &module_cstr, &module_len, &function_name_cstr,
-                              &function_name_len, &identifier))
+        std::string_view module;
+        std::string_view function_name;
+        if (!check_nargs("region_end", nargs, 3) || !get_string(args[0], module) ||
+            !get_string(args[1], function_name))
         {
             return NULL;
         }
+        PyObject* identifier = args[2];
 
-        std::string module(module_cstr, module_len);
-        std::string_view function_name(function_name_cstr, function_name_len);
-
-        if (identifier == nullptr || identifier == Py_None)
+        if (identifier == Py_None)
         {
-            scorepy::region_end(function_name, std::move(module));
+            scorepy::region_end(function_name, std::string(module));
         }
         else
         {
-            scorepy::region_end(function_name, std::move(module),
+            scorepy::region_end(function_name, std::string(module),
                                 reinterpret_cast<PyCodeObject*>(identifier));
         }
 
         Py_RETURN_NONE;
     }
 
-    static PyObject* rewind_begin(PyObject* self, PyObject* args)
+    static PyObject* set_region_filter(PyObject* self, PyObject* region_filter)
     {
-        const char* region_name;
-        const char* file_name;
-        std::uint64_t line_number = 0;
-
-        if (!PyArg_ParseTuple(args, "ssK", &region_name, &file_name, &line_number))
+        if (region_filter != Py_None && !PyCallable_Check(region_filter))
+        {
+            PyErr_SetString(PyExc_TypeError, "The region filter must be callable or None");
             return NULL;
+        }
 
-        scorepy::rewind_begin(region_name, file_name, line_number);
+        scorepy::set_region_filter(region_filter);
 
         Py_RETURN_NONE;
     }
 
-    static PyObject* rewind_end(PyObject* self, PyObject* args)
+    static PyObject* set_region_names(PyObject* self, PyObject* region_names)
     {
-        const char* region_name;
-        PyObject* value; // false C-Style
+        std::string_view names;
+        if (!get_string(region_names, names))
+        {
+            return NULL;
+        }
+        if (names == "self")
+        {
+            scorepy::region_names = scorepy::RegionNames::Self;
+        }
+        else if (names == "qualname")
+        {
+            scorepy::region_names = scorepy::RegionNames::Qualname;
+        }
+        else
+        {
+            PyErr_Format(PyExc_ValueError, "Expected 'self' or 'qualname', got '%U'", region_names);
+            return NULL;
+        }
+
+        Py_RETURN_NONE;
+    }
 
-        if (!PyArg_ParseTuple(args, "sO", &region_name, &value))
+    static PyObject* rewind_begin(PyObject* self, PyObject* const* args, Py_ssize_t nargs)
+    {
+        std::string_view region_name;
+        std::string_view file_name;
+        if (!check_nargs("rewind_begin", nargs, 3) || !get_string(args[0], region_name) ||
+            !get_string(args[1], file_name))
+        {
+            return NULL;
+        }
+        const std::uint64_t line_number = PyLong_AsUnsignedLongLongMask(args[2]);
+        if (line_number == static_cast<std::uint64_t>(-1) && PyErr_Occurred())
+        {
             return NULL;
+        }
 
-        // TODO cover PyObject_IsTrue(value) == -1 (error case)
-        scorepy::rewind_end(region_name, PyObject_IsTrue(value) == 1);
+        scorepy::rewind_begin(std::string(region_name), std::string(file_name), line_number);
 
         Py_RETURN_NONE;
     }
 
-    static PyObject* parameter_string(PyObject* self, PyObject* args)
+    static PyObject* rewind_end(PyObject* self, PyObject* const* args, Py_ssize_t nargs)
     {
-        const char* name;
-        const char* value;
-
-        if (!PyArg_ParseTuple(args, "ss", &name, &value))
+        std::string_view region_name;
+        if (!check_nargs("rewind_end", nargs, 2) || !get_string(args[0], region_name))
+        {
             return NULL;
+        }
 
-        scorepy::parameter_string(name, value);
+        const int rewind = PyObject_IsTrue(args[1]);
+        if (rewind < 0)
+        {
+            return NULL;
+        }
+        if (!scorepy::rewind_end(std::string(region_name), rewind == 1))
+        {
+            PyErr_Format(PyExc_ValueError, "No rewind region named '%U' was begun", args[0]);
+            return NULL;
+        }
 
         Py_RETURN_NONE;
     }
 
-    static PyObject* parameter_int(PyObject* self, PyObject* args)
+    static PyObject* parameter_string(PyObject* self, PyObject* const* args, Py_ssize_t nargs)
     {
-        const char* name;
-        long long value;
-
-        if (!PyArg_ParseTuple(args, "sL", &name, &value))
+        std::string_view name;
+        std::string_view value;
+        if (!check_nargs("parameter_string", nargs, 2) || !get_string(args[0], name) ||
+            !get_string(args[1], value))
+        {
             return NULL;
+        }
 
-        scorepy::parameter_int(name, value);
+        scorepy::parameter_string(std::string(name), std::string(value));
 
         Py_RETURN_NONE;
     }
 
-    static PyObject* parameter_uint(PyObject* self, PyObject* args)
+    static PyObject* parameter_int(PyObject* self, PyObject* const* args, Py_ssize_t nargs)
     {
-        const char* name;
-        unsigned long long value;
+        std::string_view name;
+        if (!check_nargs("parameter_int", nargs, 2) || !get_string(args[0], name))
+        {
+            return NULL;
+        }
+        const long long value = PyLong_AsLongLong(args[1]);
+        if (value == -1 && PyErr_Occurred())
+        {
+            return NULL;
+        }
+
+        scorepy::parameter_int(std::string(name), value);
+
+        Py_RETURN_NONE;
+    }
 
-        if (!PyArg_ParseTuple(args, "sK", &name, &value))
+    static PyObject* parameter_uint(PyObject* self, PyObject* const* args, Py_ssize_t nargs)
+    {
+        std::string_view name;
+        if (!check_nargs("parameter_uint", nargs, 2) || !get_string(args[0], name))
+        {
+            return NULL;
+        }
+        const unsigned long long value = PyLong_AsUnsignedLongLongMask(args[1]);
+        if (value == static_cast<unsigned long long>(-1) && PyErr_Occurred())
+        {
             return NULL;
+        }
 
-        scorepy::parameter_uint(name, value);
+        scorepy::parameter_uint(std::string(name), value);
 
         Py_RETURN_NONE;
     }
 
-    static PyObject* get_experiment_dir_name(PyObject* self, PyObject* args)
+    static PyObject* get_experiment_dir_name(PyObject* self, PyObject*)
     {
 
         return PyUnicode_FromString(SCOREP_GetExperimentDirName());
     }
 
-    static PyObject* abspath(PyObject* self, PyObject* args)
+    static PyObject* abspath(PyObject* self, PyObject* arg)
     {
-        const char* path;
-
-        if (!PyArg_ParseTuple(args, "s", &path))
+        std::string_view path;
+        if (!get_string(arg, path))
+        {
             return NULL;
+        }
 
         return PyUnicode_FromString(scorepy::abspath(path).c_str());
     }
 
-    static PyObject* force_finalize(PyObject* self, PyObject* args)
+    static PyObject* force_finalize(PyObject* self, PyObject*)
     {
         SCOREP_FinalizeMeasurement();
         Py_RETURN_NONE;
     }
 
-    static PyObject* reregister_exit_handler(PyObject* self, PyObject* args)
+    static PyObject* reregister_exit_handler(PyObject* self, PyObject*)
     {
         SCOREP_RegisterExitHandler();
         Py_RETURN_NONE;
     }
 
+    // The entry points called per event take their arguments without a tuple (METH_O and
+    // METH_FASTCALL), as the pure Python instrumenters and the user regions call them per call
     static PyMethodDef ScorePMethods[] = {
-        { "region_begin", region_begin, METH_VARARGS, "enter a region." },
-        { "try_region_begin", try_region_begin, METH_VARARGS,
+        { "region_begin", to_PyCFunction(region_begin), METH_FASTCALL, "enter a region." },
+        { "try_region_begin", try_region_begin, METH_O,
           "Tries to begin a region, returns True on Sucess." },
-        { "region_end", region_end, METH_VARARGS, "exit a region." },
-        { "try_region_end", try_region_end, METH_VARARGS,
+        { "region_end", to_PyCFunction(region_end), METH_FASTCALL, "exit a region." },
+        { "try_region_end", try_region_end, METH_O,
           "Tries to end a region, returns True on Sucess." },
-        { "rewind_begin", rewind_begin, METH_VARARGS, "rewind begin." },
-        { "rewind_end", rewind_end, METH_VARARGS, "rewind end." },
-        { "enable_recording", enable_recording, METH_VARARGS, "disable scorep recording." },
-        { "disable_recording", disable_recording, METH_VARARGS, "disable scorep recording." },
-        { "parameter_int", parameter_int, METH_VARARGS, "User parameter int." },
-        { "parameter_uint", parameter_uint, METH_VARARGS, "User parameter uint." },
-        { "parameter_string", parameter_string, METH_VARARGS, "User parameter string." },
-        { "get_experiment_dir_name", get_experiment_dir_name, METH_VARARGS,
+        { "set_region_filter", set_region_filter, METH_O,
+          "Set the callable deciding which code objects are recorded." },
+        { "set_region_names", set_region_names, METH_O,
+          "Set the naming scheme of the regions of code objects, 'self' or 'qualname'." },
+        { "rewind_begin", to_PyCFunction(rewind_begin), METH_FASTCALL, "rewind begin." },
+        { "rewind_end", to_PyCFunction(rewind_end), METH_FASTCALL, "rewind end." },
+        { "enable_recording", enable_recording, METH_NOARGS, "disable scorep recording." },
+        { "disable_recording", disable_recording, METH_NOARGS, "disable scorep recording." },
+        { "parameter_int", to_PyCFunction(parameter_int), METH_FASTCALL, "User parameter int." },
+        { "parameter_uint", to_PyCFunction(parameter_uint), METH_FASTCALL, "User parameter uint." },
+        { "parameter_string", to_PyCFunction(parameter_string), METH_FASTCALL,
+          "User parameter string." },
+        { "get_experiment_dir_name", get_experiment_dir_name, METH_NOARGS,
           "Get the Score-P experiment dir." },
-        { "abspath", abspath, METH_VARARGS, "Estimates the absolute Path." },
-        { "force_finalize", force_finalize, METH_VARARGS, "triggers a finalize" },
-        { "reregister_exit_handler", reregister_exit_handler, METH_VARARGS,
+        { "abspath", abspath, METH_O, "Estimates the absolute Path." },
+        { "force_finalize", force_finalize, METH_NOARGS, "triggers a finalize" },
+        { "reregister_exit_handler", reregister_exit_handler, METH_NOARGS,
           "register a new atexit handler" },
         { NULL, NULL, 0, NULL } /* Sentinel */
     };
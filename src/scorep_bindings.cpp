@@ -1,56 +1,106 @@
 #include <Python.h>
 
+#include <cstring>
 #include <iostream>
 
 #include "classes.hpp"
 #include "methods.hpp"
+#include "scorepy/events.hpp"
+#include "userMetrics.hpp"
+#include "userRegions.hpp"
 
-#if PY_VERSION_HEX < 0x03000000
-PyMODINIT_FUNC init_bindings(void)
+/// State of a module object of the bindings. Each interpreter imports its own module object
+/// (multi-phase initialisation, see PEP 489), so nothing Python-related is shared between them
+struct module_state
 {
-    PyObject* m;
-#if SCOREPY_ENABLE_CINSTRUMENTER
-    static PyTypeObject ctracerType = scorepy::getCInstrumenterType();
-    if (PyType_Ready(&ctracerType) < 0)
-        return;
-#endif
-    m = Py_InitModule("_bindings", scorepy::getMethodTable());
-#if SCOREPY_ENABLE_CINSTRUMENTER
-    Py_INCREF(&ctracerType);
-    PyModule_AddObject(m, "CInstrumenter", (PyObject*)&ctracerType);
-#endif
+    /// State of the interpreter acquired by the module, nullptr if the module failed to execute
+    scorepy::interpreter_state* interpreter;
+};
+
+static module_state* get_module_state(PyObject* module)
+{
+    return static_cast<module_state*>(PyModule_GetState(module));
 }
-#else /*python 3*/
-static struct PyModuleDef scorepmodule = { PyModuleDef_HEAD_INIT, "_bindings", /* name of module */
-                                           NULL, /* module documentation, may be NULL */
-                                           -1,   /* size of per-interpreter state of the module,
-                                                    or -1 if the module keeps state in global
-                                                    variables. */
-                                           scorepy::getMethodTable() };
-PyMODINIT_FUNC PyInit__bindings(void)
+
+/// Create a heap type from the spec and add it to the module. Return -1 on error
+static int add_type(PyObject* module, PyType_Spec& spec)
 {
-#if SCOREPY_ENABLE_CINSTRUMENTER
-    auto* ctracerType = &scorepy::getCInstrumenterType();
-    if (PyType_Ready(ctracerType) < 0)
-        return nullptr;
-#endif
+    PyObject* type = PyType_FromSpec(&spec);
+    if (!type)
+    {
+        return -1;
+    }
+    // The name of the type is the part of the spec name after the module name
+    const char* name = strrchr(spec.name, '.') + 1;
+    if (PyModule_AddObject(module, name, type) < 0)
+    {
+        Py_DECREF(type);
+        return -1;
+    }
+    return 0;
+}
 
-    auto* m = PyModule_Create(&scorepmodule);
-    if (!m)
+static int exec_bindings(PyObject* module)
+{
+    auto* interpreter = scorepy::acquire_interpreter_state();
+    if (!interpreter)
     {
-        return nullptr;
+        return -1;
     }
+    get_module_state(module)->interpreter = interpreter;
 
+    if (add_type(module, scorepy::getUserRegionTypeSpec()) < 0 ||
+        add_type(module, scorepy::getRewindRegionTypeSpec()) < 0 ||
+        add_type(module, scorepy::getMetricTypeSpec()) < 0)
+    {
+        return -1;
+    }
 #if SCOREPY_ENABLE_CINSTRUMENTER
-    Py_INCREF(ctracerType);
-    if (PyModule_AddObject(m, "CInstrumenter", (PyObject*)ctracerType) < 0)
+    if (add_type(module, scorepy::getCInstrumenterTypeSpec()) < 0)
     {
-        Py_DECREF(ctracerType);
-        Py_DECREF(m);
-        return nullptr;
+        return -1;
     }
 #endif
+    return 0;
+}
 
-    return m;
+static void free_bindings(void* module)
+{
+    auto* state = get_module_state(static_cast<PyObject*>(module));
+    if (state && state->interpreter)
+    {
+        scorepy::release_interpreter_state(state->interpreter);
+        state->interpreter = nullptr;
+    }
+}
+
+static PyModuleDef_Slot scorep_slots[] = {
+    { Py_mod_exec, reinterpret_cast<void*>(exec_bindings) },
+#if PY_VERSION_HEX >= 0x030C0000
+    // Region handles are shared by the interpreters through thread safe registries, everything
+    // else is per interpreter
+    { Py_mod_multiple_interpreters, Py_MOD_PER_INTERPRETER_GIL_SUPPORTED },
+#endif
+#if PY_VERSION_HEX >= 0x030D0000
+    // The region registries are thread safe, so the module does not need the GIL
+    { Py_mod_gil, Py_MOD_GIL_NOT_USED },
+#endif
+    { 0, nullptr } /* Sentinel */
+};
+
+static struct PyModuleDef scorepmodule = {
+    PyModuleDef_HEAD_INIT,
+    "_bindings",               /* name of module */
+    NULL,                      /* module documentation, may be NULL */
+    sizeof(module_state),      /* size of per-interpreter state of the module */
+    scorepy::getMethodTable(), /* methods */
+    scorep_slots,              /* slots of the multi-phase initialisation */
+    nullptr,                   /* traverse, the state holds no Python objects */
+    nullptr,                   /* clear */
+    free_bindings,             /* free */
+};
+
+PyMODINIT_FUNC PyInit__bindings(void)
+{
+    return PyModuleDef_Init(&scorepmodule);
 }
-#endif /*python 3*/
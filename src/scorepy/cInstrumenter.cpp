@@ -4,66 +4,651 @@
 #include "pythoncapi_compat.h"
 #include <algorithm>
 #include <array>
+#include <chrono>
 #include <cstdint>
+#include <dlfcn.h>
+#include <fnmatch.h>
+#include <mutex>
 #include <string>
+#include <unordered_map>
+#include <vector>
 
 namespace scorepy
 {
 
-void CInstrumenter::init(InstrumenterInterface interface)
+bool CInstrumenter::init(InstrumenterInterface interface, unsigned long max_depth,
+                         PyObject* c_calls, GeneratorRegions generator_regions)
 {
     this->interface = interface;
+    this->max_depth = max_depth;
+    this->generator_regions = generator_regions;
+    burst_min_calls = 0;
+    burst_max_nanoseconds = 0;
+    monitoring_tool_id = -1;
+    if (c_calls && c_calls != Py_None)
+    {
+        // Trace functions get no events for C functions, and samples have no C frames
+        if (interface == InstrumenterInterface::Trace ||
+            interface == InstrumenterInterface::Sampling)
+        {
+            PyErr_SetString(
+                PyExc_ValueError,
+                "C functions are only recorded by the Profile and Monitoring interfaces");
+            return false;
+        }
+        c_call_patterns = PySequence_Tuple(c_calls);
+        if (!c_call_patterns)
+        {
+            return false;
+        }
+        for (Py_ssize_t i = 0; i < PyTuple_GET_SIZE(c_call_patterns); i++)
+        {
+            if (!PyUnicode_Check(PyTuple_GET_ITEM(c_call_patterns, i)))
+            {
+                PyErr_SetString(PyExc_TypeError, "The C function patterns must be strings");
+                return false;
+            }
+        }
+    }
+    if (generator_regions == GeneratorRegions::Lifetime &&
+        interface != InstrumenterInterface::Monitoring)
+    {
+        PyErr_SetString(PyExc_ValueError,
+                        "Lifetime regions of generators require the Monitoring interface");
+        return false;
+    }
+    if (interface == InstrumenterInterface::Monitoring)
+    {
+        return init_monitoring();
+    }
+    if (interface == InstrumenterInterface::Sampling)
+    {
+#if PY_VERSION_HEX >= 0x03090000
+        return true;
+#else
+        PyErr_SetString(PyExc_RuntimeError, "Sampling requires Python 3.9 or newer");
+        return false;
+#endif
+    }
     threading_module = PyImport_ImportModule("threading");
     if (threading_module)
     {
         const char* name = (interface == InstrumenterInterface::Trace) ? "settrace" : "setprofile";
         threading_set_instrumenter = PyObject_GetAttrString(threading_module, name);
     }
+    return true;
 }
 
 void CInstrumenter::deinit()
 {
+    deinit_monitoring();
+    Py_CLEAR(c_call_patterns);
+    Py_CLEAR(sampling_base_frames);
     Py_CLEAR(threading_module);
     Py_CLEAR(threading_set_instrumenter);
 }
 
-void CInstrumenter::enable_instrumenter()
+/// Nesting of CInstrumenter::suppress in the current thread. Events are ignored while it is not 0
+static thread_local unsigned long suppression_depth = 0;
+
+void CInstrumenter::suppress()
+{
+    suppression_depth++;
+}
+
+bool CInstrumenter::resume()
+{
+    if (suppression_depth == 0)
+    {
+        return false;
+    }
+    suppression_depth--;
+    return true;
+}
+
+bool CInstrumenter::is_suppressed()
 {
+    return suppression_depth != 0;
+}
+
+/// Install the callback as profile or trace function, nullptr removes it.
+/// Where possible this applies to all threads of the interpreter, not only the current one
+static void set_event_callback(InstrumenterInterface interface, Py_tracefunc callback,
+                               PyObject* obj, bool all_threads)
+{
+#if PY_VERSION_HEX >= 0x03090000
+    if (all_threads)
+    {
+        if (interface == InstrumenterInterface::Trace)
+        {
+            compat::set_trace_all_threads(callback, obj);
+        }
+        else
+        {
+            compat::set_profile_all_threads(callback, obj);
+        }
+        return;
+    }
+#endif
+    if (interface == InstrumenterInterface::Trace)
+    {
+        PyEval_SetTrace(callback, obj);
+    }
+    else
+    {
+        PyEval_SetProfile(callback, obj);
+    }
+}
+
+bool CInstrumenter::enable_instrumenter(bool all_threads)
+{
+    if (interface == InstrumenterInterface::Monitoring)
+    {
+        if (!set_monitoring_callbacks(true))
+        {
+            return false;
+        }
+        PyRefObject result(PyObject_CallMethod(monitoring_module, "set_events", "il",
+                                               monitoring_tool_id, monitoring_events),
+                           adopt_object);
+        return result != nullptr;
+    }
+    if (interface == InstrumenterInterface::Sampling)
+    {
+        enable_sampling();
+        return true;
+    }
     const auto callback = [](PyObject* obj, PyFrameObject* frame, int what, PyObject* arg) -> int {
         return from_PyObject(obj)->on_event(*frame, what, arg) ? 0 : -1;
     };
-    if (threading_set_instrumenter)
+    // Threads started from now on install the callback themselves, see operator()
+    if (threading_set_instrumenter && all_threads)
     {
         PyRefObject result(PyObject_CallFunction(threading_set_instrumenter, "O", to_PyObject()),
                            adopt_object);
+        if (!result)
+        {
+            return false;
+        }
     }
-    if (interface == InstrumenterInterface::Trace)
+    set_event_callback(interface, callback, to_PyObject(), all_threads);
+    return true;
+}
+
+bool CInstrumenter::disable_instrumenter()
+{
+    if (interface == InstrumenterInterface::Monitoring)
     {
-        PyEval_SetTrace(callback, to_PyObject());
+        PyRefObject result(
+            PyObject_CallMethod(monitoring_module, "set_events", "ii", monitoring_tool_id, 0),
+            adopt_object);
+        // The callbacks reference the instrumenter, so they are unregistered while it is disabled
+        return result && set_monitoring_callbacks(false);
     }
-    else
+    if (interface == InstrumenterInterface::Sampling)
     {
-        PyEval_SetProfile(callback, to_PyObject());
+        disable_sampling();
+        return true;
     }
+    set_event_callback(interface, nullptr, nullptr, true);
+    if (threading_set_instrumenter)
+    {
+        PyRefObject result(PyObject_CallFunction(threading_set_instrumenter, "O", Py_None),
+                           adopt_object);
+        return result != nullptr;
+    }
+    return true;
 }
 
-void CInstrumenter::disable_instrumenter()
+#if PY_VERSION_HEX >= 0x030C0000 // Python 3.12+
+
+/// Callback for sys.monitoring events which receive the code object as the first argument.
+/// Only "local" events may return sys.monitoring.DISABLE, which turns off the event for the
+/// code object for the rest of the run.
+template <bool is_call, bool can_disable>
+static PyObject* monitoring_callback(PyObject* self, PyObject* const* args, Py_ssize_t nargs)
 {
-    if (interface == InstrumenterInterface::Trace)
+    if (nargs < 1 || !PyCode_Check(args[0]))
+    {
+        PyErr_SetString(PyExc_TypeError, "Expected a code object as the first argument");
+        return nullptr;
+    }
+    // Suppressed events must not disable the code object
+    if (suppression_depth != 0)
     {
-        PyEval_SetTrace(nullptr, nullptr);
+        Py_RETURN_NONE;
+    }
+    auto* instrumenter = CInstrumenter::from_PyObject(self);
+    auto& code = *reinterpret_cast<PyCodeObject*>(args[0]);
+    const bool included =
+        is_call ? instrumenter->on_call(code, nullptr) : instrumenter->on_return(code, nullptr);
+    if (!included && can_disable)
+    {
+        return PyObject_GetAttrString(instrumenter->monitoring_module, "DISABLE");
+    }
+    Py_RETURN_NONE;
+}
+
+/// Callback for the sys.monitoring events of calls, which receive the callable as the third
+/// argument. The events are not disabled as a call site may call different callables, and
+/// disabling CALL also disables C_RETURN of a call that is in progress
+template <bool is_call>
+static PyObject* monitoring_c_callback(PyObject* self, PyObject* const* args, Py_ssize_t nargs)
+{
+    if (nargs < 3)
+    {
+        PyErr_SetString(PyExc_TypeError, "Expected the callable as the third argument");
+        return nullptr;
+    }
+    if (suppression_depth != 0)
+    {
+        Py_RETURN_NONE;
+    }
+    auto* instrumenter = CInstrumenter::from_PyObject(self);
+    if (is_call)
+    {
+        instrumenter->on_c_call(*args[2]);
     }
     else
     {
-        PyEval_SetProfile(nullptr, nullptr);
+        instrumenter->on_c_return(*args[2]);
     }
-    if (threading_set_instrumenter)
+    Py_RETURN_NONE;
+}
+
+/// The method names are the names of the events in sys.monitoring.events.
+static PyMethodDef monitoring_callbacks[] = {
+    { "PY_START", reinterpret_cast<PyCFunction>(monitoring_callback<true, true>), METH_FASTCALL,
+      nullptr },
+    { "PY_RETURN", reinterpret_cast<PyCFunction>(monitoring_callback<false, true>), METH_FASTCALL,
+      nullptr },
+    { "PY_UNWIND", reinterpret_cast<PyCFunction>(monitoring_callback<false, false>), METH_FASTCALL,
+      nullptr },
+};
+
+/// Callbacks only registered if each resume of a generator is a region of its own. Resuming and
+/// yielding generators are handled like calls and returns, as the profile interface does, to keep
+/// the regions properly nested. Lifetime regions need no events at all at the suspension points
+static PyMethodDef monitoring_resume_callbacks[] = {
+    { "PY_RESUME", reinterpret_cast<PyCFunction>(monitoring_callback<true, true>), METH_FASTCALL,
+      nullptr },
+    { "PY_THROW", reinterpret_cast<PyCFunction>(monitoring_callback<true, false>), METH_FASTCALL,
+      nullptr },
+    { "PY_YIELD", reinterpret_cast<PyCFunction>(monitoring_callback<false, true>), METH_FASTCALL,
+      nullptr },
+};
+
+/// Callbacks only registered if C functions are recorded
+static PyMethodDef monitoring_c_callbacks[] = {
+    { "CALL", reinterpret_cast<PyCFunction>(monitoring_c_callback<true>), METH_FASTCALL, nullptr },
+    { "C_RETURN", reinterpret_cast<PyCFunction>(monitoring_c_callback<false>), METH_FASTCALL,
+      nullptr },
+    { "C_RAISE", reinterpret_cast<PyCFunction>(monitoring_c_callback<false>), METH_FASTCALL,
+      nullptr },
+};
+
+bool CInstrumenter::init_monitoring()
+{
+    PyRefObject sys_module(PyImport_ImportModule("sys"), adopt_object);
+    if (!sys_module)
     {
-        PyRefObject result(PyObject_CallFunction(threading_set_instrumenter, "O", Py_None),
-                           adopt_object);
+        return false;
+    }
+    monitoring_module = PyObject_GetAttrString(sys_module, "monitoring");
+    if (!monitoring_module)
+    {
+        return false;
+    }
+
+    // Use our own tool id, so debuggers and coverage tools keep working alongside.
+    // Prefer the id meant for profilers, but fall back to the ids that have no designated use.
+    PyRefObject profiler_id(PyObject_GetAttrString(monitoring_module, "PROFILER_ID"), adopt_object);
+    if (!profiler_id)
+    {
+        return false;
+    }
+    const std::array<int, 3> tool_ids = { static_cast<int>(PyLong_AsLong(profiler_id)), 3, 4 };
+    for (const int tool_id : tool_ids)
+    {
+        PyRefObject result(
+            PyObject_CallMethod(monitoring_module, "use_tool_id", "is", tool_id, "scorep"),
+            adopt_object);
+        if (result)
+        {
+            monitoring_tool_id = tool_id;
+            break;
+        }
+        if (!PyErr_ExceptionMatches(PyExc_ValueError))
+        {
+            return false;
+        }
+        PyErr_Clear();
+    }
+    if (monitoring_tool_id < 0)
+    {
+        PyErr_SetString(PyExc_RuntimeError, "All sys.monitoring tool ids are already in use");
+        return false;
+    }
+    return true;
+}
+
+bool CInstrumenter::set_monitoring_callbacks(bool enabled)
+{
+    PyRefObject events(PyObject_GetAttrString(monitoring_module, "events"), adopt_object);
+    if (!events)
+    {
+        return false;
+    }
+    monitoring_events = 0;
+    const auto register_callbacks = [&](auto& callback_defs) {
+        for (auto& callback_def : callback_defs)
+        {
+            PyRefObject event(PyObject_GetAttrString(events, callback_def.ml_name), adopt_object);
+            if (!event)
+            {
+                return false;
+            }
+            PyRefObject callback(
+                enabled ? PyCFunction_New(&callback_def, to_PyObject()) : Py_NewRef(Py_None),
+                adopt_object);
+            if (!callback)
+            {
+                return false;
+            }
+            PyRefObject result(PyObject_CallMethod(monitoring_module, "register_callback", "iOO",
+                                                   monitoring_tool_id,
+                                                   static_cast<PyObject*>(event),
+                                                   static_cast<PyObject*>(callback)),
+                               adopt_object);
+            if (!result)
+            {
+                return false;
+            }
+            monitoring_events |= PyLong_AsLong(event);
+        }
+        return true;
+    };
+    return register_callbacks(monitoring_callbacks) &&
+           (generator_regions == GeneratorRegions::Lifetime ||
+            register_callbacks(monitoring_resume_callbacks)) &&
+           (!c_call_patterns || register_callbacks(monitoring_c_callbacks));
+}
+
+void CInstrumenter::deinit_monitoring()
+{
+    if (monitoring_tool_id >= 0)
+    {
+        PyRefObject result(
+            PyObject_CallMethod(monitoring_module, "free_tool_id", "i", monitoring_tool_id),
+            adopt_object);
+        if (!result)
+        {
+            PyErr_Clear();
+        }
+        monitoring_tool_id = -1;
+    }
+    Py_CLEAR(monitoring_module);
+}
+
+#else
+
+bool CInstrumenter::init_monitoring()
+{
+    PyErr_SetString(PyExc_RuntimeError, "sys.monitoring requires Python 3.12 or newer");
+    return false;
+}
+
+bool CInstrumenter::set_monitoring_callbacks(bool)
+{
+    return true;
+}
+
+void CInstrumenter::deinit_monitoring()
+{
+}
+
+#endif
+
+#if PY_VERSION_HEX >= 0x03090000
+
+/// Code objects on the stack of a thread at its previous sample, outermost first.
+/// The references to the code objects are owned.
+struct SampledStack
+{
+    unsigned long thread_id;
+    std::vector<PyCodeObject*> codes;
+
+    /// Leave the regions of the stack down to the given depth
+    void pop(std::size_t depth)
+    {
+        // Regions can only be left on the thread that entered them. This is not the case when
+        // the thread states of daemon threads are cleared at shutdown
+        const bool own_thread = thread_id == PyThread_get_thread_ident();
+        while (codes.size() > depth)
+        {
+            PyCodeObject* code = codes.back();
+            codes.pop_back();
+            if (own_thread)
+            {
+                try_region_end(code);
+            }
+            Py_DECREF(code);
+        }
+    }
+};
+
+/// Key of the sampled stack in the thread state dict and name of its capsule. The capsule is
+/// destroyed together with the thread state, which leaves the remaining regions of the thread
+static const char* const sampled_stack_key = "scorep.sampled_stack";
+
+static void free_sampled_stack(PyObject* capsule)
+{
+    auto* stack = static_cast<SampledStack*>(PyCapsule_GetPointer(capsule, sampled_stack_key));
+    stack->pop(0);
+    delete stack;
+}
+
+/// Return the sampled stack of the current thread or nullptr if it has none
+static SampledStack* find_sampled_stack()
+{
+    PyObject* dict = PyThreadState_GetDict();
+    PyObject* capsule = dict ? PyDict_GetItemString(dict, sampled_stack_key) : nullptr;
+    if (!capsule)
+    {
+        return nullptr;
+    }
+    return static_cast<SampledStack*>(PyCapsule_GetPointer(capsule, sampled_stack_key));
+}
+
+/// Add an empty sampled stack to the current thread. Return nullptr and set an exception on error
+static SampledStack* add_sampled_stack()
+{
+    PyObject* dict = PyThreadState_GetDict();
+    if (!dict)
+    {
+        PyErr_SetString(PyExc_RuntimeError, "The thread has no thread state dict");
+        return nullptr;
+    }
+    auto* stack = new SampledStack{ PyThread_get_thread_ident(), {} };
+    PyRefObject capsule(PyCapsule_New(stack, sampled_stack_key, free_sampled_stack), adopt_object);
+    if (!capsule)
+    {
+        delete stack;
+        return nullptr;
+    }
+    if (PyDict_SetItemString(dict, sampled_stack_key, capsule) < 0)
+    {
+        return nullptr;
+    }
+    return stack;
+}
+
+/// Profile function taking one sample of the current thread, see CInstrumenter::sample_threads
+static int sampling_callback(PyObject* obj, PyFrameObject* frame, int, PyObject*)
+{
+    auto* instrumenter = CInstrumenter::from_PyObject(obj);
+    // The thread arming the samples is not sampled. Every thread removes the profile function
+    // after its sample, so between the samples the calls of all threads run without a hook.
+    // On Python 3.12+ this re-instruments the code objects with every sample, which costs
+    // per sample and not per call
+    if (PyThread_get_thread_ident() != instrumenter->sampling_thread_id &&
+        suppression_depth == 0 && !instrumenter->sample(*frame))
+    {
+        PyErr_WriteUnraisable(obj);
+    }
+    PyEval_SetProfile(nullptr, nullptr);
+    return 0;
+}
+
+/// Profile function leaving all sampled regions of the current thread
+static int sampling_flush_callback(PyObject*, PyFrameObject*, int, PyObject*)
+{
+    if (SampledStack* stack = find_sampled_stack())
+    {
+        stack->pop(0);
+    }
+    PyEval_SetProfile(nullptr, nullptr);
+    return 0;
+}
+
+void CInstrumenter::enable_sampling()
+{
+    PyObject* frames = PyList_New(0);
+    if (!frames)
+    {
+        PyErr_WriteUnraisable(to_PyObject());
+        return;
+    }
+    PyFrameObject* frame = PyEval_GetFrame();
+    Py_XINCREF(frame);
+    while (frame)
+    {
+        PyList_Append(frames, reinterpret_cast<PyObject*>(frame));
+        PyFrameObject* back = PyFrame_GetBack(frame);
+        Py_DECREF(frame);
+        frame = back;
+    }
+    Py_XSETREF(sampling_base_frames, frames);
+}
+
+void CInstrumenter::disable_sampling()
+{
+    // Each thread leaves its sampled regions with its next event, the current one right now
+    compat::set_profile_all_threads(sampling_flush_callback, to_PyObject());
+    PyEval_SetProfile(nullptr, nullptr);
+    if (SampledStack* stack = find_sampled_stack())
+    {
+        stack->pop(0);
+    }
+    sampling_thread_id = 0;
+    Py_CLEAR(sampling_base_frames);
+}
+
+void CInstrumenter::sample_threads()
+{
+    sampling_thread_id = PyThread_get_thread_ident();
+    compat::set_profile_all_threads(sampling_callback, to_PyObject());
+}
+
+bool CInstrumenter::is_sampling_base_frame(PyFrameObject* frame)
+{
+    if (!sampling_base_frames)
+    {
+        return false;
+    }
+    const Py_ssize_t size = PyList_GET_SIZE(sampling_base_frames);
+    for (Py_ssize_t i = 0; i < size; i++)
+    {
+        if (PyList_GET_ITEM(sampling_base_frames, i) == reinterpret_cast<PyObject*>(frame))
+        {
+            return true;
+        }
+    }
+    return false;
+}
+
+bool CInstrumenter::sample(PyFrameObject& frame)
+{
+    SampledStack* stack = find_sampled_stack();
+    if (!stack && !(stack = add_sampled_stack()))
+    {
+        return false;
+    }
+
+    // Collect the frames of this thread, outermost first
+    std::vector<PyRefObject> frames;
+    for (PyFrameObject* current = &frame; current && !is_sampling_base_frame(current);)
+    {
+        frames.emplace_back(reinterpret_cast<PyObject*>(current), retain_object);
+        PyFrameObject* back = PyFrame_GetBack(current);
+        Py_XDECREF(back); // The frame is still referenced by its successor
+        current = back;
+    }
+    std::reverse(frames.begin(), frames.end());
+
+    // Leave the regions that are no longer on the stack, and enter the new ones
+    std::size_t depth = 0;
+    while (depth < frames.size() && depth < stack->codes.size())
+    {
+        PyObject* current = frames[depth];
+        PyCodeObject* code = PyFrame_GetCode(reinterpret_cast<PyFrameObject*>(current));
+        Py_DECREF(code);
+        if (code != stack->codes[depth])
+        {
+            break;
+        }
+        depth++;
+    }
+    stack->pop(depth);
+    // Like for calls, the maximum depth counts recorded regions only
+    unsigned long recorded_depth = 0;
+    if (max_depth != 0)
+    {
+        recorded_depth = std::count_if(stack->codes.begin(), stack->codes.end(),
+                                       [](PyCodeObject* code) {
+                                           const code_region* region = find_region(code);
+                                           return region && region->recorded;
+                                       });
+    }
+    for (std::size_t i = depth; i < frames.size(); i++)
+    {
+        if (max_depth != 0 && recorded_depth >= max_depth)
+        {
+            break;
+        }
+        PyObject* obj = frames[i];
+        auto* current = reinterpret_cast<PyFrameObject*>(obj);
+        PyCodeObject* code = PyFrame_GetCode(current);
+        if (region_enter(*code, current))
+        {
+            recorded_depth++;
+        }
+        stack->codes.push_back(code);
     }
+    return true;
+}
+
+#else
+
+void CInstrumenter::enable_sampling()
+{
+}
+
+void CInstrumenter::disable_sampling()
+{
+}
+
+void CInstrumenter::sample_threads()
+{
+}
+
+bool CInstrumenter::sample(PyFrameObject&)
+{
+    return true;
 }
 
+#endif
+
 /// Mapping of PyTrace_* to it's string representations
 /// List taken from CPythons sysmodule.c
 static const std::array<std::string, 8> WHAT_STRINGS = { "call",     "exception", "line",
@@ -94,9 +679,9 @@ PyObject* CInstrumenter::operator()(PyFrameObject& frame, const char* what_strin
     // To speed up further event processing install this class directly as the handler
     // But we might be inside a `sys.settrace` call where the user wanted to set another function
     // which would then be overwritten here. Hence use the CALL event which avoids the problem
-    if (what == PyTrace_CALL)
+    if (what == PyTrace_CALL && !enable_instrumenter(false))
     {
-        enable_instrumenter();
+        return nullptr;
     }
     if (on_event(frame, what, arg))
     {
@@ -109,47 +694,537 @@ PyObject* CInstrumenter::operator()(PyFrameObject& frame, const char* what_strin
     }
 }
 
-bool CInstrumenter::on_event(PyFrameObject& frame, int what, PyObject*)
+bool CInstrumenter::on_event(PyFrameObject& frame, int what, PyObject* arg)
 {
+    if (suppression_depth != 0)
+    {
+        return true;
+    }
     switch (what)
     {
     case PyTrace_CALL:
     {
         PyCodeObject* code = PyFrame_GetCode(&frame);
-        bool success = try_region_begin(code);
-        if (!success)
-        {
-            const auto name = compat::get_string_as_utf_8(code->co_name);
-            const auto module_name = get_module_name(frame);
-            if (name.compare("_unsetprofile") != 0 && module_name.compare(0, 6, "scorep") != 0)
-            {
-                const int line_number = code->co_firstlineno;
-                const auto file_name = get_file_name(frame);
-                region_begin(name, std::move(module_name), std::move(file_name), line_number, code);
-            }
-        }
+        on_call(*code, &frame);
         Py_DECREF(code);
         break;
     }
     case PyTrace_RETURN:
     {
         PyCodeObject* code = PyFrame_GetCode(&frame);
-        bool success = try_region_end(code);
-        if (!success)
+        on_return(*code, &frame);
+        Py_DECREF(code);
+        break;
+    }
+    case PyTrace_C_CALL:
+        if (c_call_patterns)
         {
-            const auto name = compat::get_string_as_utf_8(code->co_name);
-            const auto module_name = get_module_name(frame);
-            // TODO: Use string_view/CString comparison?
-            if (name.compare("_unsetprofile") != 0 && module_name.compare(0, 6, "scorep") != 0)
-            {
-                region_end(name, std::move(module_name), code);
-            }
+            on_c_call(*arg);
         }
-        Py_DECREF(code);
         break;
+    case PyTrace_C_RETURN:
+    case PyTrace_C_EXCEPTION:
+        if (c_call_patterns)
+        {
+            on_c_return(*arg);
+        }
+        break;
+    }
+    return true;
+}
+
+/// Number of calls of the current thread that are nested in the calls recorded by CInstrumenter.
+/// Only counted if the call depth is limited
+static thread_local unsigned long call_depth = 0;
+
+/// Calls of the current thread that were entered by region_enter and did not return yet.
+/// The calls that started before the instrumenter was enabled, e.g. in threads that were running
+/// already, return without being open
+static thread_local unsigned long open_calls = 0;
+
+/// A C call of the current thread that was seen by on_c_call
+struct c_call
+{
+    const region_handle* region;
+    /// False if the call is below the maximum depth and only counted
+    bool recorded;
+};
+
+/// C calls of the current thread that were seen by on_c_call and did not return yet, innermost
+/// last. Like for open_calls, the returns of the calls that were not seen are ignored
+static thread_local std::vector<c_call> open_c_calls;
+
+/// Code objects whose frames can be suspended
+static constexpr int generator_code_flags = CO_GENERATOR | CO_COROUTINE | CO_ASYNC_GENERATOR;
+
+/// A recorded call of a generator or coroutine
+struct generator_call
+{
+    /// Owned reference, as lifetime regions may outlive their generator
+    PyCodeObject* code;
+    /// call_depth when a lifetime region started
+    unsigned long depth;
+    /// The generator ended while a call nested into its caller was still running. The lifetime
+    /// region ends once the call depth is back at depth, so the regions stay properly nested
+    bool finished = false;
+};
+
+/// Generator regions of the current thread that did not end yet, innermost last
+static thread_local std::vector<generator_call> generator_calls;
+
+static void pop_generator_call()
+{
+    Py_DECREF(generator_calls.back().code);
+    generator_calls.pop_back();
+}
+
+/// End the lifetime regions of the current thread that started at or below the call depth.
+/// A region ends before the region it started in, so the regions stay properly nested
+static void end_generator_lifetimes(unsigned long depth)
+{
+    while (!generator_calls.empty() && generator_calls.back().depth >= depth)
+    {
+        try_region_end(generator_calls.back().code);
+        pop_generator_call();
+    }
+}
+
+/// End the lifetime regions of finished generators that were deferred until the call depth is
+/// back at the depth they started at
+static void end_finished_generator_lifetimes()
+{
+    while (!generator_calls.empty() && generator_calls.back().finished &&
+           generator_calls.back().depth >= call_depth)
+    {
+        try_region_end(generator_calls.back().code);
+        pop_generator_call();
+    }
+}
+
+bool CInstrumenter::on_call(PyCodeObject& code, PyFrameObject* frame)
+{
+    const bool is_generator = code.co_flags & generator_code_flags;
+    if (is_generator && generator_regions == GeneratorRegions::Lifetime)
+    {
+        return lifetime_enter(code, frame);
+    }
+    // Calls below the maximum depth are only counted, so their returns stay balanced
+    if (max_depth != 0 && call_depth >= max_depth)
+    {
+        call_depth++;
+        return true;
+    }
+    bool recorded;
+    if (burst_min_calls != 0)
+    {
+        recorded = burst_enter(code, frame);
+    }
+    else if ((recorded = region_enter(code, frame)))
+    {
+        open_calls++;
+    }
+    if (recorded && counts_call_depth())
+    {
+        call_depth++;
+    }
+    if (recorded && is_generator)
+    {
+        Py_INCREF(&code);
+        generator_calls.push_back({ &code, call_depth });
+    }
+    return recorded;
+}
+
+bool CInstrumenter::on_return(PyCodeObject& code, PyFrameObject* frame)
+{
+    const bool is_generator = code.co_flags & generator_code_flags;
+    if (is_generator && generator_regions == GeneratorRegions::Lifetime)
+    {
+        return lifetime_exit(code);
+    }
+    if (max_depth != 0 && call_depth > max_depth)
+    {
+        call_depth--;
+        return true;
+    }
+    if (is_generator)
+    {
+        // Only a resume that was entered is left. Others, like the one enabling the
+        // instrumenter, would cause an exit without an enter
+        if (generator_calls.empty() || generator_calls.back().code != &code)
+        {
+            const code_region* region = find_region(&code);
+            return !region || region->recorded || region->burst_active_calls != 0;
+        }
+        pop_generator_call();
+    }
+    else if (generator_regions == GeneratorRegions::Lifetime && !generator_calls.empty())
+    {
+        // Generators started by this call, that are still suspended, end together with it
+        const code_region* region = find_region(&code);
+        if (region && region->recorded)
+        {
+            end_generator_lifetimes(call_depth);
+        }
+    }
+    // Excluded code objects have not been counted. The return of a call that started before the
+    // instrumenter was enabled has not been counted either
+    bool ended = false;
+    bool recorded;
+    if (burst_min_calls != 0)
+    {
+        recorded = burst_exit(code, frame, ended);
+    }
+    else if (open_calls == 0)
+    {
+        const code_region* region = find_region(&code);
+        return !region || region->recorded;
+    }
+    else if ((recorded = ended = region_exit(code, frame)))
+    {
+        open_calls--;
+    }
+    if (ended && counts_call_depth() && call_depth > 0)
+    {
+        call_depth--;
+        end_finished_generator_lifetimes();
+    }
+    return recorded;
+}
+
+bool CInstrumenter::lifetime_enter(PyCodeObject& code, PyFrameObject* frame)
+{
+    // Lifetime regions are not nested into the calls of the generator's callers, so they do not
+    // count as call depth, and the burst filter does not measure them
+    if (max_depth != 0 && call_depth >= max_depth)
+    {
+        return true;
+    }
+    const bool recorded = region_enter(code, frame);
+    if (recorded)
+    {
+        Py_INCREF(&code);
+        generator_calls.push_back({ &code, call_depth });
+    }
+    return recorded;
+}
+
+bool CInstrumenter::lifetime_exit(PyCodeObject& code)
+{
+    // Generators of the same code object cannot be told apart, but their regions are the same
+    const auto call = std::find_if(generator_calls.rbegin(), generator_calls.rend(),
+                                   [&](const generator_call& generator) {
+                                       return generator.code == &code && !generator.finished;
+                                   });
+    if (call == generator_calls.rend())
+    {
+        // The region already ended with the call that started it, or the generator started
+        // before the instrumenter was enabled
+        const code_region* region = find_region(&code);
+        return !region || region->recorded;
+    }
+    // The generator ends in a call nested into the one that started it, e.g. a consumer it was
+    // passed to. Its region ends when that call returns
+    if (call->depth < call_depth)
+    {
+        call->finished = true;
+        return true;
+    }
+    // Generators started later, that are still suspended, end first
+    while (generator_calls.back().code != &code || generator_calls.back().finished)
+    {
+        try_region_end(generator_calls.back().code);
+        pop_generator_call();
+    }
+    try_region_end(&code);
+    pop_generator_call();
+    return true;
+}
+
+bool CInstrumenter::on_c_call(PyObject& callable)
+{
+    const region_handle* region = c_function_region(callable, true);
+    if (!region)
+    {
+        return false;
+    }
+    // Like for Python functions, calls below the maximum depth are only counted
+    if (max_depth != 0 && call_depth >= max_depth)
+    {
+        open_c_calls.push_back({ region, false });
+        call_depth++;
+        return true;
+    }
+    if (*region == uninitialised_region_handle)
+    {
+        return false;
+    }
+    SCOREP_User_RegionEnter(region->value);
+    open_c_calls.push_back({ region, true });
+    if (counts_call_depth())
+    {
+        call_depth++;
+    }
+    return true;
+}
+
+bool CInstrumenter::on_c_return(PyObject& callable)
+{
+    const region_handle* region = c_function_region(callable, false);
+    if (!region)
+    {
+        return false;
+    }
+    // A call that was not seen cannot be left, e.g. one that was running when the instrumenter
+    // was enabled
+    if (open_c_calls.empty() || open_c_calls.back().region != region)
+    {
+        return *region != uninitialised_region_handle;
+    }
+    const bool recorded = open_c_calls.back().recorded;
+    open_c_calls.pop_back();
+    if (!recorded)
+    {
+        call_depth--;
+        return true;
+    }
+    if (generator_regions == GeneratorRegions::Lifetime && !generator_calls.empty())
+    {
+        end_generator_lifetimes(call_depth);
+    }
+    SCOREP_User_RegionEnd(region->value);
+    if (counts_call_depth() && call_depth > 0)
+    {
+        call_depth--;
+        end_finished_generator_lifetimes();
+    }
+    return true;
+}
+
+/// Return whether the method definition is statically allocated in a loaded library, like the
+/// ones of most extension modules. Others are allocated at runtime and may be freed with their
+/// function. The result is cached per thread, as an address stays in a library or out of it,
+/// because extension modules are never unloaded
+static bool is_static_method_def(const PyMethodDef* method)
+{
+    thread_local std::unordered_map<const PyMethodDef*, bool> cache;
+    auto [it, inserted] = cache.try_emplace(method, false);
+    if (inserted)
+    {
+        Dl_info info;
+        it->second = dladdr(method, &info) != 0;
+    }
+    return it->second;
+}
+
+const region_handle* CInstrumenter::c_function_region(PyObject& callable, bool create)
+{
+    const PyMethodDef* method = get_method_def(&callable);
+    if (!method)
+    {
+        return nullptr;
+    }
+    const bool is_static = is_static_method_def(method);
+    if (is_static)
+    {
+        if (const region_handle* region = find_c_function_region(method))
+        {
+            return region;
+        }
+        if (!create)
+        {
+            return nullptr;
+        }
+    }
+    auto [module_name, function_name] = get_c_function_name(&callable, *method);
+    const auto region_name = make_region_name(module_name, function_name);
+    if (!is_static)
+    {
+        if (const region_handle* region = find_c_function_region(region_name))
+        {
+            return region;
+        }
+        if (!create)
+        {
+            return nullptr;
+        }
+    }
+    // Setting the profile function of a thread returns with the profile function already set,
+    // e.g. when threading starts a new thread. These calls are never balanced
+    const bool sets_profile = region_name == "sys:setprofile" || region_name == "sys:settrace";
+    bool allowed = false;
+    for (Py_ssize_t i = 0; !sets_profile && !allowed && i < PyTuple_GET_SIZE(c_call_patterns); i++)
+    {
+        const auto pattern = compat::get_string_as_utf_8(PyTuple_GET_ITEM(c_call_patterns, i));
+        allowed = fnmatch(std::string(pattern).c_str(), region_name.c_str(), 0) == 0;
+    }
+    add_c_function_region(is_static ? method : nullptr, function_name, std::move(module_name),
+                          allowed);
+    return is_static ? find_c_function_region(method) : find_c_function_region(region_name);
+}
+
+/// A call entered by CInstrumenter::burst_enter
+struct burst_call
+{
+    code_region* region;
+    /// Start of the call in nanoseconds if the burst filter measures it
+    std::uint64_t start;
+    bool measured;
+};
+
+/// Calls of the current thread entered by CInstrumenter::burst_enter that did not end yet
+static thread_local std::vector<burst_call> burst_calls;
+
+/// Names of the regions excluded by the burst filter, protected by demoted_regions_mutex
+static std::vector<std::string> demoted_regions;
+static std::mutex demoted_regions_mutex;
+
+static std::uint64_t now_in_nanoseconds()
+{
+    using namespace std::chrono;
+    return duration_cast<nanoseconds>(steady_clock::now().time_since_epoch()).count();
+}
+
+void CInstrumenter::set_burst_filter(std::uint64_t min_calls, std::uint64_t max_nanoseconds)
+{
+    burst_min_calls = min_calls;
+    burst_max_nanoseconds = max_nanoseconds;
+}
+
+PyObject* CInstrumenter::get_demoted_regions()
+{
+    std::lock_guard<std::mutex> lock(demoted_regions_mutex);
+    PyObject* result = PyList_New(demoted_regions.size());
+    if (!result)
+    {
+        return nullptr;
     }
+    for (std::size_t i = 0; i < demoted_regions.size(); i++)
+    {
+        PyObject* name = PyUnicode_FromString(demoted_regions[i].c_str());
+        if (!name)
+        {
+            Py_DECREF(result);
+            return nullptr;
+        }
+        PyList_SET_ITEM(result, i, name);
     }
+    return result;
+}
+
+bool CInstrumenter::burst_enter(PyCodeObject& code, PyFrameObject* frame)
+{
+    code_region* region = find_region(&code);
+    if (!region)
+    {
+        // A new region is entered right away, unless it is excluded
+        if (!region_enter(code, frame))
+        {
+            return false;
+        }
+        region = find_region(&code);
+        if (!region)
+        {
+            return true;
+        }
+    }
+    else if (!region->recorded)
+    {
+        return false;
+    }
+    else
+    {
+        SCOREP_User_RegionEnter(region->handle.value);
+    }
+    const bool measured = !region->burst_decided;
+    if (measured)
+    {
+        region->burst_active_calls++;
+    }
+    burst_calls.push_back({ region, measured ? now_in_nanoseconds() : 0, measured });
     return true;
 }
 
+bool CInstrumenter::burst_exit(PyCodeObject& code, PyFrameObject* frame, bool& ended)
+{
+    code_region* region = find_region(&code);
+    if (!region)
+    {
+        return ended = region_exit(code, frame);
+    }
+    // Only calls that were entered are left. This keeps the regions balanced if the region was
+    // excluded in the meantime, or if the call started before the instrumenter was enabled
+    if (burst_calls.empty() || burst_calls.back().region != region)
+    {
+        // Once no excluded call is left, the events of the code object may be disabled
+        return region->recorded || region->burst_active_calls != 0;
+    }
+    const burst_call call = burst_calls.back();
+    burst_calls.pop_back();
+    if (call.measured)
+    {
+        const std::uint64_t nanoseconds =
+            (region->burst_nanoseconds += now_in_nanoseconds() - call.start);
+        const std::uint64_t calls = ++region->burst_calls;
+        if (calls >= burst_min_calls && !region->burst_decided.exchange(true))
+        {
+            if (nanoseconds < burst_max_nanoseconds * calls)
+            {
+                region->recorded = false;
+                if (frame || (frame = PyEval_GetFrame()))
+                {
+                    auto region_name =
+                        make_region_name(get_module_name(*frame), get_function_name(code));
+                    std::lock_guard<std::mutex> lock(demoted_regions_mutex);
+                    demoted_regions.push_back(std::move(region_name));
+                }
+            }
+        }
+        region->burst_active_calls--;
+    }
+    SCOREP_User_RegionEnd(region->handle.value);
+    ended = true;
+    return true;
+}
+
+bool CInstrumenter::region_enter(PyCodeObject& code, PyFrameObject* frame)
+{
+    if (const code_region* region = find_region(&code))
+    {
+        if (region->recorded)
+        {
+            SCOREP_User_RegionEnter(region->handle.value);
+        }
+        return region->recorded;
+    }
+    if (!frame && !(frame = PyEval_GetFrame()))
+    {
+        return true;
+    }
+    const auto name = get_function_name(code);
+    const auto module_name = get_module_name(*frame);
+    const int line_number = code.co_firstlineno;
+    const auto file_name = get_file_name(*frame);
+    return region_begin(name, std::move(module_name), std::move(file_name), line_number, &code);
+}
+
+bool CInstrumenter::region_exit(PyCodeObject& code, PyFrameObject* frame)
+{
+    if (const code_region* region = find_region(&code))
+    {
+        if (region->recorded)
+        {
+            SCOREP_User_RegionEnd(region->handle.value);
+        }
+        return region->recorded;
+    }
+    if (!frame && !(frame = PyEval_GetFrame()))
+    {
+        return true;
+    }
+    const auto name = get_function_name(code);
+    const auto module_name = get_module_name(*frame);
+    return region_end(name, std::move(module_name), &code);
+}
+
 } // namespace scorepy
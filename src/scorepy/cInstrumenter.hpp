@@ -1,16 +1,32 @@
 #pragma once
 
 #include <Python.h>
+#include <cstdint>
 #include <frameobject.h>
 
 namespace scorepy
 {
+struct region_handle;
+
 /// Interface to Python used to implement an instrumenter
-/// See sys.settrace/setprofile
+/// See sys.settrace/setprofile and sys.monitoring (PEP 669).
+/// Sampling uses setprofile only for one event per thread and sample.
 enum class InstrumenterInterface
 {
     Profile,
-    Trace
+    Trace,
+    Monitoring,
+    Sampling
+};
+
+/// Part of the execution of a generator or coroutine that is recorded as one region
+enum class GeneratorRegions
+{
+    /// Each resume until the next yield or await, like the calls of functions
+    Resume,
+    /// The whole lifetime from the start until the end. Only the Monitoring interface can tell a
+    /// resume from the start of a generator
+    Lifetime
 };
 
 struct CInstrumenter
@@ -19,15 +35,76 @@ struct CInstrumenter
     InstrumenterInterface interface;
     PyObject* threading_module;
     PyObject* threading_set_instrumenter;
+    /// sys.monitoring module, only used by the Monitoring interface
+    PyObject* monitoring_module;
+    /// tool id claimed in sys.monitoring or -1
+    int monitoring_tool_id;
+    /// Events of the callbacks registered in sys.monitoring
+    long monitoring_events;
+    /// Frames of the thread enabling the Sampling interface. They belong to the caller of the
+    /// instrumenter, so they and their callers are not sampled
+    PyObject* sampling_base_frames;
+    /// Thread that arms the sampling of all other threads
+    unsigned long sampling_thread_id;
+    /// Calls nested deeper than this are not recorded, 0 records all calls
+    unsigned long max_depth;
+    /// Regions with at least this many calls that took less than burst_max_nanoseconds on
+    /// average are no longer recorded. 0 disables this burst filter
+    std::uint64_t burst_min_calls;
+    std::uint64_t burst_max_nanoseconds;
+    /// Tuple of glob patterns of the region names of C functions to record, or nullptr to
+    /// record no C functions
+    PyObject* c_call_patterns;
+    GeneratorRegions generator_regions;
+    /// Entry point of the vectorcall protocol (PEP 590) for calls of the object from Python
+    vectorcallfunc vectorcall;
 
-    void init(InstrumenterInterface interface);
+    /// Return false and set a Python exception on error.
+    /// c_calls is a sequence of glob patterns, see c_call_patterns, or nullptr
+    bool init(InstrumenterInterface interface, unsigned long max_depth, PyObject* c_calls,
+              GeneratorRegions generator_regions);
+    /// Enable the burst filter, see burst_min_calls
+    void set_burst_filter(std::uint64_t min_calls, std::uint64_t max_nanoseconds);
+    /// Return a list of the names of the regions excluded by the burst filter so far
+    static PyObject* get_demoted_regions();
     void deinit();
-    void enable_instrumenter();
-    void disable_instrumenter();
+    /// Install the instrumenter in all threads of the interpreter, including the ones that are
+    /// running already, and in the threads started later. If all_threads is false, only the
+    /// current thread is affected. Return false and set a Python exception on error
+    bool enable_instrumenter(bool all_threads = true);
+    bool disable_instrumenter();
+
+    /// Stop recording the events of the current thread until resume is called as often.
+    /// The callbacks stay installed, so this only counts the nesting.
+    static void suppress();
+    /// Return false if the current thread is not suppressed
+    static bool resume();
+    static bool is_suppressed();
+
+    /// Let all threads take a sample of their stack with their next Python event.
+    /// Only used by the Sampling interface
+    void sample_threads();
+    /// Compare the stack of the current thread starting at the frame with the previous sample and
+    /// record the regions that were left and entered since then. Return false on error
+    bool sample(PyFrameObject& frame);
 
     /// Callback for when this object is called directly
     PyObject* operator()(PyFrameObject& frame, const char* what, PyObject* arg);
 
+    /// Handle the start of a code object (call, generator resume).
+    /// If frame is nullptr the current frame is used, if required.
+    /// Return false if the code object is excluded from the instrumentation
+    bool on_call(PyCodeObject& code, PyFrameObject* frame);
+    /// Handle the end of a code object (return, yield, unwind).
+    /// If frame is nullptr the current frame is used, if required.
+    /// Return false if the code object is excluded from the instrumentation
+    bool on_return(PyCodeObject& code, PyFrameObject* frame);
+
+    /// Handle the start and the end of a call of a callable, if it is a C function.
+    /// Return false if the callable is no C function or is not recorded
+    bool on_c_call(PyObject& callable);
+    bool on_c_return(PyObject& callable);
+
     /// These casts are valid as long as `PyObject_HEAD` is the first entry in this struct
     PyObject* to_PyObject()
     {
@@ -41,6 +118,42 @@ struct CInstrumenter
 private:
     /// Callback for Python trace/profile events. Return true for success
     bool on_event(PyFrameObject& frame, int what, PyObject* arg);
+
+    /// Record the begin or end of the region of a code object regardless of the call depth.
+    /// Return false if the code object is excluded from the instrumentation
+    bool region_enter(PyCodeObject& code, PyFrameObject* frame);
+    bool region_exit(PyCodeObject& code, PyFrameObject* frame);
+    /// Handle the start and the end of a generator with lifetime regions
+    bool lifetime_enter(PyCodeObject& code, PyFrameObject* frame);
+    bool lifetime_exit(PyCodeObject& code);
+    /// Return the region of a C function, creating it on first use if create is set. Return
+    /// nullptr if the callable is no C function or was not seen before, or an uninitialised
+    /// handle if the function is not recorded
+    const region_handle* c_function_region(PyObject& callable, bool create);
+
+    /// Like region_enter and region_exit, but measure the calls for the burst filter.
+    /// `ended` is set if a region was left
+    bool burst_enter(PyCodeObject& code, PyFrameObject* frame);
+    bool burst_exit(PyCodeObject& code, PyFrameObject* frame, bool& ended);
+
+    /// Claim a tool id in sys.monitoring
+    bool init_monitoring();
+    /// Register the callbacks in sys.monitoring and set monitoring_events, or unregister them if
+    /// enabled is false. The callbacks hold references to the instrumenter.
+    /// Return false and set a Python exception on error
+    bool set_monitoring_callbacks(bool enabled);
+    void deinit_monitoring();
+
+    /// The depth of calls is only counted if it is limited or needed for lifetime regions
+    bool counts_call_depth() const
+    {
+        return max_depth != 0 || generator_regions == GeneratorRegions::Lifetime;
+    }
+
+    void enable_sampling();
+    void disable_sampling();
+    /// Return true if the frame belongs to the caller that enabled the Sampling interface
+    bool is_sampling_base_frame(PyFrameObject* frame);
 };
 
 } // namespace scorepy
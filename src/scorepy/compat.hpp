@@ -1,7 +1,6 @@
 #pragma once
 
 #include <array>
-#include <functional>
 #include <iostream>
 #include <string_view>
 
@@ -14,10 +13,11 @@ namespace compat
 {
     /// Region names that are known to have no region enter event and should not report an error
     /// on region exit
-    static const std::array<std::string, 4> exit_region_whitelist = {
+    static const std::array<std::string, 6> exit_region_whitelist = {
 #if PY_MAJOR_VERSION >= 3
-        "threading.Thread:_bootstrap_inner", "threading.Thread:_bootstrap",
-        "threading.TMonitor:_bootstrap_inner", "threading.TMonitor:_bootstrap"
+        "threading.Thread:_bootstrap_inner",   "threading.Thread:_bootstrap",
+        "threading.TMonitor:_bootstrap_inner", "threading.TMonitor:_bootstrap",
+        "threading:Thread._bootstrap_inner",   "threading:Thread._bootstrap"
 #else
         "threading.Thread:__bootstrap_inner", "threading.Thread:__bootstrap",
         "threading.TMonitor:__bootstrap_inner", "threading.TMonitor:__bootstrap"
@@ -40,47 +40,67 @@ namespace compat
 
     using PyCodeObject = PyCodeObject;
 
-    using destructor = destructor;
-    using code_dealloc = std::add_pointer<void(PyCodeObject*)>::type; // void(*)(PyCodeObject*)
-
-    /**
-     * @brief For CPython we need to make sure, that the we register our own dealloc function, so we
-     * can handle the deleteion of code_objects in our code.
-     */
-    struct RegisterCodeDealloc
+#if PY_VERSION_HEX >= 0x03090000 && !defined(PYPY_VERSION)
+    /// Set the profile function of all threads of the current interpreter
+    inline void set_profile_all_threads(Py_tracefunc func, PyObject* arg)
     {
-        RegisterCodeDealloc(std::function<void(PyCodeObject* co)> on_dealloc_fun)
+#if PY_VERSION_HEX >= 0x030C0000
+        PyEval_SetProfileAllThreads(func, arg);
+#else
+        PyInterpreterState* interp = PyThreadState_GetInterpreter(PyThreadState_Get());
+        for (PyThreadState* tstate = PyInterpreterState_ThreadHead(interp); tstate;
+             tstate = PyThreadState_Next(tstate))
         {
-            external_on_dealloc_fun = on_dealloc_fun;
-            // PyPy does not need this, as CodeObjects are compiled, and therefore live for the
-            // programms lifetime
-#ifndef PYPY_VERSION
-            if (!python_code_dealloc)
-            {
-                python_code_dealloc =
-                    reinterpret_cast<compat::code_dealloc>(PyCode_Type.tp_dealloc);
-                PyCode_Type.tp_dealloc = reinterpret_cast<compat::destructor>(dealloc_fun);
-            }
-            else
-            {
-                std::cerr << "WARNING: Score-P Python's code_dealloc is alredy registerd!"
-                          << std::endl;
-            }
-#endif
+            _PyEval_SetProfile(tstate, func, arg);
         }
+#endif
+    }
 
-        static void dealloc_fun(PyCodeObject* co)
+    /// Set the trace function of all threads of the current interpreter
+    inline void set_trace_all_threads(Py_tracefunc func, PyObject* arg)
+    {
+#if PY_VERSION_HEX >= 0x030C0000
+        PyEval_SetTraceAllThreads(func, arg);
+#else
+        PyInterpreterState* interp = PyThreadState_GetInterpreter(PyThreadState_Get());
+        for (PyThreadState* tstate = PyInterpreterState_ThreadHead(interp); tstate;
+             tstate = PyThreadState_Next(tstate))
         {
-            if (external_on_dealloc_fun && python_code_dealloc)
-            {
-                external_on_dealloc_fun(co);
-                python_code_dealloc(co);
-            }
+            _PyEval_SetTrace(tstate, func, arg);
         }
+#endif
+    }
+#endif
 
-        inline static compat::code_dealloc python_code_dealloc;
-        inline static std::function<void(PyCodeObject* co)> external_on_dealloc_fun;
-    };
+#ifndef PYPY_VERSION
+    /// Wrappers around the code object extra API (PEP 523), which was made unstable API in 3.12
+    inline Py_ssize_t request_code_extra_index(freefunc free)
+    {
+#if PY_VERSION_HEX >= 0x030C0000
+        return PyUnstable_Eval_RequestCodeExtraIndex(free);
+#else
+        return _PyEval_RequestCodeExtraIndex(free);
+#endif
+    }
+
+    inline int get_code_extra(PyCodeObject* code, Py_ssize_t index, void** extra)
+    {
+#if PY_VERSION_HEX >= 0x030C0000
+        return PyUnstable_Code_GetExtra(reinterpret_cast<PyObject*>(code), index, extra);
+#else
+        return _PyCode_GetExtra(reinterpret_cast<PyObject*>(code), index, extra);
+#endif
+    }
+
+    inline int set_code_extra(PyCodeObject* code, Py_ssize_t index, void* extra)
+    {
+#if PY_VERSION_HEX >= 0x030C0000
+        return PyUnstable_Code_SetExtra(reinterpret_cast<PyObject*>(code), index, extra);
+#else
+        return _PyCode_SetExtra(reinterpret_cast<PyObject*>(code), index, extra);
+#endif
+    }
+#endif
 
 } // namespace compat
 } // namespace scorepy
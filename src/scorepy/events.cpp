@@ -1,100 +1,362 @@
 #include <algorithm>
 #include <array>
+#include <memory>
+#include <mutex>
 
 #include <Python.h>
 
 #include "compat.hpp"
 #include "events.hpp"
-#include "pythonHelpers.hpp"
+#include "pathUtils.hpp"
 
 namespace scorepy
 {
 
-std::unordered_map<compat::PyCodeObject*, region_handle> regions;
-static std::unordered_map<std::string, region_handle> user_regions;
-static std::unordered_map<std::string, region_handle> rewind_regions;
-
 /**
- * @brief when Python PyCodeObject is deallocated, remove it from our regions list.
+ * @brief Handles identified by a name, e.g. the regions of the user instrumentation.
  *
- * @param co code object to remove
+ * The handles are shared by all threads, and are created under a lock. Each thread caches the
+ * handles it used, so a thread only takes the lock the first time it uses a name. This keeps
+ * the registry scalable when the GIL is disabled.
  */
-void on_dealloc(PyCodeObject* co)
+template <typename Handle, typename Name = std::string>
+class NamedHandles
 {
-    regions.erase(co);
+public:
+    /// Return the handle for the name, or nullptr if it was never created
+    const Handle* find(const Name& name)
+    {
+        auto& cache = thread_cache();
+        if (auto it = cache.find(name); it != cache.end())
+        {
+            return &it->second;
+        }
+        std::lock_guard<std::mutex> lock(mutex);
+        auto it = handles.find(name);
+        if (it == handles.end())
+        {
+            return nullptr;
+        }
+        return &cache.emplace(name, it->second).first->second;
+    }
+
+    /// Return the handle for the name. A new handle is created with `init(Handle&)`
+    template <typename Init>
+    Handle get(const Name& name, Init&& init)
+    {
+        if (const Handle* handle = find(name))
+        {
+            return *handle;
+        }
+        Handle handle;
+        {
+            std::lock_guard<std::mutex> lock(mutex);
+            auto [it, inserted] = handles.try_emplace(name);
+            if (inserted)
+            {
+                init(it->second);
+            }
+            handle = it->second;
+        }
+        thread_cache().emplace(name, handle);
+        return handle;
+    }
+
+private:
+    std::unordered_map<Name, Handle>& thread_cache()
+    {
+        thread_local std::unordered_map<const NamedHandles*, std::unordered_map<Name, Handle>>
+            caches;
+        return caches[this];
+    }
+
+    std::mutex mutex;
+    std::unordered_map<Name, Handle> handles;
+};
+
+/// Regions of region_begin and region_end without an identifier, by region name
+static NamedHandles<region_handle> user_regions;
+/// Regions of the UserRegion objects, identified by their file name and region name, so regions
+/// of the same name in different files are distinct
+static NamedHandles<region_handle> located_user_regions;
+static NamedHandles<region_handle> rewind_regions;
+/// Regions of C functions, identified by their method definition. Only statically allocated
+/// method definitions are used, as they live as long as their extension module, i.e. until the
+/// end of the run
+static NamedHandles<region_handle, const PyMethodDef*> c_function_regions;
+/// Regions of C functions with method definitions allocated at runtime, e.g. by pybind11 or cffi,
+/// identified by their region name. Such a definition is freed with its function, so its address
+/// does not identify the function
+static NamedHandles<region_handle> named_c_function_regions;
+static NamedHandles<SCOREP_SamplingSetHandle> user_metrics;
+
+/// Protects the region filters and the creation of code regions
+static std::mutex regions_mutex;
+
+#ifdef PYPY_VERSION
+std::unordered_map<compat::PyCodeObject*, code_region> regions;
+
+interpreter_state* acquire_interpreter_state()
+{
+    interpreter_state& state = current_interpreter_state();
+    std::lock_guard<std::mutex> lock(regions_mutex);
+    ++state.modules;
+    return &state;
 }
 
-static compat::RegisterCodeDealloc register_dealloc(on_dealloc);
+/// Store the region of a code object. If another thread was faster, its region is returned.
+static code_region* add_region(compat::PyCodeObject* identifier, region_handle handle,
+                               bool recorded)
+{
+    std::lock_guard<std::mutex> lock(regions_mutex);
+    return &regions.try_emplace(identifier, handle, recorded).first->second;
+}
+#else
+/// States of the interpreters by their ID. A state is kept after the last module of its
+/// interpreter is freed, as the code objects holding regions may outlive the module
+static std::unordered_map<std::int64_t, std::unique_ptr<interpreter_state>> interpreter_states;
+static std::mutex interpreter_states_mutex;
 
-// Used for regions, that have an identifier, aka a code object id. (instrumenter regions and
-// some decorated regions)
-void region_begin(std::string_view function_name, std::string module, std::string file_name,
-                  const std::uint64_t line_number, compat::PyCodeObject* identifier)
+interpreter_state& find_interpreter_state(std::int64_t id)
 {
-    region_handle& region = regions[identifier];
+    std::lock_guard<std::mutex> lock(interpreter_states_mutex);
+    auto& state = interpreter_states[id];
+    if (!state)
+    {
+        state = std::make_unique<interpreter_state>();
+    }
+    return *state;
+}
 
-    if (region == uninitialised_region_handle)
+/// Called by Python when a code object holding a region is deallocated
+static void free_region(void* region)
+{
+    delete static_cast<code_region*>(region);
+}
+
+interpreter_state* acquire_interpreter_state()
+{
+    interpreter_state& state = current_interpreter_state();
+    std::lock_guard<std::mutex> lock(regions_mutex);
+    // The index is requested once per interpreter, a module imported again reuses it
+    if (state.region_extra_index < 0)
     {
-        auto region_name = make_region_name(std::move(module), function_name);
-        SCOREP_User_RegionInit(&region.value, NULL, NULL, region_name.c_str(),
-                               SCOREP_USER_REGION_TYPE_FUNCTION, file_name.c_str(), line_number);
+        state.region_extra_index = compat::request_code_extra_index(free_region);
+        if (state.region_extra_index < 0)
+        {
+            PyErr_SetString(PyExc_RuntimeError, "No code object extra index available");
+            return nullptr;
+        }
+    }
+    ++state.modules;
+    return &state;
+}
 
-        if (const auto pos = region_name.find(':'); pos != std::string::npos)
+/// Store the region of a code object. If another thread was faster, its region is returned.
+/// The region is only published when it is complete, so find_region needs no lock.
+/// Return nullptr and set a Python exception on error
+static code_region* add_region(compat::PyCodeObject* identifier, region_handle handle,
+                               bool recorded)
+{
+    const Py_ssize_t index = current_interpreter_state().region_extra_index;
+    std::lock_guard<std::mutex> lock(regions_mutex);
+    if (code_region* region = find_region(identifier))
+    {
+        return region;
+    }
+    auto* region = new code_region(handle, recorded);
+    if (compat::set_code_extra(identifier, index, region) < 0)
+    {
+        delete region;
+        return nullptr;
+    }
+    return region;
+}
+#endif
+
+void release_interpreter_state(interpreter_state* state)
+{
+    PyObject* old_region_filter = nullptr;
+    {
+        std::lock_guard<std::mutex> lock(regions_mutex);
+        if (--state->modules == 0)
         {
-            region_name.resize(pos);
-            SCOREP_User_RegionSetGroup(region.value, region_name.c_str());
+            std::swap(old_region_filter, state->region_filter);
         }
     }
-    SCOREP_User_RegionEnter(region.value);
+    Py_XDECREF(old_region_filter);
 }
 
-// Used for regions, that only have a function name, a module, a file and a line number (user
-// regions)
-void region_begin(std::string_view function_name, std::string module, std::string file_name,
-                  const std::uint64_t line_number)
+void set_region_filter(PyObject* new_region_filter)
 {
-    auto region_name = make_region_name(std::move(module), function_name);
-    region_handle& region = user_regions[region_name];
+    if (new_region_filter == Py_None)
+    {
+        new_region_filter = nullptr;
+    }
+    interpreter_state& state = current_interpreter_state();
+    Py_XINCREF(new_region_filter);
+    PyObject* old_region_filter;
+    {
+        std::lock_guard<std::mutex> lock(regions_mutex);
+        old_region_filter = state.region_filter;
+        state.region_filter = new_region_filter;
+    }
+    Py_XDECREF(old_region_filter);
+}
 
-    if (region == uninitialised_region_handle)
+/**
+ * @brief Decide whether a region is recorded. The bindings themselves are never recorded.
+ * Errors in the region filter are reported, and the region is recorded.
+ */
+static bool is_recorded(std::string_view function_name, const std::string& region_name,
+                        const std::string& file_name)
+{
+    if (function_name == "_unsetprofile" || region_name.compare(0, 6, "scorep") == 0)
     {
-        SCOREP_User_RegionInit(&region.value, NULL, NULL, region_name.c_str(),
-                               SCOREP_USER_REGION_TYPE_FUNCTION, file_name.c_str(), line_number);
+        return false;
+    }
+    interpreter_state& state = current_interpreter_state();
+    PyObject* filter;
+    {
+        std::lock_guard<std::mutex> lock(regions_mutex);
+        filter = state.region_filter;
+        Py_XINCREF(filter);
+    }
+    if (!filter)
+    {
+        return true;
+    }
+    PyObject* result = PyObject_CallFunction(filter, "ss", region_name.c_str(), file_name.c_str());
+    const int recorded = result ? PyObject_IsTrue(result) : -1;
+    Py_XDECREF(result);
+    if (recorded < 0)
+    {
+        PyErr_WriteUnraisable(filter);
+    }
+    Py_DECREF(filter);
+    return recorded != 0;
+}
 
-        if (const auto pos = region_name.find(':'); pos != std::string::npos)
+/// Decide whether the region of a code object is recorded, see is_recorded. The filter is given
+/// the absolute file name of the code object, so the verdict is the same whichever of
+/// region_begin and region_end sees the code object first
+static bool is_code_recorded(std::string_view function_name, const std::string& region_name,
+                             compat::PyCodeObject* code)
+{
+    const auto file_name = abspath(compat::get_string_as_utf_8(code->co_filename));
+    return is_recorded(function_name, region_name, file_name);
+}
+
+/// Initialise a region handle and set the module as its group
+static void init_region(region_handle& handle, std::string region_name,
+                        const std::string& file_name, std::uint64_t line_number)
+{
+    SCOREP_User_RegionInit(&handle.value, NULL, NULL, region_name.c_str(),
+                           SCOREP_USER_REGION_TYPE_FUNCTION, file_name.c_str(), line_number);
+
+    if (const auto pos = region_name.find(':'); pos != std::string::npos)
+    {
+        region_name.resize(pos);
+        SCOREP_User_RegionSetGroup(handle.value, region_name.c_str());
+    }
+}
+
+// Used for regions, that have an identifier, aka a code object id. (instrumenter regions and
+// some decorated regions)
+bool region_begin(std::string_view function_name, std::string module, std::string file_name,
+                  const std::uint64_t line_number, compat::PyCodeObject* identifier)
+{
+    const code_region* region = find_region(identifier);
+    if (!region)
+    {
+        // The filter may run Python code, so it must not be called with the lock held
+        region_handle handle;
+        auto region_name = make_region_name(std::move(module), function_name);
+        const bool recorded = is_code_recorded(function_name, region_name, identifier);
+        if (recorded)
         {
-            region_name.resize(pos);
-            SCOREP_User_RegionSetGroup(region.value, region_name.c_str());
+            init_region(handle, std::move(region_name), file_name, line_number);
         }
+        region = add_region(identifier, handle, recorded);
+        if (!region)
+        {
+            PyErr_WriteUnraisable(reinterpret_cast<PyObject*>(identifier));
+            return false;
+        }
+    }
+    if (region->recorded)
+    {
+        SCOREP_User_RegionEnter(region->handle.value);
     }
+    return region->recorded;
+}
+
+static region_handle located_user_region(const std::string& region_name,
+                                         const std::string& file_name,
+                                         const std::uint64_t line_number)
+{
+    // Neither name contains null characters, so the key is unique
+    return located_user_regions.get(file_name + '\0' + region_name, [&](region_handle& handle) {
+        init_region(handle, region_name, file_name, line_number);
+    });
+}
+
+// Used for regions, that only have a function name, a module, a file and a line number (user
+// regions)
+void region_begin(std::string_view function_name, std::string module, std::string file_name,
+                  const std::uint64_t line_number)
+{
+    const auto region_name = make_region_name(std::move(module), function_name);
+    // The region of the first file is shared with the UserRegion objects of that file
+    const region_handle region = user_regions.get(region_name, [&](region_handle& handle) {
+        handle = located_user_region(region_name, file_name, line_number);
+    });
     SCOREP_User_RegionEnter(region.value);
 }
 
+region_handle user_region(std::string_view function_name, std::string module,
+                          const std::string& file_name, const std::uint64_t line_number)
+{
+    return located_user_region(make_region_name(std::move(module), function_name), file_name,
+                               line_number);
+}
+
 // Used for regions, that have an identifier, aka a code object id. (instrumenter regions and
 // some decorated regions)
-void region_end(std::string_view function_name, std::string module,
+bool region_end(std::string_view function_name, std::string module,
                 compat::PyCodeObject* identifier)
 {
-    const auto it_region = regions.find(identifier);
-    if (it_region != regions.end())
+    const code_region* region = find_region(identifier);
+    if (region)
     {
-        SCOREP_User_RegionEnd(it_region->second.value);
+        if (region->recorded)
+        {
+            SCOREP_User_RegionEnd(region->handle.value);
+        }
+        return region->recorded;
     }
-    else
+
+    // The code object was never entered. Remember excluded ones to skip them from now on
+    const auto region_name = make_region_name(std::move(module), function_name);
+    if (!is_code_recorded(function_name, region_name, identifier))
     {
-        const auto region_name = make_region_name(std::move(module), function_name);
-        region_end_error_handling(std::move(region_name));
+        if (!add_region(identifier, uninitialised_region_handle, false))
+        {
+            PyErr_WriteUnraisable(reinterpret_cast<PyObject*>(identifier));
+        }
+        return false;
     }
+    region_end_error_handling(std::move(region_name));
+    return true;
 }
 
 // Used for regions, that only have a function name, a module (user regions)
 void region_end(std::string_view function_name, std::string module)
 {
     const auto region_name = make_region_name(std::move(module), function_name);
-    auto it_region = user_regions.find(region_name);
-    if (it_region != user_regions.end())
+    if (const region_handle* region = user_regions.find(region_name))
     {
-        SCOREP_User_RegionEnd(it_region->second.value);
+        SCOREP_User_RegionEnd(region->value);
     }
     else
     {
@@ -105,8 +367,8 @@ void region_end(std::string_view function_name, std::string module)
 void region_end_error_handling(std::string region_name)
 {
     static region_handle error_region;
-    static SCOREP_User_ParameterHandle scorep_param = SCOREP_USER_INVALID_PARAMETER;
-    static bool error_printed = false;
+    static std::once_flag error_region_initialised;
+    static std::once_flag error_printed;
 
     if (std::find(compat::exit_region_whitelist.begin(), compat::exit_region_whitelist.end(),
                   region_name) != compat::exit_region_whitelist.end())
@@ -114,64 +376,114 @@ void region_end_error_handling(std::string region_name)
         return;
     }
 
-    if (error_region.value == SCOREP_USER_INVALID_REGION)
-    {
+    std::call_once(error_region_initialised, [] {
         SCOREP_User_RegionInit(&error_region.value, NULL, NULL, "error_region",
                                SCOREP_USER_REGION_TYPE_FUNCTION, "scorep.cpp", 0);
         SCOREP_User_RegionSetGroup(error_region.value, "error");
-    }
+    });
     SCOREP_User_RegionEnter(error_region.value);
-    SCOREP_User_ParameterString(&scorep_param, "leave-region", region_name.c_str());
+    parameter_string("leave-region", std::move(region_name));
     SCOREP_User_RegionEnd(error_region.value);
 
-    if (!error_printed)
-    {
+    std::call_once(error_printed, [] {
         std::cerr << "SCOREP_BINDING_PYTHON ERROR: There was a region exit without an enter!\n"
                   << "SCOREP_BINDING_PYTHON ERROR: For details look for \"error_region\" in "
                      "the trace or profile."
                   << std::endl;
-        error_printed = true;
-    }
+    });
+}
+
+const region_handle* find_c_function_region(const PyMethodDef* method)
+{
+    return c_function_regions.find(method);
+}
+
+const region_handle* find_c_function_region(const std::string& region_name)
+{
+    return named_c_function_regions.find(region_name);
+}
+
+region_handle add_c_function_region(const PyMethodDef* method, std::string_view function_name,
+                                    std::string module, bool allowed)
+{
+    // The filter may run Python code, so it must not be called with the lock held
+    auto region_name = make_region_name(std::move(module), function_name);
+    const bool recorded = allowed && is_recorded(function_name, region_name, "");
+    auto init = [&](region_handle& handle) {
+        if (recorded)
+        {
+            init_region(handle, region_name, "", 0);
+        }
+    };
+    return method ? c_function_regions.get(method, init) :
+                    named_c_function_regions.get(region_name, init);
 }
 
 void rewind_begin(std::string region_name, std::string file_name, std::uint64_t line_number)
 {
-    auto pair = rewind_regions.emplace(make_pair(region_name, region_handle()));
-    bool inserted_new = pair.second;
-    auto& handle = pair.first->second;
-    if (inserted_new)
-    {
+    SCOREP_User_RewindRegionEnter(rewind_region(region_name, file_name, line_number).value);
+}
+
+region_handle rewind_region(const std::string& region_name, const std::string& file_name,
+                            std::uint64_t line_number)
+{
+    return rewind_regions.get(region_name, [&](region_handle& handle) {
         SCOREP_User_RegionInit(&handle.value, NULL, NULL, region_name.c_str(),
                                SCOREP_USER_REGION_TYPE_FUNCTION, file_name.c_str(), line_number);
-    }
-    SCOREP_User_RewindRegionEnter(handle.value);
+    });
 }
 
-void rewind_end(std::string region_name, bool value)
+bool rewind_end(const std::string& region_name, bool value)
 {
-    auto& handle = rewind_regions.at(region_name);
+    const region_handle* handle = rewind_regions.find(region_name);
+    if (!handle)
+    {
+        return false;
+    }
     /* don't call SCOREP_ExitRewindRegion, as
      * SCOREP_User_RewindRegionEnd does some additional magic
      * */
-    SCOREP_User_RewindRegionEnd(handle.value, value);
+    SCOREP_User_RewindRegionEnd(handle->value, value);
+    return true;
+}
+
+SCOREP_SamplingSetHandle user_metric(const std::string& name, const std::string& unit,
+                                     SCOREP_User_MetricType type)
+{
+    return user_metrics.get(name, [&](SCOREP_SamplingSetHandle& handle) {
+        handle = SCOREP_USER_INVALID_METRIC;
+        SCOREP_User_InitMetric(&handle, name.c_str(), unit.c_str(), type,
+                               SCOREP_USER_METRIC_CONTEXT_GLOBAL);
+    });
+}
+
+/**
+ * @brief Return the handle of the parameter with the given name.
+ *
+ * Score-P binds a parameter handle to the name used to initialise it, so each name needs its own
+ * handle. The handles are initialised lazily by Score-P, and kept per thread to avoid racing on
+ * that initialisation.
+ */
+template <typename Tag>
+static SCOREP_User_ParameterHandle& parameter_handle(const std::string& name)
+{
+    thread_local std::unordered_map<std::string, SCOREP_User_ParameterHandle> handles;
+    return handles.try_emplace(name, SCOREP_USER_INVALID_PARAMETER).first->second;
 }
 
 void parameter_int(std::string name, int64_t value)
 {
-    static SCOREP_User_ParameterHandle scorep_param = SCOREP_USER_INVALID_PARAMETER;
-    SCOREP_User_ParameterInt64(&scorep_param, name.c_str(), value);
+    SCOREP_User_ParameterInt64(&parameter_handle<int64_t>(name), name.c_str(), value);
 }
 
 void parameter_uint(std::string name, uint64_t value)
 {
-    static SCOREP_User_ParameterHandle scorep_param = SCOREP_USER_INVALID_PARAMETER;
-    SCOREP_User_ParameterUint64(&scorep_param, name.c_str(), value);
+    SCOREP_User_ParameterUint64(&parameter_handle<uint64_t>(name), name.c_str(), value);
 }
 
 void parameter_string(std::string name, std::string value)
 {
-    static SCOREP_User_ParameterHandle scorep_param = SCOREP_USER_INVALID_PARAMETER;
-    SCOREP_User_ParameterString(&scorep_param, name.c_str(), value.c_str());
+    SCOREP_User_ParameterString(&parameter_handle<std::string>(name), name.c_str(), value.c_str());
 }
 
 } // namespace scorepy
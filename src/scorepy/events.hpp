@@ -1,4 +1,5 @@
 #pragma once
+#include <atomic>
 #include <cstdint>
 #include <string>
 #include <unordered_map>
@@ -15,11 +16,11 @@ struct region_handle
 {
     constexpr region_handle() = default;
     ~region_handle() = default;
-    constexpr bool operator==(const region_handle& other)
+    constexpr bool operator==(const region_handle& other) const
     {
         return this->value == other.value;
     }
-    constexpr bool operator!=(const region_handle& other)
+    constexpr bool operator!=(const region_handle& other) const
     {
         return this->value != other.value;
     }
@@ -29,6 +30,26 @@ struct region_handle
 
 constexpr region_handle uninitialised_region_handle = region_handle();
 
+/// Region of a code object together with the cached verdict of the region filter
+struct code_region
+{
+    code_region(region_handle handle, bool recorded) : handle(handle), recorded(recorded)
+    {
+    }
+
+    region_handle handle;
+    /// False if the code object is excluded from the instrumentation.
+    /// The burst filter of the C instrumenter may exclude a recorded region later on
+    std::atomic<bool> recorded;
+
+    /// Statistics of the burst filter, only collected until it decided about the region
+    std::atomic<bool> burst_decided = false;
+    std::atomic<std::uint64_t> burst_calls = 0;
+    std::atomic<std::uint64_t> burst_nanoseconds = 0;
+    /// Calls that are counted by the burst filter and did not end yet
+    std::atomic<std::uint64_t> burst_active_calls = 0;
+};
+
 /// Combine the arguments into a region name
 inline std::string make_region_name(std::string module_name, std::string_view name)
 {
@@ -37,17 +58,87 @@ inline std::string make_region_name(std::string module_name, std::string_view na
     return std::move(module_name);
 }
 
-extern std::unordered_map<compat::PyCodeObject*, region_handle> regions;
+/// State of the bindings that belongs to one interpreter. The region handles of Score-P belong to
+/// the process and are shared by all interpreters, but Python objects and the code object extras
+/// are per interpreter, see PEP 684
+struct interpreter_state
+{
+    /// Index of the code object extra holding the code_region, see PEP 523
+    Py_ssize_t region_extra_index = -1;
+    /// Callable deciding whether a code object is recorded, see set_region_filter
+    PyObject* region_filter = nullptr;
+    /// Number of modules of the bindings that acquired the state
+    unsigned modules = 0;
+};
+
+/// Acquire the state of the current interpreter for a new module of the bindings and prepare the
+/// storage of the code regions. Return nullptr and set a Python exception on error
+interpreter_state* acquire_interpreter_state();
+/// Release the state acquired by a module. The last module of an interpreter drops its filter
+void release_interpreter_state(interpreter_state* state);
+
+#ifdef PYPY_VERSION
+// PyPy has no code object extras, but its code objects live for the programs lifetime
+extern std::unordered_map<compat::PyCodeObject*, code_region> regions;
+
+/// Return the state of the current interpreter. PyPy has only one
+inline interpreter_state& current_interpreter_state()
+{
+    static interpreter_state state;
+    return state;
+}
+
+/// Return the region of the code object or nullptr if the code object was not seen before
+inline code_region* find_region(compat::PyCodeObject* identifier)
+{
+    auto it = regions.find(identifier);
+    return (it != regions.end()) ? &it->second : nullptr;
+}
+#else
+/// Return the state of the interpreter with the given ID, creating it on first use
+interpreter_state& find_interpreter_state(std::int64_t id);
 
-/** tries to enter a region. Return true on success
+/// Return the state of the current interpreter. It is cached per thread, as a thread usually
+/// stays in its interpreter. IDs of interpreters are never reused, unlike their addresses
+inline interpreter_state& current_interpreter_state()
+{
+    thread_local std::int64_t cached_id = -1;
+    thread_local interpreter_state* cached_state = nullptr;
+    const std::int64_t id = PyInterpreterState_GetID(PyInterpreterState_Get());
+    if (id != cached_id)
+    {
+        cached_state = &find_interpreter_state(id);
+        cached_id = id;
+    }
+    return *cached_state;
+}
+
+/// Return the region of the code object or nullptr if the code object was not seen before
+inline code_region* find_region(compat::PyCodeObject* identifier)
+{
+    const Py_ssize_t index = current_interpreter_state().region_extra_index;
+    void* region = nullptr;
+    if (index >= 0)
+    {
+        compat::get_code_extra(identifier, index, &region);
+    }
+    return static_cast<code_region*>(region);
+}
+#endif
+
+/** tries to enter a region. Return true on success, which includes code objects that are
+ * excluded from the instrumentation
  *
  */
 inline bool try_region_begin(compat::PyCodeObject* identifier)
 {
-    auto it = regions.find(identifier);
-    if (it != regions.end())
+    const code_region* region = find_region(identifier);
+    if (region)
     {
-        SCOREP_User_RegionEnter(it->second.value);
+        if (region->recorded)
+        {
+            SCOREP_User_RegionEnter(region->handle.value);
+        }
         return true;
     }
     else
@@ -56,20 +147,39 @@ inline bool try_region_begin(compat::PyCodeObject* identifier)
     }
 }
 
-void region_begin(std::string_view function_name, std::string module, std::string file_name,
+/** Set the callable deciding whether a code object of the current interpreter is recorded.
+ * It is called once per code
+ * object as `region_filter(region_name, file_name)` and returns a truthy value to record the
+ * region. Pass nullptr or Py_None to record everything.
+ */
+void set_region_filter(PyObject* region_filter);
+
+/// Enter the region of a new code object, unless it is excluded. Return whether it is recorded.
+/// The region filter is given the absolute file name of the code object, not file_name
+bool region_begin(std::string_view function_name, std::string module, std::string file_name,
                   const std::uint64_t line_number, compat::PyCodeObject* identifier);
 void region_begin(std::string_view function_name, std::string module, std::string file_name,
                   const std::uint64_t line_number);
 
-/** tries to end a region. Return true on success
+/// Return the handle of the region of the name in the file, as used by the UserRegion objects.
+/// Regions of the same name in different files are distinct. The region is initialised on first
+/// use
+region_handle user_region(std::string_view function_name, std::string module,
+                          const std::string& file_name, const std::uint64_t line_number);
+
+/** tries to end a region. Return true on success, which includes code objects that are
+ * excluded from the instrumentation
  *
  */
 inline bool try_region_end(compat::PyCodeObject* identifier)
 {
-    auto it_region = regions.find(identifier);
-    if (it_region != regions.end())
+    const code_region* region = find_region(identifier);
+    if (region)
     {
-        SCOREP_User_RegionEnd(it_region->second.value);
+        if (region->recorded)
+        {
+            SCOREP_User_RegionEnd(region->handle.value);
+        }
         return true;
     }
     else
@@ -78,14 +188,37 @@ inline bool try_region_end(compat::PyCodeObject* identifier)
     }
 }
 
-void region_end(std::string_view function_name, std::string module,
+/// End the region of a code object. Return false if the code object is excluded
+bool region_end(std::string_view function_name, std::string module,
                 compat::PyCodeObject* identifier);
 void region_end(std::string_view function_name, std::string module);
 
 void region_end_error_handling(std::string region_name);
 
+/// Return the region of a C function identified by its statically allocated method definition,
+/// or nullptr if the function was not seen before. The handle of an excluded C function is
+/// uninitialised
+const region_handle* find_c_function_region(const PyMethodDef* method);
+/// Return the region of a C function identified by its region name, like find_c_function_region.
+/// Used for method definitions allocated at runtime, which might be freed and their address reused
+const region_handle* find_c_function_region(const std::string& region_name);
+/// Return the region of a C function. It is identified by its method definition or, if method is
+/// nullptr, by its region name. It is created on first use, unless it is not allowed or excluded
+/// by the region filter. Then an uninitialised handle is returned
+region_handle add_c_function_region(const PyMethodDef* method, std::string_view function_name,
+                                    std::string module, bool allowed);
+
 void rewind_begin(std::string region_name, std::string file_name, std::uint64_t line_number);
-void rewind_end(std::string region_name, bool value);
+/// Return the handle of the rewind region. The region is initialised on first use
+region_handle rewind_region(const std::string& region_name, const std::string& file_name,
+                            std::uint64_t line_number);
+/// End a rewind region. Return false if the region was never begun
+bool rewind_end(const std::string& region_name, bool value);
+
+/// Return the handle of the user metric with the given name. The metric is defined on first use,
+/// later calls with the same name return it regardless of the unit and type
+SCOREP_SamplingSetHandle user_metric(const std::string& name, const std::string& unit,
+                                     SCOREP_User_MetricType type);
 
 void parameter_int(std::string name, int64_t value);
 void parameter_uint(std::string name, uint64_t value);
@@ -4,7 +4,6 @@
 #include "pythoncapi_compat.h"
 
 #include <cstdio>
-#include <sstream>
 #include <stdlib.h>
 #include <string>
 
@@ -36,16 +35,21 @@ static PyObject* get_self_from_frame(PyFrameObject* frame)
     return self;
 }
 
+RegionNames region_names = RegionNames::Self;
+
 std::string get_module_name(PyFrameObject& frame)
 {
     const char* self_name = nullptr;
 
-    PyObject* self = get_self_from_frame(&frame);
-    if (self)
+    if (region_names == RegionNames::Self)
     {
-        PyTypeObject* type = Py_TYPE(self);
-        self_name = _PyType_Name(type);
-        Py_DECREF(self);
+        PyObject* self = get_self_from_frame(&frame);
+        if (self)
+        {
+            PyTypeObject* type = Py_TYPE(self);
+            self_name = _PyType_Name(type);
+            Py_DECREF(self);
+        }
     }
 
     // --- get module name from globals ---------------------------------------
@@ -58,12 +62,13 @@ std::string get_module_name(PyFrameObject& frame)
 
     if (module_name)
     {
-        std::stringstream result;
-        // compat::get_string_as_utf_8() is assumed to convert PyObject* → UTF-8 std::string
-        result << compat::get_string_as_utf_8(module_name);
+        std::string result(compat::get_string_as_utf_8(module_name));
         if (self_name)
-            result << '.' << self_name;
-        return result.str();
+        {
+            result += '.';
+            result += self_name;
+        }
+        return result;
     }
 
     // --- special-case NumPy internal frames ---------------------------------
@@ -77,6 +82,103 @@ std::string get_module_name(PyFrameObject& frame)
     return "unknown";
 }
 
+std::string_view get_function_name(PyCodeObject& code)
+{
+#if PY_VERSION_HEX >= 0x030B0000 && !defined(PYPY_VERSION) // Python 3.11+
+    if (region_names == RegionNames::Qualname)
+    {
+        return compat::get_string_as_utf_8(code.co_qualname);
+    }
+#endif
+    return compat::get_string_as_utf_8(code.co_name);
+}
+
+const PyMethodDef* get_method_def(PyObject* callable)
+{
+    if (PyCFunction_Check(callable))
+    {
+        return reinterpret_cast<PyCFunctionObject*>(callable)->m_ml;
+    }
+    if (Py_TYPE(callable) == &PyMethodDescr_Type)
+    {
+        return reinterpret_cast<PyMethodDescrObject*>(callable)->d_method;
+    }
+    return nullptr;
+}
+
+/// Return the attribute `__module__` of the object, or "unknown" if it has no such string
+static std::string get_module_attribute(PyObject* o)
+{
+    PyRefObject module(PyObject_GetAttrString(o, "__module__"), adopt_object);
+    if (!module || !PyUnicode_Check(module))
+    {
+        PyErr_Clear();
+        return "unknown";
+    }
+    return std::string(compat::get_string_as_utf_8(module));
+}
+
+/// Return the type in the MRO of the type that defines the method, i.e. the last one having the
+/// method as attribute
+static PyTypeObject* get_defining_type(PyTypeObject* type, const PyMethodDef& method)
+{
+    PyObject* mro = type->tp_mro;
+    if (!mro || !PyTuple_Check(mro))
+    {
+        return type;
+    }
+    PyTypeObject* result = type;
+    for (Py_ssize_t i = 0; i < PyTuple_GET_SIZE(mro); i++)
+    {
+        PyObject* base = PyTuple_GET_ITEM(mro, i);
+        PyRefObject attribute(PyObject_GetAttrString(base, method.ml_name), adopt_object);
+        if (!attribute)
+        {
+            PyErr_Clear();
+        }
+        else if (get_method_def(attribute) == &method)
+        {
+            result = reinterpret_cast<PyTypeObject*>(base);
+        }
+    }
+    return result;
+}
+
+std::pair<std::string, std::string> get_c_function_name(PyObject* callable,
+                                                        const PyMethodDef& method)
+{
+    PyTypeObject* type = nullptr;
+    if (PyCFunction_Check(callable))
+    {
+        PyObject* self = PyCFunction_GET_SELF(callable);
+        if (!self || PyModule_Check(self))
+        {
+            // A function of a module
+            PyObject* module = reinterpret_cast<PyCFunctionObject*>(callable)->m_module;
+            std::string module_name = (module && PyUnicode_Check(module)) ?
+                                          std::string(compat::get_string_as_utf_8(module)) :
+                                          (self ? get_module_attribute(callable) : "builtins");
+            return { std::move(module_name), method.ml_name };
+        }
+        // A class method is bound to the type, other methods to an instance
+        type = PyType_Check(self) ? reinterpret_cast<PyTypeObject*>(self) : Py_TYPE(self);
+    }
+    else
+    {
+        type = PyDescr_TYPE(callable);
+    }
+    type = get_defining_type(type, method);
+    std::string module_name = get_module_attribute(reinterpret_cast<PyObject*>(type));
+    const char* type_name = _PyType_Name(type);
+    if (region_names == RegionNames::Qualname)
+    {
+        return { std::move(module_name), std::string(type_name) + '.' + method.ml_name };
+    }
+    module_name += '.';
+    module_name += type_name;
+    return { std::move(module_name), method.ml_name };
+}
+
 std::string get_file_name(PyFrameObject& frame)
 {
     PyCodeObject* code = PyFrame_GetCode(&frame);
@@ -3,7 +3,9 @@
 #include <Python.h>
 #include <frameobject.h>
 #include <string>
+#include <string_view>
 #include <type_traits>
+#include <utility>
 
 namespace scorepy
 {
@@ -71,9 +73,30 @@ auto cast_to_PyFunc(TFunc* func) -> detail::ReplaceArgsToPyObject_t<TFunc>*
     return reinterpret_cast<detail::ReplaceArgsToPyObject_t<TFunc>*>(func);
 }
 
-/// Return the module name the frame belongs to.
-/// The pointer is valid for the lifetime of the frame
+/// Naming scheme of the regions of code objects
+enum class RegionNames
+{
+    /// `module.Class:function`, using the type of `self` in the frame for methods
+    Self,
+    /// `module:qualname`, using the qualified name of the code object (Python 3.11+).
+    /// Never touches the locals of the frame
+    Qualname
+};
+extern RegionNames region_names;
+
+/// Return the module name the frame belongs to, which includes the type of `self` for
+/// RegionNames::Self
 std::string get_module_name(PyFrameObject& frame);
+/// Return the function name of the code object according to region_names.
+/// The string is valid for the lifetime of the code object
+std::string_view get_function_name(PyCodeObject& code);
+/// Return the method definition of a builtin function or method descriptor, or nullptr if the
+/// callable is not implemented in C
+const PyMethodDef* get_method_def(PyObject* callable);
+/// Return the module name and the function name of a callable implemented in C according to
+/// region_names. Methods are named after the type defining them, not after the type of `self`
+std::pair<std::string, std::string> get_c_function_name(PyObject* callable,
+                                                        const PyMethodDef& method);
 /// Return the file name the frame belongs to
 std::string get_file_name(PyFrameObject& frame);
 
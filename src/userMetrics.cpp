@@ -0,0 +1,148 @@
+#include "userMetrics.hpp"
+#include "scorepy/events.hpp"
+#include "scorepy/pythonHelpers.hpp"
+#include <Python.h>
+#include <cstring>
+#include <type_traits>
+
+namespace scorepy
+{
+/// Object holding the handle of a user metric. The handle is resolved once when the object is
+/// created, so recording a value only costs the conversion and the call to Score-P
+struct MetricObject
+{
+    PyObject_HEAD;
+    SCOREP_SamplingSetHandle handle;
+    SCOREP_User_MetricType type;
+
+    /// This cast is valid as long as `PyObject_HEAD` is the first entry in this struct
+    PyObject* to_PyObject()
+    {
+        return reinterpret_cast<PyObject*>(this);
+    }
+
+    /// Return false and set a Python exception if __init__ was not called
+    bool check_initialised()
+    {
+        if (handle == SCOREP_USER_INVALID_METRIC)
+        {
+            PyErr_SetString(PyExc_RuntimeError, "The metric is not initialised");
+            return false;
+        }
+        return true;
+    }
+};
+} // namespace scorepy
+
+static_assert(std::is_trivial<scorepy::MetricObject>::value,
+              "Must be trivial or object creation by Python is UB");
+static_assert(std::is_standard_layout<scorepy::MetricObject>::value,
+              "Must be standard layout or object creation by Python is UB");
+
+extern "C"
+{
+
+    static int Metric_init(scorepy::MetricObject* self, PyObject* args, PyObject* kwds)
+    {
+        static const char* kwlist[] = { "name", "unit", "value_type", nullptr };
+        const char* name;
+        const char* unit = "";
+        const char* value_type = "double";
+
+        if (!PyArg_ParseTupleAndKeywords(args, kwds, "s|ss", const_cast<char**>(kwlist), &name,
+                                         &unit, &value_type))
+        {
+            return -1;
+        }
+        if (std::strcmp(value_type, "double") == 0)
+        {
+            self->type = SCOREP_USER_METRIC_TYPE_DOUBLE;
+        }
+        else if (std::strcmp(value_type, "int64") == 0)
+        {
+            self->type = SCOREP_USER_METRIC_TYPE_INT64;
+        }
+        else if (std::strcmp(value_type, "uint64") == 0)
+        {
+            self->type = SCOREP_USER_METRIC_TYPE_UINT64;
+        }
+        else
+        {
+            PyErr_Format(PyExc_ValueError, "Expected 'double', 'int64' or 'uint64', got '%s'",
+                         value_type);
+            return -1;
+        }
+        self->handle = scorepy::user_metric(name, unit, self->type);
+        return 0;
+    }
+
+    static PyObject* Metric_trigger(scorepy::MetricObject* self, PyObject* value)
+    {
+        if (!self->check_initialised())
+        {
+            return nullptr;
+        }
+        switch (self->type)
+        {
+        case SCOREP_USER_METRIC_TYPE_INT64:
+        {
+            const long long converted = PyLong_AsLongLong(value);
+            if (converted == -1 && PyErr_Occurred())
+            {
+                return nullptr;
+            }
+            SCOREP_User_TriggerMetricInt64(self->handle, converted);
+            break;
+        }
+        case SCOREP_USER_METRIC_TYPE_UINT64:
+        {
+            const unsigned long long converted = PyLong_AsUnsignedLongLong(value);
+            if (converted == static_cast<unsigned long long>(-1) && PyErr_Occurred())
+            {
+                return nullptr;
+            }
+            SCOREP_User_TriggerMetricUint64(self->handle, converted);
+            break;
+        }
+        default:
+        {
+            const double converted = PyFloat_AsDouble(value);
+            if (converted == -1.0 && PyErr_Occurred())
+            {
+                return nullptr;
+            }
+            SCOREP_User_TriggerMetricDouble(self->handle, converted);
+            break;
+        }
+        }
+        Py_RETURN_NONE;
+    }
+}
+
+namespace scorepy
+{
+
+PyType_Spec& getMetricTypeSpec()
+{
+    static PyMethodDef methods[] = {
+        { "trigger", scorepy::cast_to_PyFunc(Metric_trigger), METH_O,
+          "Record a value of the metric" },
+        { nullptr } /* Sentinel */
+    };
+    static PyType_Slot slots[] = {
+        { Py_tp_new, reinterpret_cast<void*>(PyType_GenericNew) },
+        { Py_tp_init, reinterpret_cast<void*>(scorepy::cast_to_PyFunc(Metric_init)) },
+        { Py_tp_methods, methods },
+        { Py_tp_doc,
+          const_cast<char*>(
+              "Metric(name, unit='', value_type='double')\n"
+              "Handle of the user metric `<name>` with values of the type 'double', 'int64' "
+              "or 'uint64'") },
+        { 0, nullptr } /* Sentinel */
+    };
+    static PyType_Spec spec = { "scorep._bindings.Metric", sizeof(MetricObject), 0,
+                                Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, slots };
+    return spec;
+}
+
+} // namespace scorepy
@@ -0,0 +1,9 @@
+#pragma once
+
+#include <Python.h>
+
+namespace scorepy
+{
+/// Return the spec of the heap type of the user metric class to define for the python module
+PyType_Spec& getMetricTypeSpec();
+} // namespace scorepy
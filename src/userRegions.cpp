@@ -0,0 +1,206 @@
+#include "userRegions.hpp"
+#include "scorepy/events.hpp"
+#include "scorepy/pathUtils.hpp"
+#include "scorepy/pythonHelpers.hpp"
+#include <Python.h>
+#include <type_traits>
+
+namespace scorepy
+{
+/// Object holding the handle of a user or rewind region. The handle is resolved once when the
+/// object is created, so entering and leaving the region only costs the calls to Score-P
+struct RegionObject
+{
+    PyObject_HEAD;
+    SCOREP_User_RegionHandle handle;
+
+    /// These casts are valid as long as `PyObject_HEAD` is the first entry in this struct
+    PyObject* to_PyObject()
+    {
+        return reinterpret_cast<PyObject*>(this);
+    }
+
+    /// Return false and set a Python exception if __init__ was not called
+    bool check_initialised()
+    {
+        if (handle == SCOREP_USER_INVALID_REGION)
+        {
+            PyErr_SetString(PyExc_RuntimeError, "The region is not initialised");
+            return false;
+        }
+        return true;
+    }
+};
+} // namespace scorepy
+
+static_assert(std::is_trivial<scorepy::RegionObject>::value,
+              "Must be trivial or object creation by Python is UB");
+static_assert(std::is_standard_layout<scorepy::RegionObject>::value,
+              "Must be standard layout or object creation by Python is UB");
+
+extern "C"
+{
+
+    /// Parse the arguments `name, file_name=None, line_number=0` of the region types
+    static bool parse_region_args(PyObject* args, PyObject* kwds, const char** name,
+                                  std::string* full_file_name, unsigned long long* line_number)
+    {
+        static const char* kwlist[] = { "name", "file_name", "line_number", nullptr };
+        const char* file_name = nullptr;
+
+        if (!PyArg_ParseTupleAndKeywords(args, kwds, "s|zK", const_cast<char**>(kwlist), name,
+                                         &file_name, line_number))
+        {
+            return false;
+        }
+        *full_file_name = file_name ? scorepy::abspath(file_name) : "None";
+        return true;
+    }
+
+    static int UserRegion_init(scorepy::RegionObject* self, PyObject* args, PyObject* kwds)
+    {
+        const char* name;
+        std::string file_name;
+        unsigned long long line_number = 0;
+
+        if (!parse_region_args(args, kwds, &name, &file_name, &line_number))
+        {
+            return -1;
+        }
+        self->handle = scorepy::user_region(name, "user", file_name, line_number).value;
+        return 0;
+    }
+
+    static PyObject* UserRegion_enter(scorepy::RegionObject* self, PyObject*)
+    {
+        if (!self->check_initialised())
+        {
+            return nullptr;
+        }
+        SCOREP_User_RegionEnter(self->handle);
+        Py_RETURN_NONE;
+    }
+
+    static PyObject* UserRegion_exit(scorepy::RegionObject* self, PyObject*)
+    {
+        if (!self->check_initialised())
+        {
+            return nullptr;
+        }
+        SCOREP_User_RegionEnd(self->handle);
+        Py_RETURN_NONE;
+    }
+
+    static PyObject* UserRegion_context_enter(scorepy::RegionObject* self, PyObject*)
+    {
+        if (!self->check_initialised())
+        {
+            return nullptr;
+        }
+        SCOREP_User_RegionEnter(self->handle);
+        Py_INCREF(self);
+        return self->to_PyObject();
+    }
+
+    static PyObject* UserRegion_context_exit(scorepy::RegionObject* self, PyObject*)
+    {
+        if (!self->check_initialised())
+        {
+            return nullptr;
+        }
+        SCOREP_User_RegionEnd(self->handle);
+        Py_RETURN_FALSE;
+    }
+
+    static int RewindRegion_init(scorepy::RegionObject* self, PyObject* args, PyObject* kwds)
+    {
+        const char* name;
+        std::string file_name;
+        unsigned long long line_number = 0;
+
+        if (!parse_region_args(args, kwds, &name, &file_name, &line_number))
+        {
+            return -1;
+        }
+        self->handle = scorepy::rewind_region(name, file_name, line_number).value;
+        return 0;
+    }
+
+    static PyObject* RewindRegion_enter(scorepy::RegionObject* self, PyObject*)
+    {
+        if (!self->check_initialised())
+        {
+            return nullptr;
+        }
+        SCOREP_User_RewindRegionEnter(self->handle);
+        Py_RETURN_NONE;
+    }
+
+    static PyObject* RewindRegion_exit(scorepy::RegionObject* self, PyObject* value)
+    {
+        if (!self->check_initialised())
+        {
+            return nullptr;
+        }
+        const int rewind = PyObject_IsTrue(value);
+        if (rewind < 0)
+        {
+            return nullptr;
+        }
+        SCOREP_User_RewindRegionEnd(self->handle, rewind == 1);
+        Py_RETURN_NONE;
+    }
+}
+
+namespace scorepy
+{
+
+PyType_Spec& getUserRegionTypeSpec()
+{
+    static PyMethodDef methods[] = {
+        { "enter", scorepy::cast_to_PyFunc(UserRegion_enter), METH_NOARGS, "Enter the region" },
+        { "exit", scorepy::cast_to_PyFunc(UserRegion_exit), METH_NOARGS, "Leave the region" },
+        { "__enter__", scorepy::cast_to_PyFunc(UserRegion_context_enter), METH_NOARGS,
+          "Enter the region" },
+        { "__exit__", scorepy::cast_to_PyFunc(UserRegion_context_exit), METH_VARARGS,
+          "Leave the region" },
+        { nullptr } /* Sentinel */
+    };
+    static PyType_Slot slots[] = {
+        { Py_tp_new, reinterpret_cast<void*>(PyType_GenericNew) },
+        { Py_tp_init, reinterpret_cast<void*>(scorepy::cast_to_PyFunc(UserRegion_init)) },
+        { Py_tp_methods, methods },
+        { Py_tp_doc,
+          const_cast<char*>("UserRegion(name, file_name=None, line_number=0)\n"
+                            "Handle of the user region `user:<name>`, usable as context manager") },
+        { 0, nullptr } /* Sentinel */
+    };
+    static PyType_Spec spec = { "scorep._bindings.UserRegion", sizeof(RegionObject), 0,
+                                Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, slots };
+    return spec;
+}
+
+PyType_Spec& getRewindRegionTypeSpec()
+{
+    static PyMethodDef methods[] = {
+        { "enter", scorepy::cast_to_PyFunc(RewindRegion_enter), METH_NOARGS,
+          "Enter the rewind region" },
+        { "exit", scorepy::cast_to_PyFunc(RewindRegion_exit), METH_O,
+          "Leave the rewind region. If the argument is true, the events of the region are "
+          "discarded" },
+        { nullptr } /* Sentinel */
+    };
+    static PyType_Slot slots[] = {
+        { Py_tp_new, reinterpret_cast<void*>(PyType_GenericNew) },
+        { Py_tp_init, reinterpret_cast<void*>(scorepy::cast_to_PyFunc(RewindRegion_init)) },
+        { Py_tp_methods, methods },
+        { Py_tp_doc, const_cast<char*>("RewindRegion(name, file_name=None, line_number=0)\n"
+                                       "Handle of the rewind region `<name>`") },
+        { 0, nullptr } /* Sentinel */
+    };
+    static PyType_Spec spec = { "scorep._bindings.RewindRegion", sizeof(RegionObject), 0,
+                                Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, slots };
+    return spec;
+}
+
+} // namespace scorepy
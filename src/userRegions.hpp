@@ -0,0 +1,11 @@
+#pragma once
+
+#include <Python.h>
+
+namespace scorepy
+{
+/// Return the spec of the heap type of the user region class to define for the python module
+PyType_Spec& getUserRegionTypeSpec();
+/// Return the spec of the heap type of the rewind region class to define for the python module
+PyType_Spec& getRewindRegionTypeSpec();
+} // namespace scorepy
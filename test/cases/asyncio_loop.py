@@ -0,0 +1,20 @@
+import asyncio
+import time
+
+
+def block():
+    # Stalls the loop
+    time.sleep(0.05)
+
+
+async def work():
+    await asyncio.sleep(0.01)
+    block()
+    return 1
+
+
+async def amain():
+    return sum(await asyncio.gather(work(), work()))
+
+
+print(asyncio.run(amain()))
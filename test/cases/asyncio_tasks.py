@@ -0,0 +1,14 @@
+import asyncio
+
+
+async def work(delay):
+    await asyncio.sleep(delay)
+    await asyncio.sleep(delay)
+    return delay
+
+
+async def amain():
+    return await asyncio.gather(work(0.01), work(0.02))
+
+
+print(asyncio.run(amain()))
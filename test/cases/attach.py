@@ -0,0 +1,13 @@
+import sys
+import scorep.instrumenter
+
+
+def foo():
+    print("foo")
+
+
+foo()
+scorep.instrumenter.attach(sys.argv[1])
+foo()
+scorep.instrumenter.detach()
+foo()
@@ -0,0 +1,19 @@
+import types
+
+
+def tiny(value):
+    return value + 1
+
+
+# Generated code may have a name that is a pattern in a filter file
+tiny_copy = types.FunctionType(tiny.__code__.replace(co_name="tiny[1]"), globals())
+
+
+def foo():
+    value = 0
+    for _ in range(1000):
+        value = tiny_copy(tiny(value))
+    print(value)
+
+
+foo()
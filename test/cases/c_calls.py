@@ -0,0 +1,9 @@
+import math
+
+
+def foo():
+    values = "1,2".split(",")
+    return len(values) + math.sqrt(4.0) + math.factorial(3)
+
+
+print(foo())
@@ -0,0 +1,29 @@
+import threading
+import time
+import scorep.instrumenter
+
+
+def sleeper(started):
+    started.set()
+    # Still sleeping when the instrumenter is enabled in all threads
+    time.sleep(0.5)
+
+
+def register(value):
+    # The instrumenter is enabled while sorted() is running
+    scorep.instrumenter.register()
+    return value
+
+
+# Both C functions are seen once, so their regions exist
+with scorep.instrumenter.enable():
+    sorted([1])
+    time.sleep(0)
+
+started = threading.Event()
+thread = threading.Thread(target=sleeper, args=(started,))
+thread.start()
+started.wait()
+print(sorted([2, 1], key=register))
+thread.join()
+scorep.instrumenter.unregister()
@@ -0,0 +1,28 @@
+import ctypes
+
+METH_O = 0x0008
+
+
+class PyMethodDef(ctypes.Structure):
+    _fields_ = [("ml_name", ctypes.c_char_p), ("ml_meth", ctypes.c_void_p),
+                ("ml_flags", ctypes.c_int), ("ml_doc", ctypes.c_char_p)]
+
+
+@ctypes.PYFUNCTYPE(ctypes.py_object, ctypes.c_void_p, ctypes.py_object)
+def double(self, value):
+    return 2 * value
+
+
+new_function = ctypes.pythonapi.PyCFunction_NewEx
+new_function.restype = ctypes.py_object
+new_function.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.py_object]
+
+# A method definition allocated at runtime, like the ones of pybind11 or cffi. Its memory is
+# reused for another function, which must not be recorded as the first one
+method_def = PyMethodDef(b"first", ctypes.cast(double, ctypes.c_void_p), METH_O, None)
+first = new_function(ctypes.addressof(method_def), None, "runtime")
+print(first(1))
+del first
+method_def.ml_name = b"second"
+second = new_function(ctypes.addressof(method_def), None, "runtime")
+print(second(2))
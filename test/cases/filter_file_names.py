@@ -0,0 +1,18 @@
+import os
+import scorep.instrumenter
+
+
+def foo():
+    pass
+
+
+def exclude_this_file(region_name, file_name):
+    return file_name != os.path.abspath(__file__)
+
+
+instrumenter = scorep.instrumenter.get_instrumenter()
+instrumenter.set_region_filter(exclude_this_file)
+# The filter decides by the file of the code object, also if another file name is given
+instrumenter.region_begin("__main__", "foo", "elsewhere.py", 1, foo.__code__)
+instrumenter.region_end("__main__", "foo", foo.__code__)
+print("done")
@@ -0,0 +1,44 @@
+def numbers(count):
+    for i in range(count):
+        yield i
+
+
+def double(values):
+    for value in values:
+        yield 2 * value
+
+
+def consume():
+    return sum(double(numbers(10)))
+
+
+def abandon():
+    # The generator is not finished when the function returns
+    values = numbers(10)
+    return next(values)
+
+
+def drain(values):
+    total = 0
+    for value in values:
+        total += value
+    return total
+
+
+def finish_in_callee():
+    # The generator is started here, but finished by drain()
+    values = numbers(10)
+    next(values)
+    return drain(values)
+
+
+def fail():
+    values = numbers(10)
+    next(values)
+    try:
+        values.throw(ValueError)
+    except ValueError:
+        return "failed"
+
+
+print(consume(), abandon(), finish_in_callee(), fail())
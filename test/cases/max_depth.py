@@ -0,0 +1,25 @@
+def recurse(n):
+    if n > 0:
+        recurse(n - 1)
+
+
+def fail(n):
+    if n > 0:
+        fail(n - 1)
+    raise ValueError()
+
+
+def bar():
+    print("hello world")
+
+
+def foo():
+    recurse(10)
+    try:
+        fail(10)
+    except ValueError:
+        pass
+    bar()
+
+
+foo()
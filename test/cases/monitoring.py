@@ -0,0 +1,24 @@
+import sys
+
+
+def foo():
+    print("hello world")
+
+
+calls = []
+
+
+def on_start(code, instruction_offset):
+    if code.co_name == "foo":
+        calls.append(code.co_name)
+
+
+tool_id = sys.monitoring.COVERAGE_ID
+print(sys.monitoring.get_tool(sys.monitoring.PROFILER_ID))
+sys.monitoring.use_tool_id(tool_id, "test")
+sys.monitoring.register_callback(tool_id, sys.monitoring.events.PY_START, on_start)
+sys.monitoring.set_events(tool_id, sys.monitoring.events.PY_START)
+foo()
+sys.monitoring.set_events(tool_id, 0)
+sys.monitoring.free_tool_id(tool_id)
+print(calls)
@@ -0,0 +1,35 @@
+import threading
+import scorep.instrumenter
+import scorep.user
+
+
+def inner():
+    pass
+
+
+def hidden():
+    inner()
+
+
+def worker(barrier):
+    barrier.wait()
+    for _ in range(3):
+        inner()
+    barrier.wait()
+
+
+barrier = threading.Barrier(2)
+t = threading.Thread(target=worker, args=(barrier,))
+t.start()
+with scorep.instrumenter.disable():
+    barrier.wait()
+    hidden()
+    with scorep.instrumenter.disable():
+        hidden()
+        with scorep.instrumenter.enable():
+            inner()
+        hidden()
+    barrier.wait()
+t.join()
+inner()
+print(scorep.instrumenter.get_instrumenter().get_registered())
@@ -0,0 +1,16 @@
+import sys
+import scorep.instrumenter
+import scorep.user
+
+
+def foo():
+    print("foo")
+
+
+print(scorep.user.region()(foo) is foo)
+print(scorep.user.instrument_function(foo) is foo)
+print(scorep.user.region("a") is scorep.user.region("b") is scorep.user.Region("c"))
+print(scorep.instrumenter.enable() is scorep.instrumenter.disable("d"))
+with scorep.user.region("e"), scorep.instrumenter.enable():
+    foo()
+print("scorep._bindings" in sys.modules)
@@ -0,0 +1,13 @@
+import concurrent.futures
+import multiprocessing
+
+
+def work(x):
+    return x * x
+
+
+if __name__ == "__main__":
+    for start_method in ("spawn", "forkserver", "fork"):
+        context = multiprocessing.get_context(start_method)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+            print(start_method, sum(pool.map(work, range(10))))
@@ -0,0 +1,19 @@
+class Base:
+    def foo(self):
+        def inner():
+            pass
+        inner()
+
+    @staticmethod
+    def bar():
+        pass
+
+
+class Derived(Base):
+    pass
+
+
+Derived().foo()
+Base().foo()
+Derived.bar()
+print("hello world")
@@ -0,0 +1,23 @@
+import threading
+import time
+
+
+def busy(duration):
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        pass
+
+
+def foo():
+    busy(0.2)
+
+
+def bar():
+    busy(0.2)
+
+
+thread = threading.Thread(target=bar)
+thread.start()
+foo()
+thread.join()
+print("hello world")
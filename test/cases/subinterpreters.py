@@ -0,0 +1,29 @@
+try:
+    import _interpreters as interpreters
+except ImportError:
+    import _xxsubinterpreters as interpreters
+import scorep.user
+
+# Each subinterpreter has its own GIL and attaches its own instrumenter to the measurement
+code = """
+import scorep.instrumenter
+import scorep.user
+
+
+def work(x):
+    return x * x
+
+
+scorep.instrumenter.attach()
+with scorep.user.Region("subinterpreter"):
+    print(sum(map(work, range(10))))
+scorep.instrumenter.detach()
+"""
+
+for _ in range(2):
+    interpreter = interpreters.create()
+    interpreters.run_string(interpreter, code)
+    interpreters.destroy(interpreter)
+
+with scorep.user.Region("main"):
+    print("main")
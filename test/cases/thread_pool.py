@@ -0,0 +1,20 @@
+import concurrent.futures
+import threading
+import scorep.instrumenter
+
+
+def work(x):
+    return x * x
+
+
+workers = 2
+pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+# All workers are running and waiting for work before the instrumenter is enabled
+barrier = threading.Barrier(workers + 1)
+for _ in range(workers):
+    pool.submit(barrier.wait)
+barrier.wait()
+
+scorep.instrumenter.register()
+print(sum(pool.map(work, range(10))))
+pool.shutdown()
@@ -0,0 +1,25 @@
+import scorep.user
+
+step = scorep.user.Region("step")
+rewind = scorep.user.RewindRegion("rewind_step")
+steps = scorep.user.Metric("steps", "steps", "uint64")
+
+
+def foo():
+    for i in range(3):
+        step.enter()
+        print("step", i)
+        steps.trigger(i)
+        step.exit()
+    with step:
+        print("with step")
+
+
+def bar():
+    rewind.enter()
+    print("rewind")
+    rewind.exit(True)
+
+
+foo()
+bar()
@@ -0,0 +1,36 @@
+import scorep.user
+import user_region_handles2
+
+
+def loop():
+    for i in range(3):
+        with scorep.user.region("loop"):
+            pass
+
+
+@scorep.user.region("failing")
+def fail():
+    raise ValueError("expected")
+
+
+print(scorep.user.region("loop") is scorep.user.region("loop"))
+loop()
+
+with scorep.user.Region("a"):
+    pass
+with scorep.user.Region("b"):
+    pass
+
+with scorep.user.region("shared"):
+    pass
+user_region_handles2.shared()
+
+try:
+    with scorep.user.region("failing"):
+        raise ValueError("expected")
+except ValueError:
+    print("caught")
+try:
+    fail()
+except ValueError:
+    print("caught")
@@ -0,0 +1,7 @@
+import scorep.user
+
+
+def shared():
+    # Same name as the region in user_region_handles.py, but another file
+    with scorep.user.region("shared"):
+        pass
@@ -0,0 +1,83 @@
+import pickle
+import pytest
+import scorep.filter
+
+
+def test_empty_filter():
+    region_filter = scorep.filter.RegionFilter()
+    assert not region_filter
+    assert region_filter("__main__:foo", "/home/user/foo.py")
+
+
+def test_module_and_name_rules():
+    region_filter = scorep.filter.RegionFilter()
+    region_filter.exclude_module("numpy*")
+    region_filter.include_name(r"numpy\.linalg:.*")
+    assert region_filter
+    assert not region_filter("numpy:array", "/lib/numpy/__init__.py")
+    assert not region_filter("numpy.core.numeric:ones", "/lib/numpy/core/numeric.py")
+    assert region_filter("numpy.linalg:norm", "/lib/numpy/linalg.py")
+    assert region_filter("__main__:foo", "/home/user/foo.py")
+    # Last matching rule wins
+    region_filter.exclude_name(".*:norm")
+    assert not region_filter("numpy.linalg:norm", "/lib/numpy/linalg.py")
+
+
+def test_path_rules():
+    region_filter = scorep.filter.RegionFilter()
+    region_filter.exclude_path("/usr/lib/python3/")
+    region_filter.include_path("/usr/lib/python3/json")
+    assert not region_filter("os:walk", "/usr/lib/python3/os.py")
+    assert region_filter("json:dumps", "/usr/lib/python3/json/__init__.py")
+    assert region_filter("__main__:foo", "/usr/lib/python3.py")
+    # Region rules can't include a region excluded by a file rule
+    region_filter.include_module("os")
+    assert not region_filter("os:walk", "/usr/lib/python3/os.py")
+
+
+def test_filter_rules():
+    region_filter = scorep.filter.RegionFilter()
+    region_filter.add_filter_rules("""
+    # Comment
+    SCOREP_REGION_NAMES_BEGIN
+      EXCLUDE *
+      INCLUDE __main__:* MANGLED foo:bar\\#baz # Comment
+    SCOREP_REGION_NAMES_END
+    SCOREP_FILE_NAMES_BEGIN EXCLUDE */site-packages/* SCOREP_FILE_NAMES_END
+    """)
+    assert region_filter("__main__:foo", "/home/user/foo.py")
+    assert region_filter("foo:bar#baz", "/home/user/foo.py")
+    assert not region_filter("foo:bar", "/home/user/foo.py")
+    assert not region_filter("__main__:foo", "/lib/site-packages/foo.py")
+
+
+def test_filter_file(tmp_path):
+    filter_file = tmp_path / "test.filter"
+    filter_file.write_text("SCOREP_REGION_NAMES_BEGIN\nEXCLUDE foo:*\nSCOREP_REGION_NAMES_END\n")
+    region_filter = scorep.filter.RegionFilter()
+    region_filter.add_filter_file(str(filter_file))
+    assert not region_filter("foo:bar", "/foo.py")
+    assert region_filter("bar:foo", "/foo.py")
+
+
+def test_pickle_filter():
+    region_filter = scorep.filter.RegionFilter()
+    region_filter.add_filter_rules("SCOREP_REGION_NAMES_BEGIN EXCLUDE foo:* SCOREP_REGION_NAMES_END")
+    region_filter.include_name("foo:bar")
+    region_filter.exclude_path("/lib")
+    copy = pickle.loads(pickle.dumps(region_filter))
+    assert not copy("foo:baz", "/foo.py")
+    assert copy("foo:bar", "/foo.py")
+    assert not copy("foo:bar", "/lib/foo.py")
+
+
+@pytest.mark.parametrize("rules", [
+    "EXCLUDE *",
+    "SCOREP_REGION_NAMES_BEGIN foo SCOREP_REGION_NAMES_END",
+    "SCOREP_REGION_NAMES_BEGIN EXCLUDE *",
+    "SCOREP_REGION_NAMES_BEGIN SCOREP_FILE_NAMES_BEGIN",
+    "SCOREP_FILE_NAMES_END",
+])
+def test_invalid_filter_rules(rules):
+    with pytest.raises(ValueError):
+        scorep.filter.RegionFilter().add_filter_rules(rules)
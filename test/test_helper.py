@@ -22,3 +22,34 @@ def test_add_to_ld_library_path(monkeypatch):
     monkeypatch.setenv('LD_LIBRARY_PATH', '/some/folder:/parent/sub')
     scorep.helper.add_to_ld_library_path('/parent')
     assert os.environ['LD_LIBRARY_PATH'] == '/parent:/some/folder:/parent/sub'
+
+
+def test_query(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('PATH', str(tmp_path), prepend=os.pathsep)
+    monkeypatch.setattr(scorep.helper, '_query_results', None)
+    calls = tmp_path / 'calls'
+    binary = tmp_path / 'fake-scorep-config'
+    binary.write_text('#!/bin/sh\necho "$@" >> {}\necho "$@"\n[ "$1" != "--fail" ]\n'.format(calls))
+    binary.chmod(0o755)
+
+    def num_calls():
+        return len(calls.read_text().splitlines()) if calls.exists() else 0
+
+    queries = [['fake-scorep-config', '--libs'], ['fake-scorep-config', '--cflags']]
+    assert scorep.helper.query(queries) == [(0, '--libs\n', ''), (0, '--cflags\n', '')]
+    assert num_calls() == 2
+    assert scorep.helper.query(queries[::-1]) == [(0, '--cflags\n', ''), (0, '--libs\n', '')]
+    assert num_calls() == 2
+    # Another process reuses the results
+    monkeypatch.setattr(scorep.helper, '_query_results', None)
+    assert scorep.helper.query(queries)[0] == (0, '--libs\n', '')
+    assert num_calls() == 2
+    # Failures are not cached
+    for expected_calls in (3, 4):
+        assert scorep.helper.query([['fake-scorep-config', '--fail']])[0][0] != 0
+        assert num_calls() == expected_calls
+    # A changed binary invalidates the results
+    os.utime(str(binary), ns=(0, 0))
+    assert scorep.helper.query(queries)[1] == (0, '--cflags\n', '')
+    assert num_calls() == 6
@@ -1,13 +1,16 @@
 #!/usr/bin/env pytest
 
+import glob
 import os
 import pkgutil
 import platform
 import pytest
 import re
+import shlex
 import sys
 import numpy
 
+import scorep.filter
 import utils
 from utils import OTF2_Trace, OTF2_Region, OTF2_Parameter
 
@@ -35,12 +38,17 @@ cinstrumenter_skip_mark = pytest.mark.skipif(
     platform.python_implementation() == "PyPy",
     reason="CInstrumenter only available in CPython and not in PyPy",
 )
+monitoring_skip_mark = pytest.mark.skipif(
+    platform.python_implementation() == "PyPy" or sys.version_info < (3, 12),
+    reason="sys.monitoring is only available in CPython 3.12 and newer",
+)
 # All instrumenters (except dummy which isn't a real one)
 ALL_INSTRUMENTERS = [
     "profile",
     "trace",
     pytest.param("cProfile", marks=cinstrumenter_skip_mark),
     pytest.param("cTrace", marks=cinstrumenter_skip_mark),
+    pytest.param("cMonitoring", marks=monitoring_skip_mark),
 ]
 
 foreach_instrumenter = pytest.mark.parametrize("instrumenter", ALL_INSTRUMENTERS)
@@ -75,6 +83,13 @@ def test_has_c_instrumenter():
     assert has_c_instrumenter()
 
 
+@monitoring_skip_mark
+def test_has_monitoring_instrumenter():
+    from scorep.instrumenter import has_monitoring_instrumenter
+
+    assert has_monitoring_instrumenter()
+
+
 @foreach_instrumenter
 def test_user_regions(scorep_env, instrumenter):
     trace_path = get_trace_path(scorep_env)
@@ -133,6 +148,58 @@ def test_decorator(scorep_env, instrumenter):
     assert len(trace.findall(OTF2_Region("__main__:foo"))) == 6
 
 
+def get_print_env(scorep_env):
+    """Return the environment printed by `python -m scorep --print-env` applied to scorep_env"""
+    std_out, std_err = utils.call([sys.executable, "-m", "scorep", "--print-env"], env=scorep_env)
+
+    env = scorep_env.copy()
+    for line in std_out.splitlines():
+        var, value = shlex.split(line[len("export "):])[0].split("=", 1)
+        env[var] = value
+    return env
+
+
+def test_print_env(scorep_env):
+    trace_path = get_trace_path(scorep_env)
+    env = get_print_env(scorep_env)
+    assert env["SCOREP_PYTHON_BINDINGS_INITIALISED"] == "true"
+    assert "libscorep_init_subsystem" in env["LD_PRELOAD"]
+
+    # Without a restart, nothing is printed by --verbose
+    std_out, std_err = utils.call_with_scorep("cases/user_regions.py", ["--nopython", "--verbose"], env=env)
+
+    assert std_err == ""
+    assert (
+        std_out
+        == "hello world\nhello world\nhello world3\nhello world3\nhello world4\n"
+    )
+
+    trace = OTF2_Trace(trace_path)
+    assert OTF2_Region("user:test_region") in trace
+
+
+@foreach_instrumenter
+def test_attach(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    # Score-P is preloaded like by a host, the script is started without the scorep module
+    env = get_print_env(scorep_env)
+    del env["SCOREP_PYTHON_BINDINGS_INITIALISED"]
+    std_out, std_err = utils.call([sys.executable, "cases/attach.py", instrumenter], env=env)
+
+    assert std_err == ""
+    assert std_out == "foo\nfoo\nfoo\n"
+
+    trace = OTF2_Trace(trace_path)
+    assert len(trace.findall(OTF2_Region("__main__:foo"))) == 2
+
+
+def test_attach_no_scorep():
+    std_out, std_err = utils.call([sys.executable, "cases/attach.py", "dummy"], expected_returncode=1)
+
+    assert std_out == "foo\n"
+    assert "Score-P is not loaded" in std_err
+
+
 def test_user_regions_no_scorep():
     std_out, std_err = utils.call([sys.executable, "cases/user_regions.py"])
 
@@ -143,6 +210,31 @@ def test_user_regions_no_scorep():
     )
 
 
+@foreach_instrumenter
+def test_nested_disable(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/nested_disable.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "True\n"
+
+    trace = OTF2_Trace(trace_path)
+    # 3 calls of the other thread, 1 call in enable() and 1 after disable()
+    assert len(trace.findall(OTF2_Region("__main__:inner"))) == 10
+    assert OTF2_Region("__main__:hidden") not in trace
+
+
+def test_no_op_no_scorep():
+    std_out, std_err = utils.call([sys.executable, "cases/no_op.py"])
+
+    assert std_err == ""
+    assert std_out == "True\nTrue\nTrue\nTrue\nfoo\nFalse\n"
+
+
 @foreach_instrumenter
 def test_user_rewind(scorep_env, instrumenter):
     trace_path = get_trace_path(scorep_env)
@@ -159,6 +251,64 @@ def test_user_rewind(scorep_env, instrumenter):
     assert re.search("MEASUREMENT_ON_OFF[ ]*[0-9 ]*[0-9 ]*Mode: ON", str(trace))
 
 
+@foreach_instrumenter
+def test_user_handles(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+
+    std_out, std_err = utils.call_with_scorep(
+        "cases/user_handles.py", ["--nopython", "--instrumenter-type=" + instrumenter], env=scorep_env
+    )
+
+    assert std_err == ""
+    assert std_out == "step 0\nstep 1\nstep 2\nwith step\nrewind\n"
+
+    trace = OTF2_Trace(trace_path)
+    assert len(trace.findall(OTF2_Region("user:step"))) == 8
+    assert len(re.findall('METRIC .*"steps"', str(trace))) == 3
+    assert re.search("MEASUREMENT_ON_OFF[ ]*[0-9 ]*[0-9 ]*Mode: OFF", str(trace))
+
+
+def test_user_handles_no_scorep():
+    std_out, std_err = utils.call([sys.executable, "cases/user_handles.py"])
+
+    assert std_err == ""
+    assert std_out == "step 0\nstep 1\nstep 2\nwith step\nrewind\n"
+
+
+@foreach_instrumenter
+def test_user_region_handles(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+
+    std_out, std_err = utils.call_with_scorep(
+        "cases/user_region_handles.py", ["--nopython", "--instrumenter-type=" + instrumenter], env=scorep_env
+    )
+
+    assert std_err == ""
+    assert std_out == "True\ncaught\ncaught\n"
+
+    trace = OTF2_Trace(trace_path)
+
+    def region_refs(event, region):
+        return re.findall('%s[ ]*[0-9 ]*[0-9 ]*Region: "%s" <([0-9]+)>' % (event, region), str(trace))
+
+    # Repeated entries use the same region
+    assert len(region_refs("ENTER", "user:loop")) == 3
+    assert len(set(region_refs("ENTER", "user:loop"))) == 1
+    # Different names or files give distinct regions
+    assert region_refs("ENTER", "user:a") != region_refs("ENTER", "user:b")
+    assert len(set(region_refs("ENTER", "user:shared"))) == 2
+    # Regions left by an exception are still left
+    assert len(region_refs("ENTER", "user:failing")) == 2
+    assert len(region_refs("LEAVE", "user:failing")) == 2
+
+
+def test_user_region_handles_no_scorep():
+    std_out, std_err = utils.call([sys.executable, "cases/user_region_handles.py"])
+
+    assert std_err == ""
+    assert std_out == "True\ncaught\ncaught\n"
+
+
 @pytest.mark.parametrize("instrumenter", ALL_INSTRUMENTERS + [None])
 def test_instrumentation(scorep_env, instrumenter):
     trace_path = get_trace_path(scorep_env)
@@ -178,6 +328,45 @@ def test_instrumentation(scorep_env, instrumenter):
     assert OTF2_Region("instrumentation2:baz") in trace
 
 
+@foreach_instrumenter
+def test_filter(scorep_env, instrumenter, tmp_path):
+    trace_path = get_trace_path(scorep_env)
+
+    filter_file = tmp_path / "test.filter"
+    filter_file.write_text("SCOREP_REGION_NAMES_BEGIN\n EXCLUDE instrumentation2:*\nSCOREP_REGION_NAMES_END\n")
+    std_out, std_err = utils.call_with_scorep(
+        "cases/instrumentation.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter,
+         "--filter-file=" + str(filter_file), "--include-name=.*:bar"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "hello world\nbaz\nbar\n"
+
+    trace = OTF2_Trace(trace_path)
+    assert OTF2_Region("__main__:foo") in trace
+    assert OTF2_Region("instrumentation2:bar") in trace
+    assert OTF2_Region("instrumentation2:baz") not in trace
+
+
+@foreach_instrumenter
+def test_filter_file_names(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/filter_file_names.py",
+        ["--noinstrumenter", "--instrumenter-type=" + instrumenter],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "done\n"
+
+    trace = OTF2_Trace(trace_path)
+    assert OTF2_Region("__main__:foo") not in trace
+    assert OTF2_Region("error_region") not in trace
+
+
 @foreach_instrumenter
 def test_user_instrumentation(scorep_env, instrumenter):
     trace_path = get_trace_path(scorep_env)
@@ -314,6 +503,277 @@ def test_classes(scorep_env, instrumenter):
     assert OTF2_Region("__main__.TestClass2:foo") in trace
 
 
+@pytest.mark.parametrize("instrumenter", [
+    pytest.param("cProfile", marks=cinstrumenter_skip_mark),
+    pytest.param("cMonitoring", marks=monitoring_skip_mark),
+])
+def test_c_calls(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/c_calls.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter, "--c-calls=math:*,builtins.str:*"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "10.0\n"
+
+    trace = OTF2_Trace(trace_path)
+    assert OTF2_Region("__main__:foo") in trace
+    assert OTF2_Region("math:sqrt") in trace
+    assert OTF2_Region("math:factorial") in trace
+    assert OTF2_Region("builtins.str:split") in trace
+    # Not in the allow-list
+    assert OTF2_Region("builtins:len") not in trace
+    assert OTF2_Region("builtins:print") not in trace
+
+
+@pytest.mark.parametrize("instrumenter", [
+    pytest.param("cProfile", marks=cinstrumenter_skip_mark),
+    pytest.param("cMonitoring", marks=monitoring_skip_mark),
+])
+def test_c_calls_runtime_method_defs(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/c_calls_runtime.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter, "--c-calls=runtime:*"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "2\n4\n"
+
+    trace = OTF2_Trace(trace_path)
+    # Both functions share the address of their method definition. Each is entered and left once
+    assert len(trace.findall(OTF2_Region("runtime:first"))) == 2
+    assert len(trace.findall(OTF2_Region("runtime:second"))) == 2
+
+
+@pytest.mark.parametrize("instrumenter", [
+    pytest.param("cProfile", marks=cinstrumenter_skip_mark),
+    pytest.param("cMonitoring", marks=monitoring_skip_mark),
+])
+def test_c_calls_enable(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/c_calls_enable.py",
+        ["--noinstrumenter", "--instrumenter-type=" + instrumenter, "--c-calls=builtins:sorted,time:*"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "[1, 2]\n"
+
+    trace = OTF2_Trace(trace_path)
+    # Only the calls seen from their start are recorded, not the sleep of the other thread
+    assert len(trace.findall(OTF2_Region("builtins:sorted"))) == 2
+    assert len(trace.findall(OTF2_Region("time:sleep"))) == 2
+    assert OTF2_Region("error_region") not in trace
+
+
+@foreach_instrumenter
+def test_asyncio_tasks(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/asyncio_tasks.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter, "--asyncio"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "[0.01, 0.02]\n"
+
+    trace = OTF2_Trace(trace_path)
+    # Two tasks with three steps each
+    assert len(trace.findall(OTF2_Region("user:asyncio.Task(__main__.work)"))) == 2 * 6
+    assert OTF2_Region("__main__:work") in trace
+
+
+@foreach_instrumenter
+def test_asyncio_loop(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/asyncio_loop.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter, "--asyncio=tasks,loop"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "2\n"
+
+    trace = OTF2_Trace(trace_path)
+    assert OTF2_Region("user:asyncio.callback") in trace
+    assert OTF2_Region("user:asyncio.select") in trace
+    assert OTF2_Region("user:asyncio.Task(__main__.work)") in trace
+    assert OTF2_Region("__main__:block") in trace
+    assert re.search('METRIC .*"asyncio.callback_delay"', str(trace))
+    assert re.search('METRIC .*"asyncio.handles_per_iteration"', str(trace))
+
+
+@pytest.mark.parametrize("instrumenter", [
+    pytest.param("cProfile", marks=cinstrumenter_skip_mark),
+    pytest.param("cMonitoring", marks=monitoring_skip_mark),
+])
+def test_generator_resume_regions(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/generators.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter, "--generator-regions=resume"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "90 0 45 failed\n"
+
+    trace = OTF2_Trace(trace_path)
+    # 10 resumes and the final return
+    assert len(trace.findall(OTF2_Region("__main__:double"))) == 2 * 11
+    assert OTF2_Region("error_region") not in trace
+
+
+@monitoring_skip_mark
+def test_generator_lifetime_regions(scorep_env):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/generators.py",
+        ["--nocompiler", "--instrumenter-type=cMonitoring", "--generator-regions=lifetime"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "90 0 45 failed\n"
+
+    trace = OTF2_Trace(trace_path)
+    assert len(trace.findall(OTF2_Region("__main__:double"))) == 2
+    # The abandoned generator ends with abandon()
+    assert len(trace.findall(OTF2_Region("__main__:numbers"))) == 2 * 4
+    # The generator finished by drain() ends after drain() returned, to keep the regions nested
+    drain = re.search('ENTER[ ]*[0-9 ]*[0-9 ]*Region: "__main__:drain".*?'
+                      'LEAVE[ ]*[0-9 ]*[0-9 ]*Region: "__main__:drain"', str(trace), re.S)
+    assert "__main__:numbers" not in drain.group(0)
+    assert OTF2_Region("error_region") not in trace
+
+
+@pytest.mark.skipif(sys.version_info < (3, 11), reason="co_qualname is only available in Python 3.11 and newer")
+@foreach_instrumenter
+def test_qualname_region_names(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/qualname.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter, "--region-names=qualname"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "hello world\n"
+
+    trace = OTF2_Trace(trace_path)
+    # Methods are named after their class, not after the type of self
+    assert OTF2_Region("__main__:Base.foo") in trace
+    assert OTF2_Region("__main__:Base.foo.<locals>.inner") in trace
+    assert OTF2_Region("__main__:Base.bar") in trace
+    assert "Derived.foo" not in str(trace)
+
+
+@monitoring_skip_mark
+def test_monitoring_tool_id(scorep_env):
+    trace_path = get_trace_path(scorep_env)
+
+    std_out, std_err = utils.call_with_scorep(
+        "cases/monitoring.py",
+        ["--nocompiler", "--instrumenter-type=cMonitoring"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "scorep\nhello world\n['foo']\n"
+
+    trace = OTF2_Trace(trace_path)
+    assert OTF2_Region("__main__:foo") in trace
+
+
+@pytest.mark.parametrize("instrumenter", [
+    pytest.param("cProfile", marks=cinstrumenter_skip_mark),
+    pytest.param("cTrace", marks=cinstrumenter_skip_mark),
+    pytest.param("cMonitoring", marks=monitoring_skip_mark),
+])
+def test_max_depth(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+
+    std_out, std_err = utils.call_with_scorep(
+        "cases/max_depth.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter, "--max-depth=3"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "hello world\n"
+
+    trace = OTF2_Trace(trace_path)
+    # Only the outermost call of the recursions is recorded, one ENTER and one LEAVE each
+    assert len(trace.findall(OTF2_Region("__main__:recurse"))) == 2
+    assert len(trace.findall(OTF2_Region("__main__:fail"))) == 2
+    # The depth is balanced after the exception
+    assert OTF2_Region("__main__:bar") in trace
+
+
+@pytest.mark.parametrize("instrumenter", [
+    pytest.param("cProfile", marks=cinstrumenter_skip_mark),
+    pytest.param("cTrace", marks=cinstrumenter_skip_mark),
+    pytest.param("cMonitoring", marks=monitoring_skip_mark),
+])
+def test_burst_filter(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+
+    std_out, std_err = utils.call_with_scorep(
+        "cases/burst_filter.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter, "--burst-filter=100,1000"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "2000\n"
+
+    trace = OTF2_Trace(trace_path)
+    # Only the calls until the region was excluded are recorded, one ENTER and one LEAVE each
+    assert len(trace.findall(OTF2_Region("__main__:tiny"))) == 200
+    assert len(trace.findall(OTF2_Region("__main__:tiny[1]"))) == 200
+    assert OTF2_Region("__main__:foo") in trace
+
+    filter_file = os.path.join(scorep_env["SCOREP_EXPERIMENT_DIRECTORY"], "python_burst.filter")
+    with open(filter_file) as f:
+        rules = f.read()
+    assert "EXCLUDE __main__:tiny\n" in rules
+    assert "EXCLUDE __main__:tiny[[]1]\n" in rules
+    # The bracketed name only matches itself
+    region_filter = scorep.filter.RegionFilter()
+    region_filter.add_filter_file(filter_file)
+    assert not region_filter("__main__:tiny[1]", "")
+    assert region_filter("__main__:tiny1", "")
+
+
+@pytest.mark.skipif(
+    platform.python_implementation() == "PyPy" or sys.version_info < (3, 9),
+    reason="Sampling is only available in CPython 3.9 and newer",
+)
+def test_sampling(scorep_env):
+    trace_path = get_trace_path(scorep_env)
+
+    std_out, std_err = utils.call_with_scorep(
+        "cases/sampling.py",
+        ["--nocompiler", "--instrumenter-type=cSampling", "--sampling-frequency=100"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "hello world\n"
+
+    trace = OTF2_Trace(trace_path)
+    assert OTF2_Region("__main__:foo") in trace
+    assert OTF2_Region("__main__:bar") in trace
+    assert OTF2_Region("__main__:busy") in trace
+
+
 def test_dummy(scorep_env):
     std_out, std_err = utils.call_with_scorep(
         "cases/instrumentation.py", ["--instrumenter-type=dummy"], env=scorep_env
@@ -371,6 +831,81 @@ def test_threads(scorep_env, instrumenter):
     assert OTF2_Region("instrumentation2:baz") in trace
 
 
+@pytest.mark.parametrize("instrumenter", [
+    pytest.param("profile", marks=pytest.mark.skipif(
+        sys.version_info < (3, 12), reason="threading.setprofile_all_threads requires Python 3.12")),
+    pytest.param("trace", marks=pytest.mark.skipif(
+        sys.version_info < (3, 12), reason="threading.settrace_all_threads requires Python 3.12")),
+    pytest.param("cProfile", marks=cinstrumenter_skip_mark),
+    pytest.param("cTrace", marks=cinstrumenter_skip_mark),
+    pytest.param("cMonitoring", marks=monitoring_skip_mark),
+])
+def test_thread_pool(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/thread_pool.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter, "--noinstrumenter"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "285\n"
+
+    trace = OTF2_Trace(trace_path)
+    # The workers were started before the instrumenter was enabled
+    assert len(trace.findall(OTF2_Region("__main__:work"))) == 2 * 10
+    assert OTF2_Region("error_region") not in trace
+
+
+@foreach_instrumenter
+def test_multiprocessing(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/process_pool.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter, "--multiprocessing"],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "spawn 285\nforkserver 285\nfork 285\n"
+
+    # The workers started by spawn and forkserver write their own experiment directories
+    worker_dirs = glob.glob(scorep_env["SCOREP_EXPERIMENT_DIRECTORY"] + "-*")
+    assert worker_dirs
+    work_regions = 0
+    for worker_dir in worker_dirs:
+        worker_trace = OTF2_Trace(worker_dir + "/traces.otf2")
+        work_regions += len(worker_trace.findall(OTF2_Region("__mp_main__:work")))
+        assert OTF2_Region("error_region") not in worker_trace
+    assert work_regions == 2 * 2 * 10
+
+    # The forked workers record nothing
+    trace = OTF2_Trace(trace_path)
+    assert OTF2_Region("__main__:work") not in trace
+
+
+@pytest.mark.skipif(platform.python_implementation() == "PyPy" or sys.version_info < (3, 12),
+                    reason="Subinterpreters with their own GIL require CPython 3.12 or newer")
+@foreach_instrumenter
+def test_subinterpreters(scorep_env, instrumenter):
+    trace_path = get_trace_path(scorep_env)
+    std_out, std_err = utils.call_with_scorep(
+        "cases/subinterpreters.py",
+        ["--nocompiler", "--instrumenter-type=" + instrumenter],
+        env=scorep_env,
+    )
+
+    assert std_err == ""
+    assert std_out == "285\n285\nmain\n"
+
+    trace = OTF2_Trace(trace_path)
+    # Each of the 2 subinterpreters enters and leaves its regions
+    assert len(trace.findall(OTF2_Region("user:subinterpreter"))) == 2 * 2
+    assert len(trace.findall(OTF2_Region("__main__:work"))) == 2 * 2 * 10
+    assert OTF2_Region("user:main") in trace
+    assert OTF2_Region("error_region") not in trace
+
+
 @pytest.mark.skipif(sys.version_info.major < 3, reason="not tested for python 2")
 @foreach_instrumenter
 def test_io(scorep_env, instrumenter):
@@ -1,4 +1,7 @@
 import os
+import pytest
+import threading
+import time
 from scorep import subsystem
 
 
@@ -18,3 +21,111 @@ def test_reset_preload(monkeypatch):
     monkeypatch.setenv('SCOREP_LD_PRELOAD_BACKUP', '')
     subsystem.reset_preload()
     assert 'LD_PRELOAD' not in os.environ
+
+
+def test_subsystem_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    monkeypatch.setenv('SCOREP_PYTHON_BINDINGS_TEMP_DIR', '/inherited/dir')
+    monkeypatch.setattr(subsystem, 'subsystem_cache_key', lambda scorep_config: ''.join(scorep_config))
+    builds = []
+
+    def build(scorep_config, build_dir):
+        builds.append(build_dir)
+        lib_name = subsystem.generate_subsystem_lib_name()
+        with open(os.path.join(build_dir, lib_name), 'w') as f:
+            f.write('lib')
+        return lib_name
+    monkeypatch.setattr(subsystem, 'build', build)
+
+    # Miss -> Build and publish
+    lib_name, lib_dir = subsystem.generate(['--user'])
+    assert lib_dir == os.path.join(str(tmp_path), 'scorep-python', '--user')
+    assert os.path.exists(os.path.join(lib_dir, lib_name))
+    assert len(builds) == 1
+    assert 'SCOREP_PYTHON_BINDINGS_TEMP_DIR' not in os.environ
+    # Hit -> No build
+    assert subsystem.generate(['--user']) == (lib_name, lib_dir)
+    assert len(builds) == 1
+    # Other configuration -> Build
+    assert subsystem.generate(['--user', '--mpp=mpi'])[1] != lib_dir
+    assert len(builds) == 2
+    # Only the published folders are left
+    assert sorted(os.listdir(os.path.dirname(lib_dir))) == [
+        '--user', '--user--mpp=mpi', '--user--mpp=mpi.lock', '--user.lock']
+
+
+def test_subsystem_cache_key(monkeypatch, tmp_path):
+    scorep_config = tmp_path / 'scorep-config'
+    scorep_config.write_text('')
+    monkeypatch.setattr(subsystem.shutil, 'which', lambda name: str(scorep_config))
+    monkeypatch.setattr(subsystem.scorep.helper, 'query', lambda arguments_list: [(0, '9.0\n', '')])
+
+    key = subsystem.subsystem_cache_key(['--user'])
+    assert subsystem.subsystem_cache_key(['--user']) == key
+    assert subsystem.subsystem_cache_key(['--user', '--mpp=mpi']) != key
+    # Other bindings may generate other sources
+    monkeypatch.setattr(subsystem.scorep._version, '__version__', '0.0.0')
+    assert subsystem.subsystem_cache_key(['--user']) != key
+
+
+def test_subsystem_cache_race(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    monkeypatch.setattr(subsystem, 'subsystem_cache_key', lambda scorep_config: 'key')
+    lib_name = subsystem.generate_subsystem_lib_name()
+    cache_dir = os.path.join(str(tmp_path), 'scorep-python', 'key')
+
+    def build(scorep_config, build_dir):
+        # Another run publishes the subsystem while this one builds it
+        os.makedirs(cache_dir)
+        for folder in (cache_dir, build_dir):
+            with open(os.path.join(folder, lib_name), 'w') as f:
+                f.write(folder)
+        return lib_name
+    monkeypatch.setattr(subsystem, 'build', build)
+
+    assert subsystem.generate(['--user']) == (lib_name, cache_dir)
+    with open(os.path.join(cache_dir, lib_name)) as f:
+        assert f.read() == cache_dir
+    assert sorted(os.listdir(os.path.dirname(cache_dir))) == ['key', 'key.lock']
+
+
+def test_subsystem_cache_lock(monkeypatch, tmp_path):
+    monkeypatch.setenv('SCOREP_PYTHON_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(subsystem, 'subsystem_cache_key', lambda scorep_config: 'key')
+    builds = []
+
+    def build(scorep_config, build_dir):
+        builds.append(build_dir)
+        time.sleep(0.1)
+        lib_name = subsystem.generate_subsystem_lib_name()
+        with open(os.path.join(build_dir, lib_name), 'w') as f:
+            f.write('lib')
+        return lib_name
+    monkeypatch.setattr(subsystem, 'build', build)
+
+    # Like ranks of an MPI job: Only one builds, the others wait for it
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(subsystem.generate(['--user']))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert results == [(subsystem.generate_subsystem_lib_name(), os.path.join(str(tmp_path), 'key'))] * 4
+
+
+def test_prepare(monkeypatch, tmp_path):
+    monkeypatch.setattr(subsystem, '_resolve_queries', lambda scorep_config: None)
+    monkeypatch.setattr(subsystem, 'subsystem_cache_key', lambda scorep_config: 'key')
+    monkeypatch.setattr(subsystem, 'build', lambda scorep_config, build_dir: open(
+        os.path.join(build_dir, subsystem.generate_subsystem_lib_name()), 'w').close())
+
+    monkeypatch.setenv('SCOREP_PYTHON_CACHE_DIR', str(tmp_path / 'cache'))
+    assert subsystem.prepare(['--mpp=mpi']) == str(tmp_path / 'cache' / 'key')
+
+    # The cache can't be created below a file
+    (tmp_path / 'file').write_text('')
+    monkeypatch.setenv('SCOREP_PYTHON_CACHE_DIR', str(tmp_path / 'file' / 'cache'))
+    with pytest.raises(RuntimeError):
+        subsystem.prepare(['--mpp=mpi'])
+    assert 'SCOREP_PYTHON_BINDINGS_TEMP_DIR' not in os.environ